@@ -1,5 +1,4 @@
 import random
-import copy
 import json
 
 from move import Move
@@ -8,153 +7,547 @@ from const import *
 import subprocess
 import shlex
 import os
+import time
+
+from search import SearchContext, SearchStats, SearchStopped
 
 # Simple evaluation: sum of piece values (Piece.value stores signed values: white positive, black negative)
 def evaluate(board):
     s = 0
-    for r in range(ROWS):
-        for c in range(COLS):
-            if board.squares[r][c].has_piece():
-                p = board.squares[r][c].piece
-                s += p.value
+    for _, _, p in board.pieces():
+        s += p.value
     return s
 
 
 def all_legal_moves(board, color):
+    # move lists come from the board's legal-move cache (keyed by position hash)
     moves = []
-    for r in range(ROWS):
-        for c in range(COLS):
-            if board.squares[r][c].has_piece():
-                p = board.squares[r][c].piece
-                if p.color == color:
-                    p.clear_moves()
-                    board.calc_moves(p, r, c, bool=True)
-                    for m in p.moves:
-                        # create move with minimal references (just rows/cols)
-                        initial = Square(m.initial.row, m.initial.col)
-                        final = Square(m.final.row, m.final.col)
-                        moves.append(Move(initial, final))
+    for r, c, fr, fc in board.legal_moves(color):
+        # create move with minimal references (just rows/cols)
+        moves.append(Move(Square(r, c), Square(fr, fc)))
     return moves
 
 
-def random_bot(board, color):
+def random_bot(board, color, ctx=None):
+    """A random legal move, but not one that just gives material away (see non_losing_moves)."""
+    if ctx is not None and ctx.stopped():
+        return None
     moves = all_legal_moves(board, color)
     if not moves:
         return None
-    return random.choice(moves)
+    return random.choice(non_losing_moves(board, moves))
 
 
-def minimax_bot(board, color, depth=2):
-    """Return best Move for color using depth-limited minimax (no alpha-beta for simplicity)."""
+def minimax_bot(board, color, depth=2, ctx=None):
+    """Return best Move for color using depth-limited minimax (no alpha-beta for simplicity).
+
+    ctx: optional SearchContext; when it stops, the best root move searched so far is
+    returned (None if none was).
+    """
+    # evaluate() is white-positive: score leaves from `color`'s point of view
+    sign = 1 if color == 'white' else -1
+    root = {'move': None}
+
     def minimax(node_board, d, maximizing):
+        if ctx is not None:
+            ctx.check()
+        # repeated position / fifty-move rule: a draw, nothing to search below
+        if node_board is not board and (node_board.is_repetition() or node_board.is_fifty_moves()):
+            return 0.0, None
         if d == 0:
-            return evaluate(node_board), None
+            return sign * evaluate(node_board), None
 
         color_to_move = color if maximizing else ('black' if color == 'white' else 'white')
         legal = all_legal_moves(node_board, color_to_move)
         if not legal:
-            return evaluate(node_board), None
+            return sign * evaluate(node_board), None
 
         best_move = None
         if maximizing:
             max_eval = -10**9
             for m in legal:
-                tb = copy.deepcopy(node_board)
+                tb = node_board.copy()
                 piece = tb.squares[m.initial.row][m.initial.col].piece
-                tb.move(piece, m)
+                tb.move(piece, m, testing=True)
                 val, _ = minimax(tb, d-1, False)
                 if val > max_eval:
                     max_eval = val
                     best_move = m
+                    if node_board is board:
+                        root['move'] = m
             return max_eval, best_move
         else:
             min_eval = 10**9
             for m in legal:
-                tb = copy.deepcopy(node_board)
+                tb = node_board.copy()
                 piece = tb.squares[m.initial.row][m.initial.col].piece
-                tb.move(piece, m)
+                tb.move(piece, m, testing=True)
                 val, _ = minimax(tb, d-1, True)
                 if val < min_eval:
                     min_eval = val
                     best_move = m
             return min_eval, best_move
 
-    _, move = minimax(board, depth, True)
+    t0 = time.perf_counter()
+    try:
+        score, move = minimax(board, depth, True)
+    except SearchStopped:
+        move = root['move']
+    else:
+        if ctx is not None and ctx.stats is not None:
+            ctx.stats.iteration(depth, ctx.nodes, time.perf_counter() - t0)
+            ctx.stats.score = score
+            ctx.stats.pv = [move_to_uci(move)] if move else []
     return move
 
 
-def deep_blue_bot(board, color, depth=4):
-    """Alpha-beta minimax with a simple positional evaluation (material + piece-square tables)."""
-    # piece-square tables (very small heuristic) for pawns and knights/others as example
-    PST = {
-        'pawn': [0, 5, 5, 0, 5, 10, 50, 0],
-        'knight': [-50, -40, -30, -30, -30, -30, -40, -50],
-        'bishop': [-20, -10, -10, -10, -10, -10, -10, -20],
-        'rook': [0, 0, 5, 10, 10, 5, 0, 0],
-        'queen': [-20, 0, 10, 20, 20, 10, 0, -20],
-        'king': [20, 30, 10, 0, 0, 10, 30, 20]
-    }
+# --- deep blue search state ---
+# Transposition table shared by every deep_blue_bot call in this process, so a long-lived
+# engine process keeps what it learned between moves and while pondering.
+# Board.hash(side to move) -> (depth, score for the side to move, flag, best move (r1, c1, r2, c2))
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+TT_MAX_ENTRIES = 500000
+_tt = {}
+tt_stats = {'probes': 0, 'hits': 0}
+
+# Pawn hash table: pawn-structure score per Board.pawn_hash(). Pawn structure changes
+# far less often than the rest of the position, so most leaves find their score here.
+PAWN_TABLE_MAX_ENTRIES = 65536
+_pawn_table = {}
+pawn_table_stats = {'probes': 0, 'hits': 0}
+
+# deep_blue_bot evaluation weights: material (pawns) and piece-square bonuses by rank
+# (centipawns, index 0 = the piece's own back rank). tools/tune_eval.py fits them and
+# the pawn-structure terms below to game results and writes EVAL_WEIGHTS_PATH, which
+# replaces these defaults at startup.
+EVAL_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'eval_weights.json')
+PIECE_VALUES = {'pawn': 1.0, 'knight': 3.0, 'bishop': 3.001, 'rook': 5.0, 'queen': 9.0, 'king': 10000.0}
+PST = {
+    'pawn': [0, 5, 5, 0, 5, 10, 50, 0],
+    'knight': [-50, -40, -30, -30, -30, -30, -40, -50],
+    'bishop': [-20, -10, -10, -10, -10, -10, -10, -20],
+    'rook': [0, 0, 5, 10, 10, 5, 0, 0],
+    'queen': [-20, 0, 10, 20, 20, 10, 0, -20],
+    'king': [20, 30, 10, 0, 0, 10, 30, 20]
+}
+
+# pawn-structure terms (pawns)
+DOUBLED_PAWN_PENALTY = 0.15
+ISOLATED_PAWN_PENALTY = 0.12
+# passed pawn bonus by ranks advanced from the pawn's own second rank (2nd..7th rank)
+PASSED_PAWN_BONUS = [0.0, 0.05, 0.10, 0.20, 0.35, 0.60]
+
+# scores are in pawns; a mate outweighs any material balance
+MATE_SCORE = 1000.0
+# scores beyond this are mates (MATE_SCORE minus the plies to mate)
+MATE_THRESHOLD = MATE_SCORE - 100
+
+# quiescence search: captures only, at most this many plies beyond the nominal depth
+QS_MAX_PLY = 8
+
+
+def opponent(color):
+    return 'black' if color == 'white' else 'white'
+
+
+def move_key(move):
+    return (move.initial.row, move.initial.col, move.final.row, move.final.col)
+
+
+def score_to_tt(score, ply):
+    """Search score -> table score: mates counted from the node instead of the root."""
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    """Table score -> search score at `ply` (inverse of score_to_tt)."""
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def order_moves(board, moves):
+    """Sort `moves` in place for search: winning and even captures by static exchange
+    value (best first), then quiet moves in generation order, then losing captures."""
+    mailbox = board.mailbox()
+
+    def key(m):
+        frm = m.initial.row * 16 + m.initial.col
+        to = m.final.row * 16 + m.final.col
+        if not mailbox.is_capture(frm, to):
+            return 1, 0
+        gain = mailbox.see(frm, to)
+        return (0 if gain >= 0 else 2), -gain
+
+    moves.sort(key=key)
+    return moves
+
+
+def non_losing_moves(board, moves):
+    """Moves that do not lose material by static exchange (all of them if every move does)."""
+    safe = [m for m in moves if board.see(m) >= 0]
+    return safe or moves
+
+
+def tt_clear():
+    """Empty the transposition table and reset its counters (cold-start searches)."""
+    _tt.clear()
+    tt_stats['probes'] = 0
+    tt_stats['hits'] = 0
+
+
+def tt_store(key, depth, score, flag, best_move):
+    """Store a search result (score already converted by score_to_tt), keeping the table bounded."""
+    if len(_tt) >= TT_MAX_ENTRIES:
+        _tt.clear()
+    _tt[key] = (depth, score, flag, move_key(best_move))
+
+
+def pawn_table_clear():
+    """Empty the pawn hash table and reset its counters."""
+    _pawn_table.clear()
+    pawn_table_stats['probes'] = 0
+    pawn_table_stats['hits'] = 0
+
+
+def load_eval_weights(path=EVAL_WEIGHTS_PATH):
+    """Replace the evaluation weights with the ones in `path` (written by tools/tune_eval.py).
+
+    Returns True if they were loaded; a missing or unreadable file keeps the current
+    weights. Cached scores are dropped since they came from the old weights.
+    """
+    global DOUBLED_PAWN_PENALTY, ISOLATED_PAWN_PENALTY
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            weights = json.load(f)
+        values = {name: float(v) for name, v in weights['piece_values'].items() if name in PIECE_VALUES}
+        pst = {name: [float(x) for x in table] for name, table in weights['pst'].items() if name in PST}
+        if any(len(table) != ROWS for table in pst.values()):
+            return False
+        doubled = float(weights.get('doubled_pawn_penalty', DOUBLED_PAWN_PENALTY))
+        isolated = float(weights.get('isolated_pawn_penalty', ISOLATED_PAWN_PENALTY))
+        passed = [float(x) for x in weights.get('passed_pawn_bonus', PASSED_PAWN_BONUS)]
+        if len(passed) != len(PASSED_PAWN_BONUS):
+            return False
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return False
+    PIECE_VALUES.update(values)
+    PST.update(pst)
+    DOUBLED_PAWN_PENALTY = doubled
+    ISOLATED_PAWN_PENALTY = isolated
+    PASSED_PAWN_BONUS[:] = passed
+    tt_clear()
+    pawn_table_clear()
+    return True
+
+
+# tuned weights, when tools/tune_eval.py has written them
+load_eval_weights()
+
+
+def pawn_structure(board):
+    """Pawn-structure score (white's point of view): doubled, isolated and passed pawns."""
+    pawns = {color: [sq for sq, p in board.piece_map[color].items() if p.name == 'pawn']
+             for color in ('white', 'black')}
+    score = 0.0
+    for color, sign in (('white', 1), ('black', -1)):
+        own = pawns[color]
+        enemy = pawns[opponent(color)]
+        files = [0] * (COLS + 2)
+        for _, c in own:
+            files[c + 1] += 1
+        for f in range(1, COLS + 1):
+            if files[f] > 1:
+                score -= sign * DOUBLED_PAWN_PENALTY * (files[f] - 1)
+        for r, c in own:
+            if not files[c] and not files[c + 2]:
+                score -= sign * ISOLATED_PAWN_PENALTY
+            # passed: no enemy pawn ahead on its own or a neighbouring file
+            if color == 'white':
+                blocked = any(er < r and abs(ec - c) <= 1 for er, ec in enemy)
+                advanced = 6 - r
+            else:
+                blocked = any(er > r and abs(ec - c) <= 1 for er, ec in enemy)
+                advanced = r - 1
+            # pawns can only stand on ranks 2-7; skip any a hand-set board put elsewhere
+            if not blocked and 0 <= advanced < len(PASSED_PAWN_BONUS):
+                score += sign * PASSED_PAWN_BONUS[advanced]
+    return score
+
+
+def pawn_eval(board, stats=None):
+    """pawn_structure(board) through the pawn hash table."""
+    key = board.pawn_hash()
+    pawn_table_stats['probes'] += 1
+    if stats is not None:
+        stats.pawn_probes += 1
+    score = _pawn_table.get(key)
+    if score is not None:
+        pawn_table_stats['hits'] += 1
+        if stats is not None:
+            stats.pawn_hits += 1
+        return score
+    score = pawn_structure(board)
+    if len(_pawn_table) >= PAWN_TABLE_MAX_ENTRIES:
+        _pawn_table.clear()
+    _pawn_table[key] = score
+    return score
+
+
+def tt_best_move(board, color):
+    """Best move stored in the transposition table for `color` to move in `board`, if legal."""
+    entry = _tt.get(board.hash(color))
+    if entry is None or entry[3] is None:
+        return None
+    for m in all_legal_moves(board, color):
+        if move_key(m) == entry[3]:
+            return m
+    return None
+
 
+def tt_principal_variation(board, color, max_len=8):
+    """Expected line from `board`: follow the table's best moves (at most max_len plies)."""
+    pv = []
+    seen = set()
+    node = board.copy()
+    side = color
+    while len(pv) < max_len:
+        key = node.hash(side)
+        if key in seen:
+            break
+        seen.add(key)
+        m = tt_best_move(node, side)
+        if m is None:
+            break
+        pv.append(m)
+        piece = node.squares[m.initial.row][m.initial.col].piece
+        node.move(piece, m, testing=True)
+        side = opponent(side)
+    return pv
+
+
+def deep_blue_bot(board, color, depth=4, ctx=None, on_iteration=None, multipv=1):
+    """Iterative-deepening alpha-beta (negamax) with a simple positional evaluation
+    (material + piece-square tables + cached pawn structure) and a transposition table.
+    Leaves are resolved by a capture-only quiescence search; captures are ordered and
+    clearly losing ones pruned there by static exchange evaluation (Board.see).
+
+    ctx: optional SearchContext; when it stops the search returns the best move of the
+    last completed iteration (None if the first one did not complete).
+    on_iteration: optional callback(depth, move, score) after every completed iteration.
+    multipv: when > 1, return a ranked list of up to that many (move, score, pv) for the
+    best root moves (score for `color`, pv in UCI) instead of one move. They come from a
+    single search: every root move is searched with a window whose lower bound is the
+    n-th best score so far, so moves that cannot enter the list fail low cheaply.
+    """
     def eval_board(bd):
-        # base material evaluation
+        # material plus piece-square bonus (PIECE_VALUES / PST, see load_eval_weights)
         val = 0
-        for r in range(ROWS):
-            for c in range(COLS):
-                sq = bd.squares[r][c]
-                if sq.has_piece():
-                    p = sq.piece
-                    pv = p.value
-                    val += pv
-                    # add small PST bonus depending on color
-                    name = p.name
-                    if name in PST:
-                        # for white, table index is rank from white's perspective
-                        idx = (7 - r) if p.color == 'white' else r
-                        # Use absolute value scaled down
-                        val += (PST[name][idx] / 100.0) * (1 if p.color == 'white' else -1)
-        return val
-
-    def alpha_beta(node_board, depth_left, alpha, beta, maximizing):
+        for r, _, p in bd.pieces():
+            name = p.name
+            sign = 1 if p.color == 'white' else -1
+            val += PIECE_VALUES[name] * sign
+            # for white, table index is rank from white's perspective
+            idx = (7 - r) if p.color == 'white' else r
+            val += (PST[name][idx] / 100.0) * sign
+        return val + pawn_eval(bd, stats)
+
+    stats = ctx.stats if ctx is not None else None
+
+    def quiesce(node_board, alpha, beta, side, ply, qply):
+        # captures only, until the position is quiet; the side to move may stand pat
+        # unless it is in check, then every evasion is searched (and no evasion is mate)
+        if ctx is not None:
+            ctx.check()
+        if stats is not None:
+            stats.qnodes += 1
+        v = eval_board(node_board)
+        stand_pat = v if side == 'white' else -v
+        if qply >= QS_MAX_PLY:
+            return stand_pat
+        mailbox = node_board.mailbox()
+        if mailbox.in_check(side == 'black'):
+            moves = order_moves(node_board, all_legal_moves(node_board, side))
+            if not moves:
+                return -MATE_SCORE + ply
+        else:
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            captures = []
+            for r, c, fr, fc in node_board.legal_moves(side):
+                frm, to = r * 16 + c, fr * 16 + fc
+                if mailbox.is_capture(frm, to):
+                    gain = mailbox.see(frm, to)
+                    # a capture that loses material cannot raise alpha over standing pat
+                    if gain >= 0:
+                        captures.append((gain, Move(Square(r, c), Square(fr, fc))))
+            captures.sort(key=lambda x: -x[0])
+            moves = [m for _, m in captures]
+        for m in moves:
+            tb = node_board.copy()
+            tb.move(tb.squares[m.initial.row][m.initial.col].piece, m, testing=True)
+            v = -quiesce(tb, -beta, -alpha, opponent(side), ply + 1, qply + 1)
+            if v >= beta:
+                return v
+            alpha = max(alpha, v)
+        return alpha
+
+    def negamax(node_board, depth_left, alpha, beta, side, ply):
+        # scores are from the point of view of `side` (the side to move)
+        if ctx is not None:
+            ctx.check()
+        # a position repeated on the path (or the fifty-move rule) is a draw: cut the subtree
+        if ply > 0 and (node_board.is_repetition() or node_board.is_fifty_moves()):
+            return 0.0, None
+
+        alpha_orig = alpha
+        key = node_board.hash(side)
+        tt_stats['probes'] += 1
+        entry = _tt.get(key)
+        tt_move = None
+        if stats is not None:
+            stats.tt_probes += 1
+            if entry is not None:
+                stats.tt_hits += 1
+        if entry is not None:
+            tt_stats['hits'] += 1
+            e_depth, e_score, e_flag, tt_move = entry
+            e_score = score_from_tt(e_score, ply)
+            if e_depth >= depth_left and ply > 0:
+                if e_flag == TT_EXACT:
+                    return e_score, None
+                elif e_flag == TT_LOWER:
+                    alpha = max(alpha, e_score)
+                else:
+                    beta = min(beta, e_score)
+                if alpha >= beta:
+                    return e_score, None
+
         # terminal or depth
         if depth_left == 0:
-            return eval_board(node_board), None
+            return quiesce(node_board, alpha, beta, side, ply, 0), None
 
-        color_to_move = color if maximizing else ('black' if color == 'white' else 'white')
-        legal = all_legal_moves(node_board, color_to_move)
+        legal = all_legal_moves(node_board, side)
         if not legal:
-            return eval_board(node_board), None
+            # checkmate (prefer the quickest) or stalemate
+            if node_board.is_in_check(side):
+                return -MATE_SCORE + ply, None
+            return 0.0, None
+
+        # captures by exchange value, then the table move in front of everything
+        order_moves(node_board, legal)
+        if tt_move is not None:
+            for i, m in enumerate(legal):
+                if move_key(m) == tt_move:
+                    legal.insert(0, legal.pop(i))
+                    break
 
+        best_score = -10**9
         best_move = None
-        if maximizing:
-            value = -10**9
-            for m in legal:
-                tb = copy.deepcopy(node_board)
-                piece = tb.squares[m.initial.row][m.initial.col].piece
-                tb.move(piece, m)
-                v, _ = alpha_beta(tb, depth_left - 1, alpha, beta, False)
-                if v > value:
-                    value = v
-                    best_move = m
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    break
-            return value, best_move
+        for i, m in enumerate(legal):
+            tb = node_board.copy()
+            piece = tb.squares[m.initial.row][m.initial.col].piece
+            tb.move(piece, m, testing=True)
+            v, _ = negamax(tb, depth_left - 1, -beta, -alpha, opponent(side), ply + 1)
+            v = -v
+            if v > best_score:
+                best_score = v
+                best_move = m
+            alpha = max(alpha, v)
+            if alpha >= beta:
+                if stats is not None:
+                    stats.beta_cutoffs += 1
+                    if i == 0:
+                        stats.first_move_cutoffs += 1
+                break
+
+        if best_score <= alpha_orig:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
         else:
-            value = 10**9
-            for m in legal:
-                tb = copy.deepcopy(node_board)
-                piece = tb.squares[m.initial.row][m.initial.col].piece
-                tb.move(piece, m)
-                v, _ = alpha_beta(tb, depth_left - 1, alpha, beta, True)
-                if v < value:
-                    value = v
-                    best_move = m
-                beta = min(beta, value)
-                if alpha >= beta:
-                    break
-            return value, best_move
-
-    _, move = alpha_beta(board, depth, -10**9, 10**9, True)
+            flag = TT_EXACT
+        tt_store(key, depth_left, score_to_tt(best_score, ply), flag, best_move)
+        return best_score, best_move
+
+    def search_root(d, root_moves):
+        # N-best root: [(score, move)] of the best `multipv` moves, best first
+        ranked = []
+        for m in root_moves:
+            floor = ranked[-1][0] if len(ranked) >= multipv else -10**9
+            tb = board.copy()
+            piece = tb.squares[m.initial.row][m.initial.col].piece
+            tb.move(piece, m, testing=True)
+            v, _ = negamax(tb, d - 1, -10**9, -floor, opponent(color), 1)
+            v = -v
+            if v > floor:
+                # stable: a move tying an earlier one ranks after it
+                i = len(ranked)
+                while i > 0 and ranked[i - 1][0] < v:
+                    i -= 1
+                ranked.insert(i, (v, m))
+                del ranked[multipv:]
+        if ranked:
+            # the best move is exact: keep it in the table for ordering and the PV
+            tt_store(board.hash(color), d, score_to_tt(ranked[0][0], 0), TT_EXACT, ranked[0][1])
+        return ranked
+
+    move = None
+    lines = []
+    root_moves = None
+    if multipv > 1:
+        root_moves = order_moves(board, all_legal_moves(board, color))
+    t0 = time.perf_counter()
+    for d in range(1, depth + 1):
+        try:
+            if multipv > 1:
+                ranked = search_root(d, root_moves)
+                score, m = ranked[0] if ranked else (0.0, None)
+            else:
+                score, m = negamax(board, d, -10**9, 10**9, color, 0)
+        except SearchStopped:
+            break
+        if multipv > 1:
+            # search the last ranking first next time
+            first = [rm for _, rm in ranked]
+            root_moves = first + [rm for rm in root_moves if rm not in first]
+            lines = []
+            for v, rm in ranked:
+                tb = board.copy()
+                tb.move(tb.squares[rm.initial.row][rm.initial.col].piece, rm, testing=True)
+                pv = [rm] + tt_principal_variation(tb, opponent(color), d - 1)
+                lines.append((rm, v, [move_to_uci(x) for x in pv]))
+        if m is not None:
+            move = m
+        if stats is not None:
+            stats.iteration(d, ctx.nodes, time.perf_counter() - t0)
+            stats.score = score
+        if on_iteration is not None:
+            on_iteration(d, move, score)
+    if move is None:
+        # stopped before the first iteration completed: still answer with a legal move,
+        # the table's choice if it has one, else the first one in search order
+        move = tt_best_move(board, color)
+        if move is None:
+            legal = order_moves(board, all_legal_moves(board, color))
+            move = legal[0] if legal else None
+        if move is not None and multipv > 1:
+            lines = [(move, None, [move_to_uci(move)])]
+    if stats is not None and move is not None:
+        if lines:
+            stats.pv = lines[0][2]
+        else:
+            stats.pv = [move_to_uci(m) for m in tt_principal_variation(board, color, stats.depth)] \
+                or [move_to_uci(move)]
+    if multipv > 1:
+        return lines
     return move
 
 
@@ -237,8 +630,9 @@ def magnus_bot(board, color, randomness=0.0):
     fen = board_to_fen(board, color_to_move=color)
     if fen is None:
         return None
-    # book keys use the same normalized FEN shape as board_to_fen
-    moves_dict = book.get(fen)
+    # book keys are full FENs with the move clocks zeroed
+    import magnus_book as _mb
+    moves_dict = book.get(_mb.simplify_fen(fen))
     if not moves_dict:
         return None
 
@@ -268,7 +662,61 @@ def magnus_bot(board, color, randomness=0.0):
 
 
 # unify API
-def get_bot_move(board, color, engine='random', depth=2):
+def get_bot_move(board, color, engine='random', depth=2, ctx=None, with_stats=False, multipv=1):
+    """Return a Move for `color` from the named engine (None if it has none).
+
+    ctx: optional SearchContext (deadline, node limit, stop flag) honoured by every
+    engine; external UCI engines are sent `stop` when it fires.
+    with_stats: return (move, SearchStats) instead, with the nodes, cutoffs, TT
+    traffic, depth and per-iteration timings of this search.
+    multipv: when > 1, return a ranked list of up to that many (move, score, pv) tuples
+    (score for `color` in pawns, pv in UCI) instead of one Move. deepblue finds them in
+    one search; the other engines only rank their single move (score None).
+    """
+    if multipv > 1:
+        return _multipv(board, color, engine, depth, ctx, with_stats, multipv)
+    if not with_stats:
+        return _bot_move(board, color, engine, depth, ctx)
+    if ctx is None:
+        ctx = SearchContext()
+    stats = ctx.stats = SearchStats(engine)
+    nodes_before = ctx.nodes
+    t0 = time.perf_counter()
+    try:
+        move = _bot_move(board, color, engine, depth, ctx)
+    finally:
+        stats.time_s = time.perf_counter() - t0
+        stats.nodes = ctx.nodes - nodes_before
+        ctx.stats = None
+    return move, stats
+
+
+def _multipv(board, color, engine, depth, ctx, with_stats, multipv):
+    if engine in ('deepblue', 'deep_blue'):
+        if ctx is None:
+            ctx = SearchContext()
+        stats = ctx.stats = SearchStats(engine) if with_stats else None
+        nodes_before = ctx.nodes
+        t0 = time.perf_counter()
+        try:
+            lines = deep_blue_bot(board, color, depth=depth, ctx=ctx, multipv=multipv)
+        finally:
+            if stats is not None:
+                stats.time_s = time.perf_counter() - t0
+                stats.nodes = ctx.nodes - nodes_before
+            ctx.stats = None
+        return (lines, stats) if with_stats else lines
+    result = get_bot_move(board, color, engine, depth, ctx, with_stats)
+    move, stats = result if with_stats else (result, None)
+    lines = []
+    if move is not None:
+        score = stats.score if stats is not None else None
+        pv = stats.pv if stats is not None and stats.pv else [move_to_uci(move)]
+        lines.append((move, score, pv))
+    return (lines, stats) if with_stats else lines
+
+
+def _bot_move(board, color, engine, depth, ctx):
     # magnus book selection: try book first then fall back
     if engine == 'magnus':
         try:
@@ -278,179 +726,176 @@ def get_bot_move(board, color, engine='random', depth=2):
         except Exception:
             pass
         # fallback chain: deepblue -> stockfish -> random
-        m = deep_blue_bot(board, color, depth=2)
-        if m:
+        m = deep_blue_bot(board, color, depth=2, ctx=ctx)
+        if m or (ctx is not None and ctx.stopped()):
             return m
-        try:
-            return get_bot_move(board, color, engine='stockfish', depth=depth)
-        except Exception:
-            return random_bot(board, color)
+        m = _bot_move(board, color, 'stockfish', depth, ctx)
+        return m or random_bot(board, color, ctx=ctx)
     if engine == 'random':
-        return random_bot(board, color)
+        return random_bot(board, color, ctx=ctx)
     elif engine == 'minimax':
-        return minimax_bot(board, color, depth=depth)
+        return minimax_bot(board, color, depth=depth, ctx=ctx)
     elif engine == 'deepblue' or engine == 'deep_blue':
-        return deep_blue_bot(board, color, depth=depth)
+        return deep_blue_bot(board, color, depth=depth, ctx=ctx)
     elif engine == 'stockfish':
-        # Try to use python-chess if available, otherwise try calling stockfish directly via subprocess.
-        try:
-            import chess
-            import chess.engine
-        except Exception:
-            # python-chess not available; try subprocess UCI call (best-effort)
-            engines_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'engines')
-            default_path = os.path.join(engines_dir, 'stockfish-windows-x86-64-avx2')
-            if not os.path.exists(default_path):
-                default_path = os.path.join(engines_dir, 'stockfish.exe')
-            path = os.environ.get('STOCKFISH_PATH', default_path)
-            # We need FEN from our board
-            fen = board_to_fen(board, color_to_move=color)
-            if fen is None:
-                return None
-            try:
-                # start stockfish process
-                p = subprocess.Popen([path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                # send commands
-                p.stdin.write(f'position fen {fen}\n')
-                p.stdin.write(f'go depth {depth}\n')
-                p.stdin.flush()
-                # read until bestmove
-                best = None
-                while True:
-                    line = p.stdout.readline()
-                    if not line:
-                        break
-                    if line.startswith('bestmove'):
-                        parts = line.split()
-                        if len(parts) >= 2:
-                            best = parts[1]
-                        break
-                p.stdin.write('quit\n')
-                p.stdin.flush()
-                p.terminate()
-                if best:
-                    return uci_to_move(best)
-            except Exception:
-                return None
+        engines_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'engines')
+        default_path = os.path.join(engines_dir, 'stockfish-windows-x86-64-avx2')
+        if not os.path.exists(default_path):
+            default_path = os.path.join(engines_dir, 'stockfish.exe')
+        path = os.environ.get('STOCKFISH_PATH', default_path)
+        # Limit both time and depth for more human-like play
+        return uci_engine_move(path, board, color, depth, think_time=0.5, ctx=ctx)
+    elif engine == 'komodo':
+        # allow env override, otherwise try to discover a komodo binary in engines/
+        # (some distributions are named 'dragon-64bit...' etc.)
+        path = os.environ.get('KOMODO_PATH') or find_engine_binary('komodo') or find_engine_binary('dragon')
+        if not path:
+            return None
+        return uci_engine_move(path, board, color, depth, think_time=0.75, ctx=ctx)
+    else:
+        # unknown engine
+        return None
 
-        # using python-chess
-        try:
-            import chess
-            import chess.engine
-            engines_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'engines')
-            default_path = os.path.join(engines_dir, 'stockfish-windows-x86-64-avx2')
-            if not os.path.exists(default_path):
-                default_path = os.path.join(engines_dir, 'stockfish.exe')
-            path = os.environ.get('STOCKFISH_PATH', default_path)
-            engine_proc = chess.engine.SimpleEngine.popen_uci(path)
-            fen = board_to_fen(board, color_to_move=color)
-            if fen is None:
-                engine_proc.quit()
-                return None
-            cb = chess.Board(fen)
-            # Limit both time and depth for more human-like play
-            limit = chess.engine.Limit(time=0.5, depth=depth)
+
+def uci_engine_move(path, board, color, depth, think_time=0.5, ctx=None):
+    """Ask the external UCI engine at `path` for a move.
+
+    Uses python-chess when it is available and falls back to talking UCI over a pipe.
+    The search is limited to `depth` plies and `think_time` seconds (less if the
+    context's deadline is closer); when the context stops, the engine is sent `stop`
+    and its best move so far is returned.
+    """
+    if ctx is not None and ctx.stopped():
+        return None
+    fen = board_to_fen(board, color_to_move=color)
+    if fen is None:
+        return None
+    if ctx is not None and ctx.remaining() is not None:
+        think_time = min(think_time, ctx.remaining())
+    nodes = None
+    if ctx is not None and ctx.node_limit is not None:
+        nodes = max(1, ctx.node_limit - ctx.nodes)
+
+    try:
+        import chess
+        import chess.engine
+    except Exception:
+        return _uci_pipe_move(path, fen, depth, think_time, nodes, ctx)
+
+    try:
+        engine_proc = chess.engine.SimpleEngine.popen_uci(path)
+    except Exception:
+        return _uci_pipe_move(path, fen, depth, think_time, nodes, ctx)
+    try:
+        cb = chess.Board(fen)
+        limit = chess.engine.Limit(time=think_time, depth=depth, nodes=nodes)
+        if ctx is None:
             res = engine_proc.play(cb, limit)
-            engine_proc.quit()
-            if res and res.move:
-                return uci_to_move(res.move.uci())
-        except Exception:
-            return None
-    elif engine == 'komodo':
-        # Try python-chess engine interface first
+            move = res.move if res else None
+        else:
+            with engine_proc.analysis(cb, limit) as analysis:
+                # the watcher sends `stop` if the context fires first
+                done = ctx.watch(analysis.stop)
+                try:
+                    best = analysis.wait()
+                finally:
+                    done.set()
+                ctx.nodes += analysis.info.get('nodes', 0)
+                if ctx.stats is not None:
+                    info = analysis.info
+                    ctx.stats.depth = info.get('depth', 0)
+                    if 'score' in info:
+                        pov = info['score'].pov(cb.turn)
+                        ctx.stats.score = MATE_SCORE if pov.is_mate() and pov.mate() > 0 else \
+                            -MATE_SCORE if pov.is_mate() else pov.score() / 100.0
+                    ctx.stats.pv = [m.uci() for m in info.get('pv', [])]
+            move = best.move if best else None
+        if move:
+            return uci_to_move(move.uci())
+    except Exception:
+        return None
+    finally:
         try:
-            import chess
-            import chess.engine
-            # allow env override, otherwise try to discover a komodo binary in engines/
-            path = os.environ.get('KOMODO_PATH')
-            if not path:
-                # try common Komodo names, some distributions are named 'dragon-64bit...' etc.
-                path = find_engine_binary('komodo') or find_engine_binary('dragon')
-            if not path:
-                return None
-            engine_proc = chess.engine.SimpleEngine.popen_uci(path)
-            fen = board_to_fen(board, color_to_move=color)
-            if fen is None:
-                engine_proc.quit()
-                return None
-            cb = chess.Board(fen)
-            limit = chess.engine.Limit(time=0.75, depth=depth)
-            res = engine_proc.play(cb, limit)
             engine_proc.quit()
-            if res and res.move:
-                return uci_to_move(res.move.uci())
         except Exception:
-            # fallback: direct subprocess UCI
-            path = os.environ.get('KOMODO_PATH', find_engine_binary('komodo') or find_engine_binary('dragon') or 'komodo')
-            fen = board_to_fen(board, color_to_move=color)
-            if fen is None:
-                return None
-            try:
-                p = subprocess.Popen([path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                p.stdin.write(f'position fen {fen}\n')
-                p.stdin.write(f'go depth {depth}\n')
-                p.stdin.flush()
-                best = None
-                while True:
-                    line = p.stdout.readline()
-                    if not line:
-                        break
-                    if line.startswith('bestmove'):
-                        parts = line.split()
-                        if len(parts) >= 2:
-                            best = parts[1]
-                        break
-                p.stdin.write('quit\n')
-                p.stdin.flush()
-                p.terminate()
-                if best:
-                    return uci_to_move(best)
-            except Exception:
-                return None
-    else:
-        # unknown engine
+            pass
+    return None
+
+
+def _uci_pipe_move(path, fen, depth, think_time, nodes, ctx):
+    """Best-effort raw UCI conversation with an engine subprocess (no python-chess)."""
+    try:
+        p = subprocess.Popen([path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except Exception:
         return None
 
+    def send(line):
+        try:
+            p.stdin.write(line + '\n')
+            p.stdin.flush()
+        except (OSError, ValueError):
+            pass
+
+    done = None
+    try:
+        go = f'go depth {depth}'
+        if think_time is not None:
+            go += f' movetime {max(1, int(think_time * 1000))}'
+        if nodes is not None:
+            go += f' nodes {nodes}'
+        send(f'position fen {fen}')
+        send(go)
+        if ctx is not None:
+            done = ctx.watch(lambda: send('stop'))
+        # read until bestmove (also sent after `stop`)
+        best = None
+        info = {}
+        while True:
+            line = p.stdout.readline()
+            if not line:
+                break
+            if ctx is not None and line.startswith('info'):
+                parts = line.split()
+                for field in ('nodes', 'depth', 'cp', 'mate'):
+                    if field in parts:
+                        try:
+                            info[field] = int(parts[parts.index(field) + 1])
+                        except (ValueError, IndexError):
+                            pass
+                if 'pv' in parts:
+                    info['pv'] = parts[parts.index('pv') + 1:]
+            if line.startswith('bestmove'):
+                parts = line.split()
+                if len(parts) >= 2 and parts[1] != '(none)':
+                    best = parts[1]
+                break
+        if ctx is not None:
+            ctx.nodes += info.get('nodes', 0)
+            if ctx.stats is not None:
+                ctx.stats.depth = info.get('depth', 0)
+                if 'mate' in info:
+                    ctx.stats.score = MATE_SCORE if info['mate'] > 0 else -MATE_SCORE
+                elif 'cp' in info:
+                    ctx.stats.score = info['cp'] / 100.0
+                ctx.stats.pv = info.get('pv', [])
+        send('quit')
+        return uci_to_move(best) if best else None
+    except Exception:
+        return None
+    finally:
+        if done is not None:
+            done.set()
+        p.terminate()
+
 
 def board_to_fen(board, color_to_move='white'):
-    """Convert the internal board representation to a FEN string (best-effort).
+    """Convert the internal board representation to a full FEN string.
 
-    Note: castling rights and en-passant are set to '-' (unknown). Halfmove/fullmove set to 0/1.
+    Castling rights, the en-passant square and the move clocks are taken from the board
+    (see Board.to_fen). Returns None if the board cannot be serialized.
     """
     try:
-        rows = []
-        for r in range(ROWS):
-            fen_rank = ''
-            empty = 0
-            for c in range(COLS):
-                sq = board.squares[r][c]
-                if sq.has_piece():
-                    if empty > 0:
-                        fen_rank += str(empty)
-                        empty = 0
-                    p = sq.piece
-                    ch = 'p'
-                    if p.name == 'pawn': ch = 'p'
-                    elif p.name == 'knight': ch = 'n'
-                    elif p.name == 'bishop': ch = 'b'
-                    elif p.name == 'rook': ch = 'r'
-                    elif p.name == 'queen': ch = 'q'
-                    elif p.name == 'king': ch = 'k'
-                    if p.color == 'white': ch = ch.upper()
-                    fen_rank += ch
-                else:
-                    empty += 1
-            if empty > 0:
-                fen_rank += str(empty)
-            rows.append(fen_rank)
-
-        # our rows are 0..7 top-to-bottom; FEN expects ranks 8..1 left-to-right so join in that order
-        fen_board = '/'.join(rows)
-        # active color
-        active = 'w' if color_to_move == 'white' else 'b'
-        # minimal FEN: no castling info
-        fen = f"{fen_board} {active} - - 0 1"
-        return fen
+        return board.to_fen(color_to_move)
     except Exception:
         return None
 
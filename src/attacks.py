@@ -0,0 +1,97 @@
+import marshal
+import os
+
+# Precomputed attack tables on the 0x88 board (see mailbox.py): for every square,
+# the squares a knight, king or pawn attacks and the rays a slider walks along.
+# Built once and kept in data/attack_tables.marshal so later starts just load them;
+# the file is rebuilt whenever it is missing, unreadable or from another version.
+
+OFF_BOARD = 0x88
+
+# offsets in the order Board.calc_moves has always listed its moves
+KNIGHT_OFFSETS = (-31, -14, 18, 33, 31, 14, -18, -33)
+KING_OFFSETS = (-16, -15, 1, 17, 16, 15, -1, -17)
+BISHOP_DIRS = (-15, -17, 17, 15)
+ROOK_DIRS = (-16, 1, 16, -1)
+QUEEN_DIRS = BISHOP_DIRS + ROOK_DIRS
+
+TABLES_VERSION = 1
+CACHE_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                           'data', 'attack_tables.marshal'))
+
+
+def squares():
+    """The 64 on-board 0x88 squares, a8 first."""
+    return [row * 16 + col for row in range(8) for col in range(8)]
+
+
+def build_tables():
+    """Compute every table from the offsets (tuples of 0x88 squares, indexed by square)."""
+    def steps(sq, offsets):
+        return tuple(sq + off for off in offsets if not (sq + off) & OFF_BOARD)
+
+    def ray(sq, d):
+        out = []
+        s = sq + d
+        while not s & OFF_BOARD:
+            out.append(s)
+            s += d
+        return tuple(out)
+
+    empty = ()
+    knight, king, bishop, rook = ([empty] * 128 for _ in range(4))
+    pawn = [[empty] * 128, [empty] * 128]
+    for sq in squares():
+        knight[sq] = steps(sq, KNIGHT_OFFSETS)
+        king[sq] = steps(sq, KING_OFFSETS)
+        # captures of a white pawn (moving up the board) and of a black one
+        pawn[0][sq] = steps(sq, (-17, -15))
+        pawn[1][sq] = steps(sq, (15, 17))
+        bishop[sq] = tuple(ray(sq, d) for d in BISHOP_DIRS)
+        rook[sq] = tuple(ray(sq, d) for d in ROOK_DIRS)
+    return {
+        'version': TABLES_VERSION,
+        'knight': tuple(knight),
+        'king': tuple(king),
+        'pawn': (tuple(pawn[0]), tuple(pawn[1])),
+        'bishop': tuple(bishop),
+        'rook': tuple(rook),
+    }
+
+
+def load_tables(path=CACHE_PATH):
+    '''
+        Tables from the on-disk cache, or freshly built (and cached when the data
+        directory is writable)
+    '''
+    try:
+        with open(path, 'rb') as f:
+            tables = marshal.load(f)
+        if isinstance(tables, dict) and tables.get('version') == TABLES_VERSION:
+            return tables
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    tables = build_tables()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            marshal.dump(tables, f)
+        os.replace(tmp, path)
+    except OSError:
+        # read-only install (e.g. a bundled executable): just use the built tables
+        pass
+    return tables
+
+
+_tables = load_tables()
+
+KNIGHT_ATTACKS = _tables['knight']
+KING_ATTACKS = _tables['king']
+# PAWN_ATTACKS[black][sq]: squares a pawn of that colour on sq attacks; a square is
+# attacked by a white pawn standing on PAWN_ATTACKS[1][sq] (and vice versa)
+PAWN_ATTACKS = _tables['pawn']
+# rays per square, one tuple of squares per direction (nearest square first)
+BISHOP_RAYS = _tables['bishop']
+ROOK_RAYS = _tables['rook']
+QUEEN_RAYS = tuple(b + r for b, r in zip(BISHOP_RAYS, ROOK_RAYS))
@@ -0,0 +1,320 @@
+import numpy as np
+
+from board import SNAPSHOT_SIZE
+from mailbox import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, BLACK, EN_PASSANT, CASTLING
+
+# Batched move generation for dataset work: expands N positions by one ply at once
+# with NumPy bitboards instead of Board.calc_moves one piece at a time.
+#
+# Positions are encoded as Board.snapshot() bytes stacked into an (N, SNAPSHOT_SIZE)
+# uint8 array (see encode()). Bit s of a bitboard is square s = row * 8 + col, row 0
+# being rank 8 as on the Board. Moves come back as one flat uint16 array,
+#     from | to << 6 | flags << 12   (flags: EN_PASSANT, CASTLING, PROMOTION)
+# with offsets[i]:offsets[i + 1] the slice holding the legal moves of position i.
+# Pawns always promote to a queen, as on the Board.
+#
+# Requires numpy (only the dataset tools import this module, the game does not).
+
+PROMOTION = 4
+
+U64 = np.uint64
+FILE_A = U64(0x0101010101010101)
+FILE_H = U64(0x8080808080808080)
+NOT_A = ~FILE_A
+NOT_H = ~FILE_H
+# pawns on their starting rank may double-step
+WHITE_PAWN_START = U64(0xFF) << U64(48)
+BLACK_PAWN_START = U64(0xFF) << U64(8)
+
+# header fields after the 64 piece codes (see board.SNAPSHOT_HEADER)
+_STM, _RIGHTS, _EP = 64, 65, 66
+# castling: (rights bit, black, king from, king to, rook from, squares that must be
+# empty, squares the king must not stand on or cross while attacked)
+_CASTLES = (
+    (1, False, 60, 62, 63, (61, 62), (60, 61, 62)),
+    (2, False, 60, 58, 56, (57, 58, 59), (60, 59, 58)),
+    (4, True, 4, 6, 7, (5, 6), (4, 5, 6)),
+    (8, True, 4, 2, 0, (1, 2, 3), (4, 3, 2)),
+)
+
+# chunk of positions handled per pass (bounds the temporary arrays)
+CHUNK = 65536
+
+
+def _bb(*squares):
+    b = 0
+    for s in squares:
+        b |= 1 << s
+    return U64(b)
+
+
+# shifts by direction (row - 1 is north, towards rank 8)
+def _north(b):
+    return b >> U64(8)
+
+
+def _south(b):
+    return b << U64(8)
+
+
+def _east(b):
+    return (b << U64(1)) & NOT_A
+
+
+def _west(b):
+    return (b >> U64(1)) & NOT_H
+
+
+def _north_east(b):
+    return (b >> U64(7)) & NOT_A
+
+
+def _north_west(b):
+    return (b >> U64(9)) & NOT_H
+
+
+def _south_east(b):
+    return (b << U64(9)) & NOT_A
+
+
+def _south_west(b):
+    return (b << U64(7)) & NOT_H
+
+
+BISHOP_SHIFTS = (_north_east, _north_west, _south_east, _south_west)
+ROOK_SHIFTS = (_north, _south, _east, _west)
+
+
+def _knight_attacks(b):
+    ne, nw, se, sw = _north_east(b), _north_west(b), _south_east(b), _south_west(b)
+    return (_north(ne) | _east(ne) | _north(nw) | _west(nw) |
+            _south(se) | _east(se) | _south(sw) | _west(sw))
+
+
+def _king_attacks(b):
+    return (_north(b) | _south(b) | _east(b) | _west(b) |
+            _north_east(b) | _north_west(b) | _south_east(b) | _south_west(b))
+
+
+def _pawn_attacks(b, black):
+    """Squares attacked by the pawns `b`; `black` is a bool array (or bool)."""
+    white = _north_east(b) | _north_west(b)
+    black_att = _south_east(b) | _south_west(b)
+    return np.where(black, black_att, white)
+
+
+def _slide(b, empty, shifts):
+    """Squares reached from every square of `b` along `shifts` (first blocker included)."""
+    out = np.zeros_like(b)
+    for shift in shifts:
+        gen = b
+        for _ in range(7):
+            gen = shift(gen)
+            out |= gen
+            gen = gen & empty
+    return out
+
+
+SQUARE_BB = np.array([1 << s for s in range(64)], dtype=U64)
+KNIGHT_BB = _knight_attacks(SQUARE_BB)
+KING_BB = _king_attacks(SQUARE_BB)
+
+
+def encode(boards):
+    """(N, SNAPSHOT_SIZE) uint8 array of the snapshots of `boards` (Board instances)."""
+    data = b''.join(b.snapshot() for b in boards)
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, SNAPSHOT_SIZE).copy()
+
+
+def bitboards(positions):
+    """
+    Piece bitboards of encoded positions: uint64 array of shape (16, N) indexed by
+    piece code (kind | BLACK), plus the side to move, castling rights and en-passant
+    target square (-1: none) as (N,) arrays.
+    """
+    positions = np.asarray(positions, dtype=np.uint8).reshape(-1, SNAPSHOT_SIZE)
+    cells = positions[:, :64]
+    bb = np.zeros((16, len(positions)), dtype=U64)
+    for color in (0, BLACK):
+        for kind in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            code = kind | color
+            packed = np.packbits(cells == code, axis=1, bitorder='little')
+            bb[code] = packed.view('<u8')[:, 0]
+    black = positions[:, _STM] != 0
+    rights = positions[:, _RIGHTS]
+    ep = positions[:, _EP].astype(np.int64)
+    # the square behind the pawn that just double-stepped
+    ep_target = np.where(ep == 255, -1, np.where(black, ep + 8, ep - 8))
+    return bb, black, rights, ep_target
+
+
+def _attacked(targets, occ, bb, by_black):
+    """
+    True where any square of `targets` is attacked by the side `by_black` (bool
+    arrays, one entry per row of `bb`, which holds 16 bitboards per position).
+    """
+    side = np.where(by_black, BLACK, 0)
+    cols = np.arange(bb.shape[1])
+
+    def enemy(kind):
+        return bb[kind + side, cols]
+
+    queens = enemy(QUEEN)
+    hits = _pawn_attacks(targets, ~by_black) & enemy(PAWN)
+    hits |= _knight_attacks(targets) & enemy(KNIGHT)
+    hits |= _king_attacks(targets) & enemy(KING)
+    empty = ~occ
+    hits |= _slide(targets, empty, BISHOP_SHIFTS) & (enemy(BISHOP) | queens)
+    hits |= _slide(targets, empty, ROOK_SHIFTS) & (enemy(ROOK) | queens)
+    return hits != 0
+
+
+def _expand(targets):
+    """(row index, square) of every set bit of the (K,) bitboards `targets`, in order."""
+    bits = np.unpackbits(targets.astype('<u8').view(np.uint8).reshape(-1, 8),
+                         axis=1, bitorder='little')
+    return np.nonzero(bits)
+
+
+def _generate_chunk(positions):
+    bb, black, rights, ep_target = bitboards(positions)
+    n = len(black)
+    white_occ = np.bitwise_or.reduce(bb[1:7], axis=0)
+    black_occ = np.bitwise_or.reduce(bb[9:15], axis=0)
+    occ = white_occ | black_occ
+    own = np.where(black, black_occ, white_occ)
+    enemy = np.where(black, white_occ, black_occ)
+
+    # every piece of the side to move: position, square, kind
+    cells = positions[:, :64]
+    mine = (cells != 0) & (((cells & BLACK) != 0) == black[:, None])
+    pos, frm = np.nonzero(mine)
+    kind = (cells[pos, frm] & 7).astype(np.int64)
+    piece_black = black[pos]
+    from_bb = SQUARE_BB[frm]
+    p_occ, p_own, p_enemy = occ[pos], own[pos], enemy[pos]
+    p_empty = ~p_occ
+
+    targets = np.zeros(len(pos), dtype=U64)
+    # pawns: pushes, double steps from the starting rank, captures and en passant
+    is_pawn = kind == PAWN
+    ep_bb = np.where(ep_target[pos] >= 0, SQUARE_BB[np.clip(ep_target[pos], 0, 63)], U64(0))
+    single = np.where(piece_black, _south(from_bb), _north(from_bb)) & p_empty
+    start = np.where(piece_black, BLACK_PAWN_START, WHITE_PAWN_START)
+    double = np.where(piece_black, _south(single), _north(single)) & p_empty
+    double = np.where((from_bb & start) != 0, double, U64(0))
+    captures = _pawn_attacks(from_bb, piece_black) & (p_enemy | ep_bb)
+    targets = np.where(is_pawn, single | double | captures, targets)
+    # leapers from the tables
+    targets = np.where(kind == KNIGHT, KNIGHT_BB[frm] & ~p_own, targets)
+    targets = np.where(kind == KING, KING_BB[frm] & ~p_own, targets)
+    # sliders
+    diagonal = (kind == BISHOP) | (kind == QUEEN)
+    straight = (kind == ROOK) | (kind == QUEEN)
+    sl = np.nonzero(diagonal | straight)[0]
+    if len(sl):
+        d = _slide(from_bb[sl], p_empty[sl], BISHOP_SHIFTS)
+        r = _slide(from_bb[sl], p_empty[sl], ROOK_SHIFTS)
+        rays = np.where(diagonal[sl], d, U64(0)) | np.where(straight[sl], r, U64(0))
+        targets[sl] = rays & ~p_own[sl]
+
+    piece, to = _expand(targets)
+    m_pos = pos[piece]
+    m_from = frm[piece]
+    m_to = to
+    m_kind = kind[piece]
+    flags = np.zeros(len(m_pos), dtype=np.int64)
+    pawn_move = m_kind == PAWN
+    flags[pawn_move & (m_to == ep_target[m_pos])] = EN_PASSANT
+    last_row = np.where(black[m_pos], m_to >= 56, m_to < 8)
+    flags[pawn_move & last_row] = PROMOTION
+
+    # castling: rights, empty squares between king and rook, king not in or through check
+    c_pos, c_from, c_to, c_rook = [], [], [], []
+    for bit, c_black, k_from, k_to, r_from, between, crossed in _CASTLES:
+        king_code = KING | (BLACK if c_black else 0)
+        rook_code = ROOK | (BLACK if c_black else 0)
+        ok = ((rights & bit) != 0) & (black == c_black)
+        ok &= (bb[king_code] & SQUARE_BB[k_from]) != 0
+        ok &= (bb[rook_code] & SQUARE_BB[r_from]) != 0
+        ok &= (occ & _bb(*between)) == 0
+        idx = np.nonzero(ok)[0]
+        if len(idx):
+            safe = ~_attacked(np.full(len(idx), _bb(*crossed)), occ[idx], bb[:, idx],
+                              np.full(len(idx), not c_black))
+            idx = idx[safe]
+            c_pos.append(idx)
+            c_from.append(np.full(len(idx), k_from))
+            c_to.append(np.full(len(idx), k_to))
+            c_rook.append(np.full(len(idx), r_from))
+
+    # legality in bulk: play every move on its bitboards and test the own king
+    legal = _legal(m_pos, m_from, m_to, m_kind, flags, bb, black)
+    m_pos, m_from, m_to, flags = m_pos[legal], m_from[legal], m_to[legal], flags[legal]
+    if c_pos:
+        m_pos = np.concatenate([m_pos] + c_pos)
+        m_from = np.concatenate([m_from] + c_from)
+        m_to = np.concatenate([m_to] + c_to)
+        flags = np.concatenate([flags, np.full(sum(len(c) for c in c_pos), CASTLING)])
+    order = np.argsort(m_pos, kind='stable')
+    moves = (m_from | (m_to << 6) | (flags << 12))[order].astype(np.uint16)
+    counts = np.bincount(m_pos, minlength=n)
+    return moves, counts
+
+
+def _legal(m_pos, m_from, m_to, m_kind, flags, bb, black):
+    """True for the moves (one entry each) that do not leave the mover's king attacked."""
+    if not len(m_pos):
+        return np.zeros(0, dtype=bool)
+    mb = bb[:, m_pos].copy()
+    m_black = black[m_pos]
+    side = np.where(m_black, BLACK, 0)
+    cols = np.arange(len(m_pos))
+    from_bb, to_bb = SQUARE_BB[m_from], SQUARE_BB[m_to]
+    # captured piece (en passant: the pawn beside the target square)
+    captured = to_bb.copy()
+    ep = flags == EN_PASSANT
+    captured[ep] = SQUARE_BB[np.where(m_black[ep], m_to[ep] - 8, m_to[ep] + 8)]
+    enemy_side = BLACK - side
+    for k in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+        mb[k + enemy_side, cols] &= ~captured
+    mover = m_kind + side
+    mb[mover, cols] = (mb[mover, cols] & ~from_bb) | to_bb
+    occ = np.bitwise_or.reduce(mb, axis=0)
+    king = mb[KING + side, cols]
+    return ~_attacked(king, occ, mb, ~m_black)
+
+
+def generate_moves(positions):
+    """
+    Legal moves of every encoded position (see encode()). Returns (moves, offsets):
+    a flat uint16 array and an (N + 1,) int64 array, the moves of position i being
+    moves[offsets[i]:offsets[i + 1]].
+    """
+    positions = np.asarray(positions, dtype=np.uint8).reshape(-1, SNAPSHOT_SIZE)
+    all_moves, all_counts = [], []
+    for start in range(0, len(positions), CHUNK):
+        moves, counts = _generate_chunk(positions[start:start + CHUNK])
+        all_moves.append(moves)
+        all_counts.append(counts)
+    offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+    if all_counts:
+        np.cumsum(np.concatenate(all_counts), out=offsets[1:])
+        moves = np.concatenate(all_moves)
+    else:
+        moves = np.zeros(0, dtype=np.uint16)
+    return moves, offsets
+
+
+def decode(moves):
+    """(from, to, flags) arrays of an array of encoded moves; squares are row * 8 + col."""
+    moves = np.asarray(moves, dtype=np.uint16)
+    return moves & 63, (moves >> 6) & 63, moves >> 12
+
+
+def move_to_uci(move):
+    """UCI text of one encoded move."""
+    move = int(move)
+    frm, to = move & 63, (move >> 6) & 63
+    uci = f'{chr(97 + frm % 8)}{8 - frm // 8}{chr(97 + to % 8)}{8 - to // 8}'
+    return uci + 'q' if move >> 12 == PROMOTION else uci
@@ -4,23 +4,361 @@ from piece import *
 from move import Move
 from sound import Sound
 from config import resource_path
-import copy
+from movecache import legal_move_cache
+from mailbox import Mailbox, PIECE_CODES, CASTLING, EN_PASSANT
+import zobrist
 import os
+import struct
+
+# FEN piece letters (lowercase = black, uppercase = white)
+FEN_PIECES = {'p': Pawn, 'n': Knight, 'b': Bishop, 'r': Rook, 'q': Queen, 'k': King}
+FEN_LETTERS = {'pawn': 'p', 'knight': 'n', 'bishop': 'b', 'rook': 'r', 'queen': 'q', 'king': 'k'}
+
+# Snapshots (Board.snapshot): one byte per square, row by row from a8, then a header.
+# Piece codes are the mailbox ones: 1-6 for white pawn..king, +8 for black, 0 for empty.
+SNAPSHOT_CODES = PIECE_CODES
+SNAPSHOT_PIECES = {code | black: (cls, 'black' if black else 'white')
+                   for cls, code in ((Pawn, 1), (Knight, 2), (Bishop, 3), (Rook, 4), (Queen, 5), (King, 6))
+                   for black in (0, 8)}
+SNAPSHOT_CASTLING = {'K': 1, 'Q': 2, 'k': 4, 'q': 8}
+# side to move (0 white, 1 black), castling bits, en-passant pawn square (255: none),
+# halfmove clock, fullmove number, placement key
+SNAPSHOT_HEADER = struct.Struct('<BBBHHQ')
+SNAPSHOT_SIZE = ROWS * COLS + SNAPSHOT_HEADER.size
 
 class Board:
 
     def __init__(self):
         self.squares = [[0, 0, 0, 0, 0, 0, 0, 0] for col in range(COLS)]
         self.last_move = None
+        self.turn = 'white'
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self._status = {}
+        self._ep_pawn = None
+        # 0x88 mailbox used by calc_moves (built on demand, dropped on every change)
+        self._mailbox = None
         self._create()
         self._add_pieces('white')
         self._add_pieces('black')
+        self._index_pieces()
+        self.rehash()
+        # position keys (Board.hash with the side to move) of every position so far
+        self.history = [self.hash()]
+
+    @classmethod
+    def from_fen(cls, fen):
+        '''
+            Build a board directly from a FEN string (no move replay, no deepcopy).
+            Castling rights are mapped onto the king/rook `moved` flags and the
+            en-passant square onto the `en_passant` flag of the pawn that just pushed.
+        '''
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f'invalid FEN (expected at least 4 fields): {fen!r}')
+        placement, active, castling, ep = fields[:4]
+        if active not in ('w', 'b'):
+            raise ValueError(f'invalid FEN active color: {active!r}')
+
+        board = cls.__new__(cls)
+        board.squares = [[0, 0, 0, 0, 0, 0, 0, 0] for col in range(COLS)]
+        board.last_move = None
+        board.turn = 'white' if active == 'w' else 'black'
+        try:
+            board.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            board.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError(f'invalid FEN move counters: {fen!r}')
+        board._status = {}
+        board._ep_pawn = None
+        board._mailbox = None
+        board._create()
+
+        # piece placement
+        ranks = placement.split('/')
+        if len(ranks) != ROWS:
+            raise ValueError(f'invalid FEN placement: {placement!r}')
+        for row, rank in enumerate(ranks):
+            col = 0
+            for ch in rank:
+                if ch.isdigit():
+                    col += int(ch)
+                    continue
+                piece_cls = FEN_PIECES.get(ch.lower())
+                if piece_cls is None or col >= COLS:
+                    raise ValueError(f'invalid FEN placement: {placement!r}')
+                piece = piece_cls('white' if ch.isupper() else 'black')
+                if isinstance(piece, Pawn):
+                    if row == 0 or row == ROWS - 1:
+                        raise ValueError(f'invalid FEN placement (pawn on rank {ROWS - row}): {placement!r}')
+                    # pawns only double-step from their starting rank
+                    piece.moved = row != (6 if piece.color == 'white' else 1)
+                elif isinstance(piece, (King, Rook)):
+                    # cleared below for every castling right present
+                    piece.moved = True
+                board.squares[row][col].piece = piece
+                col += 1
+            if col != COLS:
+                raise ValueError(f'invalid FEN placement: {placement!r}')
+
+        board._index_pieces()
+
+        # castling rights
+        if castling != '-':
+            for ch in castling:
+                color = 'white' if ch.isupper() else 'black'
+                row = 7 if color == 'white' else 0
+                rook_col = {'k': 7, 'q': 0}.get(ch.lower())
+                if rook_col is None:
+                    raise ValueError(f'invalid FEN castling field: {castling!r}')
+                king = board.squares[row][4].piece
+                rook = board.squares[row][rook_col].piece
+                if isinstance(king, King) and king.color == color and \
+                        isinstance(rook, Rook) and rook.color == color:
+                    king.moved = False
+                    rook.moved = False
+
+        # en passant target square -> flag the pawn that just double-stepped
+        if ep != '-':
+            if len(ep) != 2 or ep[0] not in 'abcdefgh' or ep[1] not in '36':
+                raise ValueError(f'invalid FEN en-passant field: {ep!r}')
+            col = ord(ep[0]) - ord('a')
+            row = 4 if ep[1] == '3' else 3
+            p = board.squares[row][col].piece
+            if isinstance(p, Pawn) and p.color == ('white' if ep[1] == '3' else 'black'):
+                p.en_passant = True
+                board._ep_pawn = p
+
+        board.rehash()
+        board.history = [board.hash()]
+        return board
+
+    def snapshot(self, color_to_move=None):
+        '''
+            Compact, picklable copy of the position: 64 piece codes plus a small header
+            (side to move, castling rights, en passant, clocks, placement key).
+            Restore it with Board.from_snapshot or Board.restore; the move history
+            and last move are not part of it.
+        '''
+        color = color_to_move or self.turn
+        data = bytearray(SNAPSHOT_SIZE)
+        ep = 255
+        for row, col, p in self.pieces():
+            i = row * COLS + col
+            data[i] = SNAPSHOT_CODES[p.name] | (8 if p.color == 'black' else 0)
+            if p is self._ep_pawn:
+                ep = i
+        rights = 0
+        for right in self.castling_rights():
+            rights |= SNAPSHOT_CASTLING.get(right, 0)
+        SNAPSHOT_HEADER.pack_into(data, ROWS * COLS, color == 'black', rights, ep,
+                                  self.halfmove_clock, self.fullmove_number, self._placement_key)
+        return bytes(data)
+
+    @classmethod
+    def from_snapshot(cls, data):
+        '''
+            Build a board from Board.snapshot() bytes
+        '''
+        board = cls.__new__(cls)
+        board.squares = [[Square(row, col) for col in range(COLS)] for row in range(ROWS)]
+        board.restore(data)
+        return board
+
+    def restore(self, data):
+        '''
+            Load a Board.snapshot() into this board in place (e.g. to undo moves).
+            The history restarts at the restored position.
+        '''
+        if len(data) != SNAPSHOT_SIZE:
+            raise ValueError(f'invalid board snapshot ({len(data)} bytes, expected {SNAPSHOT_SIZE})')
+        black, rights, ep, halfmove, fullmove, key = SNAPSHOT_HEADER.unpack_from(data, ROWS * COLS)
+        self.turn = 'black' if black else 'white'
+        self.halfmove_clock = halfmove
+        self.fullmove_number = fullmove
+        self.last_move = None
+        self._status = {}
+        self._ep_pawn = None
+        self._mailbox = None
+        self.piece_map = {'white': {}, 'black': {}}
+        self.king_squares = {'white': None, 'black': None}
+        i = 0
+        for row, rank in enumerate(self.squares):
+            for col, sq in enumerate(rank):
+                code = data[i]
+                if code:
+                    piece_cls, color = SNAPSHOT_PIECES[code]
+                    piece = piece_cls(color)
+                    self.piece_map[color][(row, col)] = piece
+                    if piece_cls is Pawn:
+                        # pawns only double-step from their starting rank
+                        piece.moved = row != (6 if color == 'white' else 1)
+                        if i == ep:
+                            piece.en_passant = True
+                            self._ep_pawn = piece
+                    elif piece_cls is King or piece_cls is Rook:
+                        # cleared below for every castling right present
+                        piece.moved = True
+                        if piece_cls is King:
+                            self.king_squares[color] = (row, col)
+                    sq.piece = piece
+                else:
+                    sq.piece = None
+                i += 1
+        for right, bit in SNAPSHOT_CASTLING.items():
+            if rights & bit:
+                row = 7 if right.isupper() else 0
+                self.squares[row][4].piece.moved = False
+                self.squares[row][7 if right.lower() == 'k' else 0].piece.moved = False
+        self._placement_key = key
+        self._pawn_key = zobrist.pawn_key(self)
+        self.history = [self.hash()]
+
+    def copy(self):
+        '''
+            Independent copy of the position, move history included (through a
+            snapshot: much cheaper than copy.deepcopy, which also copies cached moves)
+        '''
+        board = Board.from_snapshot(self.snapshot())
+        board.last_move = self.last_move
+        board.history = list(self.history)
+        return board
+
+    def to_fen(self, color_to_move=None):
+        '''
+            Serialize the position to a full FEN string (castling, en passant and clocks included)
+        '''
+        color = color_to_move or self.turn
+        rows = []
+        for row in range(ROWS):
+            fen_rank = ''
+            empty = 0
+            for col in range(COLS):
+                p = self.squares[row][col].piece
+                if p is None:
+                    empty += 1
+                    continue
+                if empty > 0:
+                    fen_rank += str(empty)
+                    empty = 0
+                ch = FEN_LETTERS[p.name]
+                fen_rank += ch.upper() if p.color == 'white' else ch
+            if empty > 0:
+                fen_rank += str(empty)
+            rows.append(fen_rank)
+
+        active = 'w' if color == 'white' else 'b'
+        ep = self.en_passant_square(color)
+        ep = f'{Square.get_alphacol(ep[1])}{ROWS - ep[0]}' if ep else '-'
+        return f"{'/'.join(rows)} {active} {self.castling_rights()} {ep} {self.halfmove_clock} {self.fullmove_number}"
+
+    def _index_pieces(self):
+        '''
+            Rebuild the per-colour piece lists and king squares from the squares
+            (Board.move keeps them up to date incrementally)
+        '''
+        self.piece_map = {'white': {}, 'black': {}}
+        self.king_squares = {'white': None, 'black': None}
+        for row in range(ROWS):
+            for col in range(COLS):
+                p = self.squares[row][col].piece
+                if p is not None:
+                    self.piece_map[p.color][(row, col)] = p
+                    if isinstance(p, King):
+                        self.king_squares[p.color] = (row, col)
+
+    def pieces(self, color=None):
+        '''
+            (row, col, piece) of every piece of `color` (both colours if None):
+            at most 16 (32) pieces instead of 64 squares. Not in board order.
+        '''
+        if color is None:
+            white, black = self.piece_map['white'], self.piece_map['black']
+            return [(row, col, p) for (row, col), p in white.items()] + \
+                [(row, col, p) for (row, col), p in black.items()]
+        return [(row, col, p) for (row, col), p in self.piece_map[color].items()]
+
+    def king_square(self, color):
+        '''
+            (row, col) of the king of `color`, or None
+        '''
+        return self.king_squares[color]
+
+    def rehash(self):
+        '''
+            Recompute the placement and pawn keys from scratch (Board.move keeps them
+            up to date incrementally)
+        '''
+        self._placement_key = zobrist.placement_key(self)
+        self._pawn_key = zobrist.pawn_key(self)
+
+    def pawn_hash(self):
+        '''
+            Zobrist key of the pawns alone (for the pawn-structure table)
+        '''
+        return self._pawn_key
+
+    def hash(self, color_to_move=None):
+        '''
+            Zobrist key of the position: placement, side to move, castling rights and en passant
+        '''
+        color = color_to_move or self.turn
+        ep = self.en_passant_square(color)
+        return self._placement_key ^ zobrist.state_key(
+            self.castling_rights(), ep[1] if ep else None, color)
+
+    def castling_rights(self):
+        '''
+            Castling rights in FEN notation ('KQkq', '-', ...) derived from king/rook moved flags
+        '''
+        rights = ''
+        for color, row in (('white', 7), ('black', 0)):
+            king = self.squares[row][4].piece
+            if not isinstance(king, King) or king.color != color or king.moved:
+                continue
+            for letter, rook_col in (('k', 7), ('q', 0)):
+                rook = self.squares[row][rook_col].piece
+                if isinstance(rook, Rook) and rook.color == color and not rook.moved:
+                    rights += letter.upper() if color == 'white' else letter
+        return rights or '-'
+
+    def en_passant_square(self, color):
+        '''
+            (row, col) of the square `color` could capture en passant onto, or None
+        '''
+        # enemy pawn must sit on its double-step landing row
+        row, target_row = (3, 2) if color == 'white' else (4, 5)
+        for col in range(COLS):
+            p = self.squares[row][col].piece
+            if isinstance(p, Pawn) and p.color != color and p.en_passant:
+                last = self.last_move
+                if last is None or (last.final.row == row and last.final.col == col and
+                                    abs(last.final.row - last.initial.row) == 2):
+                    return (target_row, col)
+        return None
 
     def move(self, piece, move, testing=False):
         initial = move.initial
         final = move.final
 
         en_passant_empty = self.squares[final.row][final.col].isempty()
+        captured = not en_passant_empty
+
+        # squares this move can change (for the incremental placement key)
+        touched = [(initial.row, initial.col), (final.row, final.col)]
+        if isinstance(piece, Pawn) and final.col != initial.col:
+            touched.append((initial.row, final.col))
+        if isinstance(piece, King) and self.castling(initial, final):
+            touched += [(final.row, 0), (final.row, 3), (final.row, 5), (final.row, 7)]
+        key = self._placement_key
+        pawn_key = self._pawn_key
+        for r, c in touched:
+            p = self.squares[r][c].piece
+            k = zobrist.piece_key(p, r, c)
+            key ^= k
+            if isinstance(p, Pawn):
+                pawn_key ^= k
+        self._mailbox = None
 
         # console board move update
         self.squares[initial.row][initial.col].piece = None
@@ -33,6 +371,7 @@ class Board:
                 # console board move update
                 self.squares[initial.row][initial.col + diff].piece = None
                 self.squares[final.row][final.col].piece = piece
+                captured = True
                 if not testing:
                     sound = Sound(
                         resource_path('assets/sounds/capture.wav'))
@@ -42,12 +381,22 @@ class Board:
             else:
                 self.check_promotion(piece, final)
 
-        # king castling
-        if isinstance(piece, King):
-            if self.castling(initial, final) and not testing:
-                diff = final.col - initial.col
-                rook = piece.left_rook if (diff < 0) else piece.right_rook
-                self.move(rook, rook.moves[-1])
+        # king castling: relocate the rook directly (does not depend on the rook's cached moves)
+        if isinstance(piece, King) and self.castling(initial, final):
+            rook_col, rook_final_col = (0, 3) if final.col < initial.col else (7, 5)
+            rook = self.squares[final.row][rook_col].piece
+            if isinstance(rook, Rook):
+                self.squares[final.row][rook_col].piece = None
+                self.squares[final.row][rook_final_col].piece = rook
+                rook.moved = True
+
+        # en passant rights last exactly one ply: only a double-stepped pawn carries them
+        if self._ep_pawn is not None:
+            self._ep_pawn.en_passant = False
+            self._ep_pawn = None
+        if isinstance(piece, Pawn) and abs(final.row - initial.row) == 2:
+            piece.en_passant = True
+            self._ep_pawn = piece
 
         # move
         piece.moved = True
@@ -58,6 +407,34 @@ class Board:
         # set last move
         self.last_move = move
 
+        # placement and pawn keys, piece lists and cached game status
+        piece_map = self.piece_map
+        for r, c in touched:
+            p = self.squares[r][c].piece
+            k = zobrist.piece_key(p, r, c)
+            key ^= k
+            if isinstance(p, Pawn):
+                pawn_key ^= k
+            piece_map['white'].pop((r, c), None)
+            piece_map['black'].pop((r, c), None)
+            if p is not None:
+                piece_map[p.color][(r, c)] = p
+        if isinstance(piece, King):
+            self.king_squares[piece.color] = (final.row, final.col)
+        self._placement_key = key
+        self._pawn_key = pawn_key
+        self._status.clear()
+
+        # side to move and clocks
+        if captured or isinstance(piece, Pawn):
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if piece.color == 'black':
+            self.fullmove_number += 1
+        self.turn = 'white' if piece.color == 'black' else 'black'
+        self.history.append(self.hash(self.turn))
+
     def valid_move(self, piece, move):
         return move in piece.moves
 
@@ -69,416 +446,204 @@ class Board:
         return abs(initial.col - final.col) == 2
 
     def set_true_en_passant(self, piece):
+        # Board.move already grants en passant to a pawn that double-stepped and
+        # revokes it one ply later; kept so callers can re-assert it after a move
         
         if not isinstance(piece, Pawn):
             return
 
-        for row in range(ROWS):
-            for col in range(COLS):
-                if isinstance(self.squares[row][col].piece, Pawn):
-                    self.squares[row][col].piece.en_passant = False
+        self._mailbox = None
+        for _, _, p in self.pieces():
+            if isinstance(p, Pawn):
+                p.en_passant = False
         
-        piece.en_passant = True
+        piece.en_passant = piece is self._ep_pawn
 
     def in_check(self, piece, move):
-        temp_piece = copy.deepcopy(piece)
-        temp_board = copy.deepcopy(self)
-        temp_board.move(temp_piece, move, testing=True)
-        
-        for row in range(ROWS):
-            for col in range(COLS):
-                if temp_board.squares[row][col].has_enemy_piece(piece.color):
-                    p = temp_board.squares[row][col].piece
-                    temp_board.calc_moves(p, row, col, bool=False)
-                    for m in p.moves:
-                        if isinstance(m.final.piece, King):
-                            return True
-        
-        return False
+        '''
+            True if playing `move` with `piece` would leave its own king in check
+        '''
+        frm = move.initial.row * 16 + move.initial.col
+        to = move.final.row * 16 + move.final.col
+        return not self.mailbox().is_safe(frm, to)
+
+    def see(self, move):
+        '''
+            Static exchange evaluation of `move` (pawns won, negative if it loses material)
+        '''
+        return self.mailbox().see(move.initial.row * 16 + move.initial.col,
+                                  move.final.row * 16 + move.final.col)
+
+    def mailbox(self):
+        '''
+            0x88 mailbox of the current position (see mailbox.py), built on demand
+        '''
+        if self._mailbox is None:
+            self._mailbox = Mailbox.from_board(self)
+        return self._mailbox
+
+    def game_status(self, color):
+        """Return the cached status of the position for `color`:
+        {'check', 'checkmate', 'stalemate', 'insufficient_material'} -> bool.
+
+        Computed once per position (keyed by Board.hash) and cleared by Board.move,
+        so callers can ask every frame without regenerating moves.
+        """
+        key = self.hash(color)
+        status = self._status.get(key)
+        if status is None:
+            check = self._king_attacked(color)
+            has_moves = bool(self.legal_moves(color))
+            status = {
+                'check': check,
+                'checkmate': check and not has_moves,
+                'stalemate': not check and not has_moves,
+                'insufficient_material': self.insufficient_material(),
+            }
+            self._status[key] = status
+        return status
 
     def is_in_check(self, color):
         """Return True if the king of the given color is currently in check."""
-        # find king position
-        king_row = None
-        king_col = None
-        for row in range(ROWS):
-            for col in range(COLS):
-                if self.squares[row][col].has_piece():
-                    p = self.squares[row][col].piece
-                    from piece import King
-                    if isinstance(p, King) and p.color == color:
-                        king_row, king_col = row, col
-                        break
-            if king_row is not None:
-                break
-
-        if king_row is None:
-            return False
-
-        # for each enemy piece, generate its moves (non-check filtering) and see
-        # if any move captures/targets the king square
-        for row in range(ROWS):
-            for col in range(COLS):
-                if self.squares[row][col].has_piece():
-                    p = self.squares[row][col].piece
-                    if p.color != color:
-                        # clear old moves and calculate pseudo-legal moves
-                        p.clear_moves()
-                        self.calc_moves(p, row, col, bool=False)
-                        for m in p.moves:
-                            if m.final.row == king_row and m.final.col == king_col:
-                                return True
-
-        return False
+        return self.game_status(color)['check']
 
     def is_checkmate(self, color):
         """Return True if the given color is in checkmate."""
-        # first, must be in check
-        if not self.is_in_check(color):
-            return False
+        return self.game_status(color)['checkmate']
 
-        # if any legal move exists for color that escapes check, it's not mate
-        for row in range(ROWS):
-            for col in range(COLS):
-                if self.squares[row][col].has_piece():
-                    p = self.squares[row][col].piece
-                    if p.color == color:
-                        p.clear_moves()
-                        self.calc_moves(p, row, col, bool=True)
-                        if len(p.moves) > 0:
-                            return False
+    def is_stalemate(self, color):
+        """Return True if `color` is not in check and has no legal move."""
+        return self.game_status(color)['stalemate']
+
+    def repetition_count(self):
+        '''
+            How many times the current position has occurred (only positions since the
+            last capture or pawn move can repeat it)
+        '''
+        recent = self.history[-(self.halfmove_clock + 1):]
+        return recent.count(self.history[-1])
 
-        return True
+    def is_repetition(self, count=2):
+        return self.repetition_count() >= count
+
+    def is_threefold_repetition(self):
+        return self.repetition_count() >= 3
+
+    def is_fifty_moves(self):
+        '''
+            True once 50 moves by each side passed without a capture or pawn move
+        '''
+        return self.halfmove_clock >= 100
+
+    def outcome(self, color=None):
+        '''
+            (result, reason) if the game is over with `color` (default: side to move)
+            to move, e.g. ('1-0', 'checkmate') or ('1/2-1/2', 'threefold repetition'),
+            else None. Draws are adjudicated automatically, without a claim.
+        '''
+        color = color or self.turn
+        status = self.game_status(color)
+        if status['checkmate']:
+            return ('0-1' if color == 'white' else '1-0'), 'checkmate'
+        if status['stalemate']:
+            return '1/2-1/2', 'stalemate'
+        if status['insufficient_material']:
+            return '1/2-1/2', 'insufficient material'
+        if self.is_threefold_repetition():
+            return '1/2-1/2', 'threefold repetition'
+        if self.is_fifty_moves():
+            return '1/2-1/2', 'fifty-move rule'
+        return None
+
+    def insufficient_material(self):
+        """Return True if neither side can possibly mate (K v K, K+minor v K, K+B v K+B same colour)."""
+        minors = []
+        for row, col, p in self.pieces():
+            if isinstance(p, King):
+                continue
+            if isinstance(p, (Pawn, Rook, Queen)):
+                return False
+            minors.append((p, (row + col) % 2))
+        if len(minors) <= 1:
+            return True
+        # only bishops, all on the same square colour
+        return all(isinstance(p, Bishop) for p, _ in minors) and len({c for _, c in minors}) == 1
+
+    def _king_attacked(self, color):
+        return self.mailbox().in_check(color == 'black')
+
+    def legal_moves(self, color):
+        '''
+            Legal moves of `color` as (row, col, final_row, final_col) tuples,
+            served from the shared LRU cache keyed by the position hash
+        '''
+        key = self.hash(color)
+        moves = legal_move_cache.get(key)
+        if moves is None:
+            moves = []
+            # board order (a8 first): the order searches try moves in
+            for (row, col), p in sorted(self.piece_map[color].items()):
+                p.clear_moves()
+                self.calc_moves(p, row, col, bool=True)
+                for m in p.moves:
+                    moves.append((row, col, m.final.row, m.final.col))
+            moves = tuple(moves)
+            legal_move_cache.put(key, moves)
+        return moves
+
+    def set_legal_moves(self, piece, row, col):
+        '''
+            Fill piece.moves with the legal moves of the piece on (row, col);
+            same result as calc_moves(piece, row, col, bool=True), but cached
+        '''
+        piece.clear_moves()
+        for r, c, final_row, final_col in self.legal_moves(piece.color):
+            if r == row and c == col:
+                final_piece = self.squares[final_row][final_col].piece
+                piece.add_move(Move(Square(r, c), Square(final_row, final_col, final_piece)))
 
     def calc_moves(self, piece, row, col, bool=True):
         '''
-            Calculate all the possible (valid) moves of an specific piece on a specific position
+            Calculate all the possible (valid) moves of an specific piece on a specific position.
+            Moves are generated on the 0x88 mailbox; bool=False skips the check test.
         '''
-        
-        def pawn_moves():
-            # steps
-            steps = 1 if piece.moved else 2
-
-            # vertical moves
-            start = row + piece.dir
-            end = row + (piece.dir * (1 + steps))
-            for possible_move_row in range(start, end, piece.dir):
-                if Square.in_range(possible_move_row):
-                    if self.squares[possible_move_row][col].isempty():
-                        # create initial and final move squares
-                        initial = Square(row, col)
-                        final = Square(possible_move_row, col)
-                        # create a new move
-                        move = Move(initial, final)
-
-                        # check potencial checks
-                        if bool:
-                            if not self.in_check(piece, move):
-                                # append new move
-                                piece.add_move(move)
-                        else:
-                            # append new move
-                            piece.add_move(move)
-                    # blocked
-                    else: break
-                # not in range
-                else: break
-
-            # diagonal moves
-            possible_move_row = row + piece.dir
-            possible_move_cols = [col-1, col+1]
-            for possible_move_col in possible_move_cols:
-                if Square.in_range(possible_move_row, possible_move_col):
-                    if self.squares[possible_move_row][possible_move_col].has_enemy_piece(piece.color):
-                        # create initial and final move squares
-                        initial = Square(row, col)
-                        final_piece = self.squares[possible_move_row][possible_move_col].piece
-                        final = Square(possible_move_row, possible_move_col, final_piece)
-                        # create a new move
-                        move = Move(initial, final)
-                        
-                        # check potencial checks
-                        if bool:
-                            if not self.in_check(piece, move):
-                                # append new move
-                                piece.add_move(move)
-                        else:
-                            # append new move
-                            piece.add_move(move)
-
-            # en passant moves
-            r = 3 if piece.color == 'white' else 4
-            fr = 2 if piece.color == 'white' else 5
-            # left en pessant
-            if Square.in_range(col-1) and row == r:
-                if self.squares[row][col-1].has_enemy_piece(piece.color):
-                    p = self.squares[row][col-1].piece
-                    if isinstance(p, Pawn):
-                        if p.en_passant:
-                            # create initial and final move squares
-                            initial = Square(row, col)
-                            final = Square(fr, col-1, p)
-                            # create a new move
-                            move = Move(initial, final)
-                            
-                            # check potencial checks
-                            if bool:
-                                if not self.in_check(piece, move):
-                                    # append new move
-                                    piece.add_move(move)
-                            else:
-                                # append new move
-                                piece.add_move(move)
-            
-            # right en pessant
-            if Square.in_range(col+1) and row == r:
-                if self.squares[row][col+1].has_enemy_piece(piece.color):
-                    p = self.squares[row][col+1].piece
-                    if isinstance(p, Pawn):
-                        if p.en_passant:
-                            # create initial and final move squares
-                            initial = Square(row, col)
-                            final = Square(fr, col+1, p)
-                            # create a new move
-                            move = Move(initial, final)
-                            
-                            # check potencial checks
-                            if bool:
-                                if not self.in_check(piece, move):
-                                    # append new move
-                                    piece.add_move(move)
-                            else:
-                                # append new move
-                                piece.add_move(move)
-
-
-        def knight_moves():
-            # 8 possible moves
-            possible_moves = [
-                (row-2, col+1),
-                (row-1, col+2),
-                (row+1, col+2),
-                (row+2, col+1),
-                (row+2, col-1),
-                (row+1, col-2),
-                (row-1, col-2),
-                (row-2, col-1),
-            ]
-
-            for possible_move in possible_moves:
-                possible_move_row, possible_move_col = possible_move
-
-                if Square.in_range(possible_move_row, possible_move_col):
-                    if self.squares[possible_move_row][possible_move_col].isempty_or_enemy(piece.color):
-                        # create squares of the new move
-                        initial = Square(row, col)
-                        final_piece = self.squares[possible_move_row][possible_move_col].piece
-                        final = Square(possible_move_row, possible_move_col, final_piece)
-                        # create new move
-                        move = Move(initial, final)
-                        
-                        # check potencial checks
-                        if bool:
-                            if not self.in_check(piece, move):
-                                # append new move
-                                piece.add_move(move)
-                            else: break
-                        else:
-                            # append new move
-                            piece.add_move(move)
-
-        def straightline_moves(incrs):
-            for incr in incrs:
-                row_incr, col_incr = incr
-                possible_move_row = row + row_incr
-                possible_move_col = col + col_incr
-
-                while True:
-                    if Square.in_range(possible_move_row, possible_move_col):
-                        # create squares of the possible new move
-                        initial = Square(row, col)
-                        final_piece = self.squares[possible_move_row][possible_move_col].piece
-                        final = Square(possible_move_row, possible_move_col, final_piece)
-                        # create a possible new move
-                        move = Move(initial, final)
-
-                        # empty = continue looping
-                        if self.squares[possible_move_row][possible_move_col].isempty():
-                            # check potencial checks
-                            if bool:
-                                if not self.in_check(piece, move):
-                                    # append new move
-                                    piece.add_move(move)
-                            else:
-                                # append new move
-                                piece.add_move(move)
-
-                        # has enemy piece = add move + break
-                        elif self.squares[possible_move_row][possible_move_col].has_enemy_piece(piece.color):
-                            # check potencial checks
-                            if bool:
-                                if not self.in_check(piece, move):
-                                    # append new move
-                                    piece.add_move(move)
-                            else:
-                                # append new move
-                                piece.add_move(move)
-                            break
-
-                        # has team piece = break
-                        elif self.squares[possible_move_row][possible_move_col].has_team_piece(piece.color):
-                            break
-                    
-                    # not in range
-                    else: break
-
-                    # incrementing incrs
-                    possible_move_row = possible_move_row + row_incr
-                    possible_move_col = possible_move_col + col_incr
-
-        def king_moves():
-            adjs = [
-                (row-1, col+0), # up
-                (row-1, col+1), # up-right
-                (row+0, col+1), # right
-                (row+1, col+1), # down-right
-                (row+1, col+0), # down
-                (row+1, col-1), # down-left
-                (row+0, col-1), # left
-                (row-1, col-1), # up-left
-            ]
-
-            # normal moves
-            for possible_move in adjs:
-                possible_move_row, possible_move_col = possible_move
-
-                if Square.in_range(possible_move_row, possible_move_col):
-                    if self.squares[possible_move_row][possible_move_col].isempty_or_enemy(piece.color):
-                        # create squares of the new move
-                        initial = Square(row, col)
-                        final = Square(possible_move_row, possible_move_col) # piece=piece
-                        # create new move
-                        move = Move(initial, final)
-                        # check potencial checks
-                        if bool:
-                            if not self.in_check(piece, move):
-                                # append new move
-                                piece.add_move(move)
-                            else: break
-                        else:
-                            # append new move
-                            piece.add_move(move)
-
-            # castling moves
-            if not piece.moved:
-                # queen castling
-                left_rook = self.squares[row][0].piece
-                if isinstance(left_rook, Rook):
-                    if not left_rook.moved:
-                        for c in range(1, 4):
-                            # castling is not possible because there are pieces in between ?
-                            if self.squares[row][c].has_piece():
-                                break
-
-                            if c == 3:
-                                # adds left rook to king
-                                piece.left_rook = left_rook
-
-                                # rook move
-                                initial = Square(row, 0)
-                                final = Square(row, 3)
-                                moveR = Move(initial, final)
-
-                                # king move
-                                initial = Square(row, col)
-                                final = Square(row, 2)
-                                moveK = Move(initial, final)
-
-                                # check potencial checks
-                                if bool:
-                                    if not self.in_check(piece, moveK) and not self.in_check(left_rook, moveR):
-                                        # append new move to rook
-                                        left_rook.add_move(moveR)
-                                        # append new move to king
-                                        piece.add_move(moveK)
-                                else:
-                                    # append new move to rook
-                                    left_rook.add_move(moveR)
-                                    # append new move king
-                                    piece.add_move(moveK)
-
-                # king castling
-                right_rook = self.squares[row][7].piece
-                if isinstance(right_rook, Rook):
-                    if not right_rook.moved:
-                        for c in range(5, 7):
-                            # castling is not possible because there are pieces in between ?
-                            if self.squares[row][c].has_piece():
-                                break
-
-                            if c == 6:
-                                # adds right rook to king
-                                piece.right_rook = right_rook
-
-                                # rook move
-                                initial = Square(row, 7)
-                                final = Square(row, 5)
-                                moveR = Move(initial, final)
-
-                                # king move
-                                initial = Square(row, col)
-                                final = Square(row, 6)
-                                moveK = Move(initial, final)
-
-                                # check potencial checks
-                                if bool:
-                                    if not self.in_check(piece, moveK) and not self.in_check(right_rook, moveR):
-                                        # append new move to rook
-                                        right_rook.add_move(moveR)
-                                        # append new move to king
-                                        piece.add_move(moveK)
-                                else:
-                                    # append new move to rook
-                                    right_rook.add_move(moveR)
-                                    # append new move king
-                                    piece.add_move(moveK)
-
-        if isinstance(piece, Pawn): 
-            pawn_moves()
-
-        elif isinstance(piece, Knight): 
-            knight_moves()
-
-        elif isinstance(piece, Bishop): 
-            straightline_moves([
-                (-1, 1), # up-right
-                (-1, -1), # up-left
-                (1, 1), # down-right
-                (1, -1), # down-left
-            ])
-
-        elif isinstance(piece, Rook): 
-            straightline_moves([
-                (-1, 0), # up
-                (0, 1), # right
-                (1, 0), # down
-                (0, -1), # left
-            ])
-
-        elif isinstance(piece, Queen): 
-            straightline_moves([
-                (-1, 1), # up-right
-                (-1, -1), # up-left
-                (1, 1), # down-right
-                (1, -1), # down-left
-                (-1, 0), # up
-                (0, 1), # right
-                (1, 0), # down
-                (0, -1) # left
-            ])
-
-        elif isinstance(piece, King): 
-            king_moves()
+        mailbox = self.mailbox()
+        frm = row * 16 + col
+
+        # castling: king and rook both unmoved (path and checks are up to the mailbox)
+        castle_queen = castle_king = False
+        if isinstance(piece, King) and not piece.moved:
+            left_rook = self.squares[row][0].piece
+            right_rook = self.squares[row][7].piece
+            castle_queen = isinstance(left_rook, Rook) and not left_rook.moved
+            castle_king = isinstance(right_rook, Rook) and not right_rook.moved
+
+        for to, kind in mailbox.targets(frm, piece.moved, castle_queen, castle_king):
+            final_row, final_col = to >> 4, to & 7
+
+            if kind == CASTLING:
+                rook_col, rook_final_col = (0, 3) if final_col < col else (7, 5)
+                rook = self.squares[row][rook_col].piece
+                # adds the rook to the king
+                if rook_col == 0:
+                    piece.left_rook = rook
+                else:
+                    piece.right_rook = rook
+                # the king may not castle out of, through or into check
+                if bool and not mailbox.can_castle(frm, to):
+                    continue
+                rook.add_move(Move(Square(row, rook_col), Square(row, rook_final_col)))
+                piece.add_move(Move(Square(row, col), Square(row, final_col)))
+                continue
+
+            # check potencial checks
+            if bool and not mailbox.is_safe(frm, to):
+                continue
+            if kind == EN_PASSANT:
+                final_piece = self.squares[row][final_col].piece
+            else:
+                final_piece = self.squares[final_row][final_col].piece
+            piece.add_move(Move(Square(row, col), Square(final_row, final_col, final_piece)))
 
     def _create(self):
         for row in range(ROWS):
@@ -4,6 +4,7 @@ import sys
 
 from sound import Sound
 from theme import Theme
+from texture import TextureCache
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -27,6 +28,7 @@ class Config:
             resource_path('assets/sounds/move.wav'))
         self.capture_sound = Sound(
             resource_path('assets/sounds/capture.wav'))
+        self.textures = TextureCache()
 
     def change_theme(self):
         self.idx += 1
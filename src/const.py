@@ -5,4 +5,13 @@ HEIGHT = 800
 # Board dimensions
 ROWS = 8
 COLS = 8
-SQSIZE = WIDTH // ROWS
\ No newline at end of file
+SQSIZE = WIDTH // ROWS
+
+# GUI frame pacing (frames per second cap while dragging a piece)
+DRAG_FPS = 60
+
+# Minimum delay between two engine moves (ms)
+ENGINE_MOVE_DELAY = 1000
+
+# All board coordinates (row, col)
+ALL_SQUARES = [(row, col) for row in range(ROWS) for col in range(COLS)]
\ No newline at end of file
@@ -0,0 +1,95 @@
+import glob
+import os
+
+import numpy as np
+
+from board import SNAPSHOT_SIZE
+
+# Training-data shards written by tools/selfplay.py: .npy files of fixed-width records,
+# so a shard can be memory-mapped (np.load(mmap_mode='r')) and read a slice at a time.
+#
+#   hash      Board.hash() of the position (Zobrist, side to move included)
+#   position  Board.snapshot() bytes (restore with Board.from_snapshot)
+#   score     search score in pawns, from white's point of view
+#   result    game result from white's point of view: 1 win, 0 draw, -1 loss
+#
+# Requires numpy (only the dataset tools import this module, the game does not).
+
+RECORD_DTYPE = np.dtype([
+    ('hash', '<u8'),
+    ('position', 'u1', (SNAPSHOT_SIZE,)),
+    ('score', '<f4'),
+    ('result', 'i1'),
+])
+SHARD_PATTERN = 'selfplay-{:05d}.npy'
+
+# records per slice when streaming a shard
+BATCH_SIZE = 4096
+
+
+def shard_paths(directory):
+    """Shard files in `directory`, in write order."""
+    return sorted(glob.glob(os.path.join(directory, SHARD_PATTERN.replace('{:05d}', '*'))))
+
+
+def next_shard_path(directory):
+    """Path for a new shard after the ones already in `directory`."""
+    n = 0
+    for path in shard_paths(directory):
+        try:
+            n = max(n, int(os.path.basename(path)[len('selfplay-'):-len('.npy')]) + 1)
+        except ValueError:
+            continue
+    return os.path.join(directory, SHARD_PATTERN.format(n))
+
+
+def write_shard(path, records):
+    """Write a record array as a shard (atomically: readers never see half a file)."""
+    records = np.asarray(records, dtype=RECORD_DTYPE)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, records)
+    os.replace(tmp, path)
+
+
+def open_shard(path):
+    """Memory-mapped, read-only record array of one shard."""
+    records = np.load(path, mmap_mode='r')
+    if records.dtype != RECORD_DTYPE:
+        raise ValueError(f'{path}: not a self-play shard (dtype {records.dtype})')
+    return records
+
+
+def iter_batches(paths, batch_size=BATCH_SIZE, fields=None):
+    """
+    Stream the records of the given shards as arrays of at most batch_size records
+    (only `fields` if given, e.g. ('position', 'result')). Each batch is copied out of
+    the memory map, so only one slice of a shard is in memory at a time.
+    """
+    for path in paths:
+        records = open_shard(path)
+        if fields is not None:
+            records = records[list(fields)]
+        for start in range(0, len(records), batch_size):
+            yield np.array(records[start:start + batch_size])
+        del records
+
+
+def iter_records(paths, batch_size=BATCH_SIZE):
+    """Stream single records (numpy.void: record['score'], ...) of the given shards."""
+    for batch in iter_batches(paths, batch_size):
+        yield from batch
+
+
+def read_hashes(paths):
+    """Set of the position hashes already stored in the given shards."""
+    seen = set()
+    for batch in iter_batches(paths, fields=('hash',)):
+        seen.update(batch['hash'].tolist())
+    return seen
+
+
+def count_records(paths):
+    """Number of records in the given shards (reads the headers only)."""
+    return sum(len(open_shard(path)) for path in paths)
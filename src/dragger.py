@@ -4,7 +4,8 @@ from const import *
 
 class Dragger:
 
-    def __init__(self):
+    def __init__(self, textures):
+        self.textures = textures
         self.piece = None
         self.dragging = False
         self.mouseX = 0
@@ -14,12 +15,9 @@ class Dragger:
 
     # blit method
 
-    def update_blit(self, surface):
-        # texture
-        self.piece.set_texture(size=128)
-        texture = self.piece.texture
-        # img
-        img = pygame.image.load(texture)
+    def update_blit(self, surface, size=128):
+        # img (cached and scaled by the texture cache)
+        img = self.textures.get(self.piece, size)
         # rect
         img_center = (self.mouseX, self.mouseY)
         self.piece.texture_rect = img.get_rect(center=img_center)
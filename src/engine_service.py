@@ -0,0 +1,275 @@
+import multiprocessing
+import threading
+import time
+
+from scheduler import FrameScheduler
+from search import SearchContext
+
+class EngineService:
+    '''
+        Runs bot searches in a separate, long-lived process.
+
+        The GUI sends compact positions (FEN) over a pipe and gets UCI moves back,
+        so searches no longer share the GIL with rendering and the worker's caches
+        (opening book, transposition table) survive from one move to the next. Results
+        are pushed into `results` as (color, Move) and the GUI loop is woken with an
+        ENGINE_EVENT.
+
+        Only the latest request is live: cancel() (or a newer request) makes any
+        result still in flight stale, and stale results are dropped. The running
+        search is stopped through its SearchContext, so the worker never has to be
+        replaced to get rid of a stale search.
+
+        With ponder=True the built-in engine keeps thinking on the opponent's time:
+        after answering it guesses the reply and searches the resulting position in
+        the background. A request for that position is answered from the ponder
+        search (instantly once it is deep enough); any other position stops the
+        ponder and runs a normal search on the warmed transposition table.
+    '''
+
+    def __init__(self, results):
+        self.results = results
+        self._ctx = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._current = None
+        # {'nodes', 'time_s', 'depth'} of the last search answered (for the HUD)
+        self.last_stats = None
+        self._conn = None
+        self._process = None
+        self._start()
+
+    # public API
+
+    def request(self, board, color, engine, depth, ponder=False):
+        """Ask the worker for a move in `board` for `color`. Returns the request id."""
+        snapshot = board.snapshot(color)
+        # position keys of the game so far, so the search can see repetitions
+        history = tuple(board.history)
+        with self._lock:
+            self._next_id += 1
+            self._current = (self._next_id, color)
+            self._conn.send(('search', self._next_id, snapshot, color, engine, depth, ponder, history))
+            return self._next_id
+
+    def cancel(self):
+        """Drop the running search (reset, bot change...). Its result will be ignored."""
+        with self._lock:
+            self._current = None
+            # stop the search and any ponder; the worker and its caches live on
+            self._conn.send(('stop',))
+
+    def busy(self):
+        return self._current is not None
+
+    def close(self):
+        try:
+            self._conn.send(('quit',))
+        except (OSError, EOFError):
+            pass
+        self._process.join(timeout=1.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._conn.close()
+
+    # worker management
+
+    def _start(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._conn = parent_conn
+        self._process = self._ctx.Process(target=serve, args=(child_conn,), daemon=True)
+        self._process.start()
+        child_conn.close()
+        reader = threading.Thread(target=self._read_results, args=(parent_conn,), daemon=True)
+        reader.start()
+
+    def _read_results(self, conn):
+        import ai
+        while True:
+            try:
+                kind, rid, uci, stats = conn.recv()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                current = self._current
+                if current is None or current[0] != rid:
+                    continue
+                self._current = None
+                self.last_stats = stats
+            color = current[1]
+            self.results.put((color, ai.uci_to_move(uci) if uci else None))
+            FrameScheduler.notify_engine(color=color)
+
+
+# engines that can ponder (their transposition table outlives a search)
+PONDER_ENGINES = ('deepblue', 'deep_blue')
+
+# pondering searches this many plies deeper than the move request that triggered it
+PONDER_EXTRA_DEPTH = 1
+
+
+class Ponder:
+    """Background deep_blue_bot search on the position expected after the opponent's reply.
+
+    It keeps deepening (filling the shared transposition table) until stopped or
+    until max_depth is done; result(depth) hands out the best move (and the depth it
+    comes from) once an iteration of at least `depth` plies has completed.
+    """
+
+    def __init__(self, board, color, max_depth):
+        import ai
+        self.key = board.hash(color)
+        self.ctx = SearchContext()
+        self.started = time.perf_counter()
+        self._cond = threading.Condition()
+        self._best = {}
+        self._done = False
+        self._thread = threading.Thread(
+            target=self._run, args=(ai, board, color, max_depth), daemon=True)
+        self._thread.start()
+
+    def _run(self, ai, board, color, max_depth):
+        try:
+            ai.deep_blue_bot(board, color, depth=max_depth, ctx=self.ctx,
+                             on_iteration=self._iteration)
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def _iteration(self, depth, move, score):
+        with self._cond:
+            self._best[depth] = move
+            self._cond.notify_all()
+
+    def result(self, depth, ctx):
+        """Wait until a `depth`-ply iteration is done (or the ponder ends / `ctx` stops).
+        Returns (move, depth of the last completed iteration), (None, 0) if none completed."""
+        with self._cond:
+            while not self._done and not ctx.stopped() and max(self._best, default=0) < depth:
+                self._cond.wait(0.05)
+            if not self._best:
+                return None, 0
+            reached = max(self._best)
+            return self._best[reached], reached
+
+    def cancel(self):
+        self.ctx.stop()
+        self._thread.join()
+
+
+class _Job:
+
+    def __init__(self, rid, snapshot, color, engine, depth, ponder, history=()):
+        self.rid = rid
+        self.snapshot = snapshot
+        self.color = color
+        self.engine = engine
+        self.depth = depth
+        self.ponder = ponder
+        self.history = history
+        self.ctx = SearchContext()
+
+
+def serve(conn):
+    """Worker process main loop.
+
+    The main thread reads requests from the pipe so that a ('stop',) can interrupt a
+    running search; searches run one at a time on a separate thread:
+      ('search', id, snapshot, color, engine, depth, ponder, history) -> ('result', id, uci or None, stats)
+    """
+    import queue
+    import ai
+
+    ai.load_magnus_book()
+    jobs = queue.Queue()
+    current = None
+    # the ponder currently running (owned by the search thread), so 'stop' can reach it
+    state = {'ponder': None}
+    searcher = threading.Thread(target=_run_jobs, args=(conn, jobs, state), daemon=True)
+    searcher.start()
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            msg = ('quit',)
+        if msg[0] == 'quit':
+            if current is not None:
+                current.ctx.stop()
+            jobs.put(None)
+            return
+        if msg[0] == 'stop':
+            if current is not None:
+                current.ctx.stop()
+            ponder = state['ponder']
+            if ponder is not None:
+                ponder.ctx.stop()
+        elif msg[0] == 'search':
+            # a newer request supersedes the running one
+            if current is not None:
+                current.ctx.stop()
+            current = _Job(*msg[1:])
+            jobs.put(current)
+
+
+def _run_jobs(conn, jobs, state):
+    import ai
+    from board import Board
+
+    ponder = None
+    while True:
+        state['ponder'] = ponder
+        job = jobs.get()
+        if job is None:
+            if ponder is not None:
+                ponder.cancel()
+            return
+        uci = stats = None
+        try:
+            board = Board.from_snapshot(job.snapshot)
+            if job.history and job.history[-1] == board.history[-1]:
+                board.history = list(job.history)
+            if ponder is not None and ponder.key == board.hash(job.color) \
+                    and job.engine in PONDER_ENGINES:
+                # ponder hit: the expected reply was played, answer from the ponder search
+                move, reached = ponder.result(job.depth, job.ctx)
+                stats = {'nodes': ponder.ctx.nodes, 'time_s': time.perf_counter() - ponder.started,
+                         'depth': reached, 'ponder': True}
+            else:
+                move = None
+            if ponder is not None:
+                ponder.cancel()
+                ponder = None
+            if move is None and not job.ctx.stopped():
+                # ponder miss (or no ponder): normal search, reusing the warmed table
+                move, search_stats = ai.get_bot_move(board, job.color, engine=job.engine,
+                                                     depth=job.depth, ctx=job.ctx, with_stats=True)
+                stats = {'nodes': search_stats.nodes, 'time_s': search_stats.time_s,
+                         'depth': search_stats.depth}
+            uci = ai.move_to_uci(move) if move else None
+        except Exception:
+            move = uci = stats = None
+        try:
+            conn.send(('result', job.rid, uci, stats))
+        except (OSError, EOFError):
+            return
+        # answer first, then keep thinking on the opponent's time
+        if move and job.ponder and job.engine in PONDER_ENGINES and not job.ctx.stopped():
+            try:
+                ponder = _start_ponder(ai, board, move, job.color, job.depth + PONDER_EXTRA_DEPTH)
+            except Exception:
+                ponder = None
+
+
+def _start_ponder(ai, board, move, color, max_depth):
+    """Play our move, guess the opponent's reply (table move, else a 1-ply search) and
+    start pondering the resulting position."""
+    piece = board.squares[move.initial.row][move.initial.col].piece
+    board.move(piece, move, testing=True)
+    other = ai.opponent(color)
+    reply = ai.tt_best_move(board, other) or ai.deep_blue_bot(board, other, depth=1)
+    if reply is None:
+        return None
+    piece = board.squares[reply.initial.row][reply.initial.col].piece
+    board.move(piece, reply, testing=True)
+    return Ponder(board, color, max_depth)
@@ -5,7 +5,6 @@ from board import Board
 from dragger import Dragger
 from config import Config
 from square import Square
-from config import resource_path
 
 class Game:
 
@@ -13,213 +12,195 @@ class Game:
         self.next_player = 'white'
         self.hovered_sqr = None
         self.board = Board()
-        self.dragger = Dragger()
         self.config = Config()
+        self.dragger = Dragger(self.config.textures)
+        # (snapshot, history length, last move) before every move played, for undo
+        self.undo_stack = []
+
+    # layout helpers
+
+    def layout(self, surface):
+        """Return (sq, (ox, oy)): square size and board origin set by the main loop,
+        falling back to a full-surface layout (legacy behavior).
+        """
+        if hasattr(self, '_sq') and hasattr(self, '_board_origin'):
+            return self._sq, self._board_origin
+        width, height = surface.get_size()
+        return min(width, height) // ROWS, (0, 0)
+
+    def square_rect(self, surface, row, col):
+        """Pixel rect of a board square; adjacent rects tile the board without gaps."""
+        sq, (ox, oy) = self.layout(surface)
+        x0, y0 = int(ox + col * sq), int(oy + row * sq)
+        x1, y1 = int(ox + (col + 1) * sq), int(oy + (row + 1) * sq)
+        return pygame.Rect(x0, y0, x1 - x0, y1 - y0)
 
     # blit methods
+    # every show_* method accepts an optional `squares` set of (row, col): when given,
+    # only those squares are repainted (used by the dirty-rectangle renderer)
 
-    def show_bg(self, surface):
+    def show_bg(self, surface, squares=None):
         """Draw the board. Callers should compute a board origin (ox, oy) and square size (sq)
         and pass them via attributes on this Game instance: self._board_origin and self._sq.
         If not present, fall back to full-surface layout (legacy behavior).
         """
         theme = self.config.theme
-        width, height = surface.get_size()
-        # allow main loop to set self._sq and self._board_origin for precise layout
-        if hasattr(self, '_sq') and hasattr(self, '_board_origin'):
-            sq = self._sq
-            ox, oy = self._board_origin
-        else:
-            sq = min(width, height) // ROWS
-            ox, oy = 0, 0
-
-        for row in range(ROWS):
-            for col in range(COLS):
-                # color
-                color = theme.bg.light if (row + col) % 2 == 0 else theme.bg.dark
-                # rect
-                rect = (int(ox + col * sq), int(oy + row * sq), int(sq), int(sq))
-                # blit
-                pygame.draw.rect(surface, color, rect)
-
-                # row coordinates (left side)
-                if col == 0:
-                    coord_color = theme.bg.dark if row % 2 == 0 else theme.bg.light
-                    lbl = self.config.font.render(str(ROWS-row), 1, coord_color)
-                    lbl_pos = (int(ox + 5), int(oy + 5 + row * sq))
-                    surface.blit(lbl, lbl_pos)
-
-                # col coordinates (bottom)
-                if row == ROWS - 1:
-                    coord_color = theme.bg.dark if (row + col) % 2 == 0 else theme.bg.light
-                    lbl = self.config.font.render(Square.get_alphacol(col), 1, coord_color)
-                    lbl_pos = (int(ox + col * sq + sq - 20), int(oy + sq * ROWS - 20))
-                    surface.blit(lbl, lbl_pos)
-
-    def show_pieces(self, surface):
+        sq, (ox, oy) = self.layout(surface)
+
+        for row, col in squares if squares is not None else ALL_SQUARES:
+            # color
+            color = theme.bg.light if (row + col) % 2 == 0 else theme.bg.dark
+            # blit
+            pygame.draw.rect(surface, color, self.square_rect(surface, row, col))
+
+            # row coordinates (left side)
+            if col == 0:
+                coord_color = theme.bg.dark if row % 2 == 0 else theme.bg.light
+                lbl = self.config.font.render(str(ROWS-row), 1, coord_color)
+                lbl_pos = (int(ox + 5), int(oy + 5 + row * sq))
+                surface.blit(lbl, lbl_pos)
+
+            # col coordinates (bottom)
+            if row == ROWS - 1:
+                coord_color = theme.bg.dark if (row + col) % 2 == 0 else theme.bg.light
+                lbl = self.config.font.render(Square.get_alphacol(col), 1, coord_color)
+                lbl_pos = (int(ox + col * sq + sq - 20), int(oy + sq * ROWS - 20))
+                surface.blit(lbl, lbl_pos)
+
+    def show_pieces(self, surface, squares=None):
         # use layout values set by main loop
-        if hasattr(self, '_sq') and hasattr(self, '_board_origin'):
-            sq = self._sq
-            ox, oy = self._board_origin
-        else:
-            width, height = surface.get_size()
-            sq = min(width, height) // ROWS
-            ox, oy = 0, 0
+        sq, (ox, oy) = self.layout(surface)
 
         # choose texture size based on square size
         tex_size = max(16, int(sq * 0.8))
-
-        for row in range(ROWS):
-            for col in range(COLS):
-                if self.board.squares[row][col].has_piece():
-                    piece = self.board.squares[row][col].piece
-                    # all pieces except dragger piece
-                    if piece is not self.dragger.piece:
-                        # try texture nearest to desired size; fall back to 80px if missing
-                        piece.set_texture(size=tex_size)
-                        try:
-                            img = pygame.image.load(resource_path(piece.texture))
-                        except Exception:
-                            piece.set_texture(size=80)
-                            img = pygame.image.load(resource_path(piece.texture))
-                        img_center = (int(ox + col * sq + sq / 2), int(oy + row * sq + sq / 2))
-                        piece.texture_rect = img.get_rect(center=img_center)
-                        surface.blit(img, piece.texture_rect)
-
-    def show_moves(self, surface):
+        textures = self.config.textures
+
+        for row, col in squares if squares is not None else ALL_SQUARES:
+            piece = self.board.squares[row][col].piece
+            # all pieces except dragger piece
+            if piece is not None and piece is not self.dragger.piece:
+                img = textures.get(piece, tex_size)
+                img_center = (int(ox + col * sq + sq / 2), int(oy + row * sq + sq / 2))
+                piece.texture_rect = img.get_rect(center=img_center)
+                surface.blit(img, piece.texture_rect)
+
+    def show_moves(self, surface, squares=None):
         theme = self.config.theme
-        if hasattr(self, '_sq') and hasattr(self, '_board_origin'):
-            sq = self._sq
-            ox, oy = self._board_origin
-        else:
-            width, height = surface.get_size()
-            sq = min(width, height) // ROWS
-            ox, oy = 0, 0
 
         if self.dragger.dragging:
             piece = self.dragger.piece
 
             # loop all valid moves
             for move in piece.moves:
+                if squares is not None and (move.final.row, move.final.col) not in squares:
+                    continue
                 # color
                 color = theme.moves.light if (move.final.row + move.final.col) % 2 == 0 else theme.moves.dark
-                # rect
-                rect = (int(ox + move.final.col * sq), int(oy + move.final.row * sq), int(sq), int(sq))
                 # blit
-                pygame.draw.rect(surface, color, rect)
+                pygame.draw.rect(surface, color, self.square_rect(surface, move.final.row, move.final.col))
 
-    def show_last_move(self, surface):
+    def show_last_move(self, surface, squares=None):
         theme = self.config.theme
-        if hasattr(self, '_sq') and hasattr(self, '_board_origin'):
-            sq = self._sq
-            ox, oy = self._board_origin
-        else:
-            width, height = surface.get_size()
-            sq = min(width, height) // ROWS
-            ox, oy = 0, 0
 
         if self.board.last_move:
             initial = self.board.last_move.initial
             final = self.board.last_move.final
 
             for pos in [initial, final]:
+                if squares is not None and (pos.row, pos.col) not in squares:
+                    continue
                 color = theme.trace.light if (pos.row + pos.col) % 2 == 0 else theme.trace.dark
-                rect = (int(ox + pos.col * sq), int(oy + pos.row * sq), int(sq), int(sq))
-                pygame.draw.rect(surface, color, rect)
+                pygame.draw.rect(surface, color, self.square_rect(surface, pos.row, pos.col))
 
         # if either king is in check, highlight it (handled by board methods)
         # show check/highlight is done in show_status for clarity
 
-    def show_hover(self, surface):
+    def show_hover(self, surface, squares=None):
         if self.hovered_sqr:
-            if hasattr(self, '_sq') and hasattr(self, '_board_origin'):
-                sq = self._sq
-                ox, oy = self._board_origin
-            else:
-                width, height = surface.get_size()
-                sq = min(width, height) // ROWS
-                ox, oy = 0, 0
+            if squares is not None and (self.hovered_sqr.row, self.hovered_sqr.col) not in squares:
+                return
             color = (180, 180, 180)
-            rect = (int(ox + self.hovered_sqr.col * sq), int(oy + self.hovered_sqr.row * sq), int(sq), int(sq))
+            rect = self.square_rect(surface, self.hovered_sqr.row, self.hovered_sqr.col)
             pygame.draw.rect(surface, color, rect, width=3)
 
-    def show_move_field(self, surface):
-        """Render the last move (e.g. e2e4) in the top-left corner."""
-        # keep move field at top-left of the full window
+    def move_field_text(self):
+        """Text of the last-move field (e.g. 'Last: e2e4'), or None before the first move."""
         if self.board.last_move:
             initial = self.board.last_move.initial
             final = self.board.last_move.final
             s = f"{Square.get_alphacol(initial.col)}{ROWS-initial.row}{Square.get_alphacol(final.col)}{ROWS-final.row}"
-            lbl = self.config.font.render(f"Last: {s}", 1, (0, 0, 0))
-            surface.blit(lbl, (10, 10))
+            return f"Last: {s}"
+        return None
 
-    def show_status(self, surface):
-        """Render status messages like 'White in check' or 'Black checkmate' at the top-center."""
-        width, height = surface.get_size()
-        sq = min(width, height) // ROWS
+    def show_move_field(self, surface):
+        """Render the last move (e.g. e2e4) in the top-left corner."""
+        # keep move field at top-left of the full window
+        text = self.move_field_text()
+        if text:
+            lbl = self.config.font.render(text, 1, (0, 0, 0))
+            surface.blit(lbl, (10, 10))
 
-        status = None
+    def status(self):
+        """Return (message, king_color, highlight_color) for the current position, or Nones.
+        Red for check, darker red if checkmate. Backed by the board's per-position status cache.
+        """
+        white = self.board.game_status('white')
+        black = self.board.game_status('black')
+        if white['checkmate']:
+            return 'White is checkmated', 'white', (150, 30, 30)
+        elif black['checkmate']:
+            return 'Black is checkmated', 'black', (150, 30, 30)
+        elif self.board.game_status(self.next_player)['stalemate']:
+            return 'Stalemate', None, None
+        elif white['insufficient_material']:
+            return 'Draw: insufficient material', None, None
+        elif self.board.is_threefold_repetition():
+            return 'Draw: threefold repetition', None, None
+        elif self.board.is_fifty_moves():
+            return 'Draw: fifty-move rule', None, None
+        elif white['check']:
+            return 'White is in check', 'white', (200, 30, 30)
+        elif black['check']:
+            return 'Black is in check', 'black', (200, 30, 30)
+        return None, None, None
+
+    def over(self):
+        """True once the game has ended (mate or an automatically adjudicated draw)."""
+        return self.board.outcome(self.next_player) is not None
+
+    def king_square(self, color):
+        """(row, col) of the king of the given color, or None."""
+        return self.board.king_square(color)
+
+    def show_status(self, surface, squares=None, status=None):
+        """Render status messages like 'White in check' or 'Black checkmate' at the top-center
+        and highlight the king square. `status` may pass a precomputed Game.status() result.
+        """
+        status = status or self.status()
+        self.show_status_text(surface, status)
+        self.show_check(surface, squares, status)
 
-        if self.board.is_checkmate('white'):
-            status = 'White is checkmated'
-        elif self.board.is_checkmate('black'):
-            status = 'Black is checkmated'
-        elif self.board.is_in_check('white'):
-            status = 'White is in check'
-        elif self.board.is_in_check('black'):
-            status = 'Black is in check'
+    def show_status_text(self, surface, status=None):
+        width, height = surface.get_size()
+        text, _, _ = status or self.status()
 
-        if status:
-            lbl = self.config.font.render(status, 1, (200, 30, 30))
+        if text:
+            lbl = self.config.font.render(text, 1, (200, 30, 30))
             # center top
             x = (width - lbl.get_width()) // 2
             surface.blit(lbl, (x, 10))
 
+    def show_check(self, surface, squares=None, status=None):
         # highlight king square if in check/checkmate
-        # red for check, darker red if checkmate
-        highlight_color = None
-        if self.board.is_checkmate('white'):
-            highlight_color = (150, 30, 30)
-            king_color = 'white'
-        elif self.board.is_checkmate('black'):
-            highlight_color = (150, 30, 30)
-            king_color = 'black'
-        elif self.board.is_in_check('white'):
-            highlight_color = (200, 30, 30)
-            king_color = 'white'
-        elif self.board.is_in_check('black'):
-            highlight_color = (200, 30, 30)
-            king_color = 'black'
-        else:
-            king_color = None
-
+        _, king_color, highlight_color = status or self.status()
         if highlight_color and king_color:
-            # find king square
-            krow = kcol = None
-            from piece import King
-            for r in range(ROWS):
-                for c in range(COLS):
-                    if self.board.squares[r][c].has_piece():
-                        p = self.board.squares[r][c].piece
-                        if isinstance(p, King) and p.color == king_color:
-                            krow, kcol = r, c
-                            break
-                if krow is not None:
-                    break
-            if krow is not None:
-                # use layout if available
-                if hasattr(self, '_sq') and hasattr(self, '_board_origin'):
-                    sq = self._sq
-                    ox, oy = self._board_origin
-                else:
-                    width, height = surface.get_size()
-                    sq = min(width, height) // ROWS
-                    ox, oy = 0, 0
-                rect = (int(ox + kcol * sq), int(oy + krow * sq), int(sq), int(sq))
+            king_sq = self.king_square(king_color)
+            if king_sq is not None and (squares is None or king_sq in squares):
+                rect = self.square_rect(surface, *king_sq)
                 try:
-                    s = pygame.Surface((int(sq), int(sq)), pygame.SRCALPHA)
+                    s = pygame.Surface(rect.size, pygame.SRCALPHA)
                     s.fill((*highlight_color, 90))
-                    surface.blit(s, (int(ox + kcol * sq), int(oy + krow * sq)))
+                    surface.blit(s, rect.topleft)
                     pygame.draw.rect(surface, (255, 0, 0), rect, width=3)
                 except Exception:
                     pygame.draw.rect(surface, highlight_color, rect, width=3)
@@ -229,6 +210,24 @@ class Game:
     def next_turn(self):
         self.next_player = 'white' if self.next_player == 'black' else 'black'
 
+    def record_move(self):
+        """Remember the position before a move is played (see undo)."""
+        board = self.board
+        self.undo_stack.append((board.snapshot(self.next_player), len(board.history), board.last_move))
+
+    def undo(self):
+        """Take back the last move. Returns False when there is nothing to undo."""
+        if not self.undo_stack:
+            return False
+        snapshot, plies, last_move = self.undo_stack.pop()
+        history = self.board.history[:plies]
+        self.board.restore(snapshot)
+        self.board.history = history
+        self.board.last_move = last_move
+        self.next_player = self.board.turn
+        self.hovered_sqr = None
+        return True
+
     def set_hover(self, row, col):
         self.hovered_sqr = self.board.squares[row][col]
 
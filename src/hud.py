@@ -0,0 +1,134 @@
+import time
+from collections import deque
+
+import pygame
+
+# Game drawing phases timed by the HUD, in drawing order (show_status is left out:
+# it is made of show_status_text and show_check)
+HUD_PHASES = ('show_bg', 'show_last_move', 'show_moves', 'show_pieces', 'show_hover',
+              'show_move_field', 'show_status_text', 'show_check')
+
+# how often the HUD refreshes while the loop would otherwise sleep (ms)
+HUD_REFRESH_MS = 250
+
+class Hud:
+    '''
+        Optional performance overlay (toggled with the H key).
+
+        Shows FPS, the frame time and its breakdown over the Game.show_* calls, how
+        long the current engine search has been running and the speed of the last
+        one, plus the process CPU use measured by the FrameScheduler (and the share
+        of a core saved over a busy loop). The show_* timers are installed on the
+        Game instance only while the HUD is visible, so a hidden HUD adds no overhead
+        to drawing.
+    '''
+
+    # weight of the newest frame in the smoothed timings
+    SMOOTHING = 0.1
+
+    def __init__(self, game, scheduler=None):
+        self.game = game
+        self.scheduler = scheduler
+        self.enabled = False
+        self.font = pygame.font.SysFont('monospace', 13)
+        self.frame_ms = 0.0
+        self.phase_ms = {}
+        self._phase_now = {}
+        self._frame_start = None
+        self._frame_ends = deque()
+        # engine state, filled in by the main loop
+        self.engine_started = None
+        self.engine_stats = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if self.enabled:
+            self._instrument()
+        else:
+            self._uninstrument()
+        self.frame_ms = 0.0
+        self.phase_ms = {}
+        self._frame_ends.clear()
+
+    # timers
+
+    def _instrument(self):
+        for name in HUD_PHASES:
+            method = getattr(self.game, name)
+            setattr(self.game, name, self._timed(name, method))
+
+    def _uninstrument(self):
+        for name in HUD_PHASES:
+            self.game.__dict__.pop(name, None)
+
+    def _timed(self, name, method):
+        phase_now = self._phase_now
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                phase_now[name] = phase_now.get(name, 0.0) + time.perf_counter() - t0
+        return timed
+
+    def frame_begin(self):
+        if self.enabled:
+            self._frame_start = time.perf_counter()
+
+    def frame_end(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        now = time.perf_counter()
+        a = self.SMOOTHING
+        self.frame_ms += a * ((now - self._frame_start) * 1000.0 - self.frame_ms)
+        for name in HUD_PHASES:
+            ms = self._phase_now.get(name, 0.0) * 1000.0
+            self.phase_ms[name] = self.phase_ms.get(name, 0.0) + a * (ms - self.phase_ms.get(name, 0.0))
+        self._phase_now.clear()
+        self._frame_start = None
+        # frames presented during the last second
+        self._frame_ends.append(now)
+        while self._frame_ends and now - self._frame_ends[0] > 1.0:
+            self._frame_ends.popleft()
+
+    @property
+    def fps(self):
+        return len(self._frame_ends)
+
+    # drawing
+
+    def lines(self):
+        lines = [f'FPS {self.fps:3d}   frame {self.frame_ms:6.2f} ms']
+        for name in HUD_PHASES:
+            lines.append(f'  {name[5:]:<12}{self.phase_ms.get(name, 0.0):6.2f} ms')
+        if self.engine_started is not None:
+            lines.append(f'engine thinking {time.perf_counter() - self.engine_started:5.1f} s')
+        else:
+            lines.append('engine idle')
+        stats = self.engine_stats
+        if stats and stats.get('time_s'):
+            nps = stats.get('nodes', 0) / stats['time_s']
+            lines.append(f"last search {stats.get('nodes', 0)} nodes, {nps:,.0f} nps")
+        if self.scheduler is not None:
+            s = self.scheduler.stats()
+            lines.append(f"cpu {s['cpu_pct']:5.1f}%  idle {s['idle_pct']:5.1f}%  "
+                         f"saved {s['cpu_saved_pct']:5.1f}%")
+        return lines
+
+    def rect(self, surface, lines=None):
+        lines = lines if lines is not None else self.lines()
+        h = self.font.get_linesize()
+        w = max(self.font.size(line)[0] for line in lines)
+        return pygame.Rect(10, surface.get_height() - 10 - h * len(lines) - 8, w + 12, h * len(lines) + 8)
+
+    def draw(self, surface, lines=None):
+        lines = lines if lines is not None else self.lines()
+        rect = self.rect(surface, lines)
+        panel = pygame.Surface(rect.size, pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        surface.blit(panel, rect.topleft)
+        h = self.font.get_linesize()
+        for i, line in enumerate(lines):
+            lbl = self.font.render(line, True, (230, 230, 230))
+            surface.blit(lbl, (rect.x + 6, rect.y + 4 + i * h))
@@ -11,14 +11,33 @@ def simplify_fen(fen: str) -> str:
     but zero out halfmove/fullmove counters to increase transposition hits.
     """
     parts = fen.split()
-    if len(parts) < 6:
+    if len(parts) < 4:
         return fen
-    # normalize: remove castling and en-passant to match internal board_to_fen
-    parts[2] = '-'
-    parts[3] = '-'
-    parts[4] = '0'
-    parts[5] = '1'
-    return ' '.join(parts[:6])
+    return ' '.join(parts[:4] + ['0', '1'])
+
+
+def iter_games(pgn_path: str):
+    """Yield the games of a PGN file one at a time (python-chess Game objects)."""
+    if chess is None:
+        raise RuntimeError('python-chess is required to read PGN files: pip install python-chess')
+    with open(pgn_path, 'r', encoding='utf-8', errors='ignore') as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            yield game
+
+
+def iter_positions(game):
+    """Yield (fen, move) for every mainline move: the position before the move and the move.
+
+    en_passant='fen' records the ep square after every double step,
+    which is what Board.to_fen emits.
+    """
+    board = game.board()
+    for move in game.mainline_moves():
+        yield board.fen(en_passant='fen'), move
+        board.push(move)
 
 
 def build_book(pgn_path: str, out_path: str):
@@ -31,18 +50,12 @@ def build_book(pgn_path: str, out_path: str):
         raise RuntimeError('python-chess is required to build the book: pip install python-chess')
 
     counts = {}
-    with open(pgn_path, 'r', encoding='utf-8', errors='ignore') as f:
-        while True:
-            game = chess.pgn.read_game(f)
-            if game is None:
-                break
-            board = game.board()
-            for move in game.mainline_moves():
-                fen = simplify_fen(board.fen())
-                uci = move.uci()
-                counts.setdefault(fen, {})
-                counts[fen][uci] = counts[fen].get(uci, 0) + 1
-                board.push(move)
+    for game in iter_games(pgn_path):
+        for fen, move in iter_positions(game):
+            fen = simplify_fen(fen)
+            uci = move.uci()
+            counts.setdefault(fen, {})
+            counts[fen][uci] = counts[fen].get(uci, 0) + 1
 
     os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
     with open(out_path, 'w', encoding='utf-8') as out:
@@ -0,0 +1,251 @@
+from const import *
+from attacks import (OFF_BOARD, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS,
+                     BISHOP_RAYS, ROOK_RAYS, QUEEN_RAYS)
+
+# 0x88 mailbox: a 128-byte board, 16 cells per row (row 0 = rank 8) of which the
+# right half is off the board, so `square & 0x88` is non-zero for any step that
+# leaves the board. Square index = row * 16 + col. Steps and rays come from the
+# precomputed tables in attacks.py.
+
+# piece codes: 1-6 for white pawn..king, BLACK added for black, 0 for an empty cell
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+BLACK = 8
+PIECE_CODES = {'pawn': PAWN, 'knight': KNIGHT, 'bishop': BISHOP, 'rook': ROOK, 'queen': QUEEN, 'king': KING}
+SLIDER_RAYS = {BISHOP: BISHOP_RAYS, ROOK: ROOK_RAYS, QUEEN: QUEEN_RAYS}
+# piece values for static exchange evaluation (pawns), indexed by piece kind
+SEE_VALUES = (0, 1, 3, 3, 5, 9, 100)
+
+# special move kinds returned by Mailbox.targets
+EN_PASSANT = 1
+CASTLING = 2
+
+
+def index(row, col):
+    return row * 16 + col
+
+
+def attacked(cells, sq, by_black):
+    '''
+        True if a piece of the given side attacks `sq` on the 0x88 `cells`
+    '''
+    enemy = BLACK if by_black else 0
+    # pawns of the attacking side stand where a pawn of the other side would capture
+    pawn = PAWN | enemy
+    for s in PAWN_ATTACKS[0 if by_black else 1][sq]:
+        if cells[s] == pawn:
+            return True
+    knight = KNIGHT | enemy
+    for s in KNIGHT_ATTACKS[sq]:
+        if cells[s] == knight:
+            return True
+    king = KING | enemy
+    for s in KING_ATTACKS[sq]:
+        if cells[s] == king:
+            return True
+    queen = QUEEN | enemy
+    for rays, slider in ((BISHOP_RAYS, BISHOP | enemy), (ROOK_RAYS, ROOK | enemy)):
+        for ray in rays[sq]:
+            for s in ray:
+                code = cells[s]
+                if code:
+                    if code == slider or code == queen:
+                        return True
+                    break
+    return False
+
+
+def least_valuable_attacker(cells, sq, black):
+    '''
+        (square, kind) of the cheapest piece of the given side attacking `sq`, or None
+    '''
+    side = BLACK if black else 0
+    pawn = PAWN | side
+    for s in PAWN_ATTACKS[0 if black else 1][sq]:
+        if cells[s] == pawn:
+            return s, PAWN
+    knight = KNIGHT | side
+    for s in KNIGHT_ATTACKS[sq]:
+        if cells[s] == knight:
+            return s, KNIGHT
+    best = None
+    for rays, kinds in ((BISHOP_RAYS, (BISHOP, QUEEN)), (ROOK_RAYS, (ROOK, QUEEN))):
+        for ray in rays[sq]:
+            for s in ray:
+                code = cells[s]
+                if code:
+                    kind = code & 7
+                    if code & BLACK == side and kind in kinds and \
+                            (best is None or SEE_VALUES[kind] < SEE_VALUES[best[1]]):
+                        best = (s, kind)
+                    break
+    if best is not None:
+        return best
+    king = KING | side
+    for s in KING_ATTACKS[sq]:
+        if cells[s] == king:
+            return s, KING
+    return None
+
+
+class Mailbox:
+    '''
+        bytearray (0x88) copy of a Board's placement, used by Board.calc_moves to
+        generate moves and test them for check without building temporary boards.
+        `ep` is the square of the pawn that may be captured en passant (-1: none),
+        `kings` the squares of the white and black king (-1: no king).
+    '''
+
+    def __init__(self, cells, ep=-1, kings=(-1, -1)):
+        self.cells = cells
+        self.ep = ep
+        self.kings = list(kings)
+
+    @classmethod
+    def from_board(cls, board):
+        cells = bytearray(128)
+        ep = -1
+        kings = [-1, -1]
+        for row, col, p in board.pieces():
+            code = PIECE_CODES[p.name] | (BLACK if p.color == 'black' else 0)
+            s = row * 16 + col
+            cells[s] = code
+            kind = code & 7
+            if kind == KING:
+                kings[code >> 3] = s
+            elif kind == PAWN and p.en_passant:
+                ep = s
+        return cls(cells, ep, kings)
+
+    def attacked(self, sq, by_black):
+        return attacked(self.cells, sq, by_black)
+
+    def is_capture(self, frm, to):
+        '''
+            True if the move frm -> to captures something (en passant included)
+        '''
+        cells = self.cells
+        return bool(cells[to]) or (cells[frm] & 7 == PAWN and (to & 7) != (frm & 7))
+
+    def see(self, frm, to):
+        '''
+            Static exchange evaluation of frm -> to: the material (pawns) the mover
+            wins, or loses when negative, if both sides keep recapturing on `to` with
+            their least valuable attacker and may stop whenever that pays. A quiet
+            move scores 0, or less when it puts the piece en prise.
+        '''
+        cells = bytearray(self.cells)
+        code = cells[frm]
+        victim = cells[to]
+        gain = [SEE_VALUES[victim & 7]]
+        if code & 7 == PAWN and not victim and (to & 7) != (frm & 7):
+            # en passant
+            cells[(frm & 0x70) | (to & 7)] = 0
+            gain[0] = SEE_VALUES[PAWN]
+        on_square = SEE_VALUES[code & 7]
+        cells[to] = code
+        cells[frm] = 0
+        black = not code & BLACK
+        while True:
+            attacker = least_valuable_attacker(cells, to, black)
+            if attacker is None:
+                break
+            s, kind = attacker
+            if kind == KING and attacked(cells, to, not black):
+                # the king cannot recapture a defended piece
+                break
+            gain.append(on_square - gain[-1])
+            on_square = SEE_VALUES[kind]
+            cells[to] = cells[s]
+            cells[s] = 0
+            black = not black
+        for i in range(len(gain) - 1, 0, -1):
+            gain[i - 1] = -max(-gain[i - 1], gain[i])
+        return gain[0]
+
+    def in_check(self, black):
+        '''
+            True if the king of the given side is attacked
+        '''
+        king = self.kings[1 if black else 0]
+        return king >= 0 and attacked(self.cells, king, not black)
+
+    def targets(self, frm, moved=True, castle_queen=False, castle_king=False):
+        '''
+            Pseudo-legal moves of the piece on `frm` as (to, kind) pairs, kind being
+            None, EN_PASSANT or CASTLING. `moved` is the piece's moved flag (pawn
+            double steps), castle_* say whether the king/rook pair may still castle.
+        '''
+        cells = self.cells
+        code = cells[frm]
+        kind = code & 7
+        black = code & BLACK
+        out = []
+        if kind == PAWN:
+            step = 16 if black else -16
+            s = frm + step
+            for _ in range(1 if moved else 2):
+                if s & OFF_BOARD or cells[s]:
+                    break
+                out.append((s, None))
+                s += step
+            for s in PAWN_ATTACKS[1 if black else 0][frm]:
+                if cells[s] and cells[s] & BLACK != black:
+                    out.append((s, None))
+            # en passant: from the fifth rank, next to the pawn that just double-stepped
+            if self.ep >= 0 and frm >> 4 == (4 if black else 3):
+                for side in (-1, 1):
+                    s = frm + side
+                    if s == self.ep and not s & OFF_BOARD and cells[s] & BLACK != black:
+                        out.append((s + step, EN_PASSANT))
+        elif kind == KNIGHT or kind == KING:
+            for s in (KNIGHT_ATTACKS if kind == KNIGHT else KING_ATTACKS)[frm]:
+                target = cells[s]
+                if not target or target & BLACK != black:
+                    out.append((s, None))
+            if kind == KING:
+                base = frm & 0x70
+                if castle_queen and not (cells[base + 1] or cells[base + 2] or cells[base + 3]):
+                    out.append((base + 2, CASTLING))
+                if castle_king and not (cells[base + 5] or cells[base + 6]):
+                    out.append((base + 6, CASTLING))
+        else:
+            for ray in SLIDER_RAYS[kind][frm]:
+                for s in ray:
+                    target = cells[s]
+                    if target:
+                        if target & BLACK != black:
+                            out.append((s, None))
+                        break
+                    out.append((s, None))
+        return out
+
+    def is_safe(self, frm, to):
+        '''
+            True if moving the piece on `frm` to `to` does not leave its own king
+            in check (en passant captures and castling rook moves included)
+        '''
+        cells = bytearray(self.cells)
+        code = cells[frm]
+        black = code & BLACK
+        kind = code & 7
+        if kind == PAWN and (to & 7) != (frm & 7) and not cells[to]:
+            cells[(frm & 0x70) | (to & 7)] = 0
+        elif kind == KING and abs((to & 7) - (frm & 7)) == 2:
+            base = frm & 0x70
+            rook_from, rook_to = (base, base + 3) if to < frm else (base + 7, base + 5)
+            cells[rook_to] = cells[rook_from]
+            cells[rook_from] = 0
+        cells[frm] = 0
+        cells[to] = code
+        king = to if kind == KING else self.kings[1 if black else 0]
+        return king < 0 or not attacked(cells, king, not black)
+
+    def can_castle(self, frm, to):
+        '''
+            True if the king on `frm` may castle to `to`: not out of, through or into check
+        '''
+        black = self.cells[frm] & BLACK
+        if attacked(self.cells, frm, not black):
+            return False
+        step = 1 if to > frm else -1
+        return self.is_safe(frm, frm + step) and self.is_safe(frm, to)
@@ -1,14 +1,18 @@
 import pygame
 import sys
 import os
+import time
 
 from const import *
 from game import Game
+from renderer import Renderer
+from scheduler import FrameScheduler, ENGINE_EVENT
 from square import Square
 from move import Move
-import threading
+from engine_service import EngineService
+from hud import Hud, HUD_REFRESH_MS
+import multiprocessing
 import queue
-import copy
 
 class Main:
 
@@ -27,6 +31,10 @@ class Main:
             print(f"Warning: Icon file not found at {icon_path}")
 
         self.game = Game()
+        self.renderer = Renderer(self.game)
+        self.scheduler = FrameScheduler(drag_fps=DRAG_FPS)
+        # performance overlay (H key)
+        self.hud = Hud(self.game, self.scheduler)
         # UI: bot selectors and reset
         self.font = pygame.font.SysFont('monospace', 16, bold=True)
         from ui import BotSelector, Button
@@ -45,21 +53,81 @@ class Main:
         self.sidebar_width = 220
         # small settings toggle button (visible when sidebar closed)
         self.settings_btn = Button((w-40, 10, 30, 30), 'S', self.font, bg=(180,200,220))
-        # engine background thread queue
+        # engine process (searches off the GUI process) and its result queue
         self.engine_queue = queue.Queue()
-        self.engine_thread = None
-        self.engine_thread_running = False
+        self.engine = EngineService(self.engine_queue)
+        # side the engine is currently thinking for (None = idle)
         self.engine_side = None
+        # engine move received but held back until ENGINE_MOVE_DELAY has elapsed
+        self.engine_result = None
+        self.last_move_time = 0
         # minimax depth (kept internal, slider removed for smoother UI)
         self.minimax_depth = 2
-        # start background load of Magnus opening book if present (non-blocking)
-        try:
-            import ai as _ai
-            tbook = threading.Thread(target=_ai.load_magnus_book, daemon=True)
-            tbook.start()
-        except Exception:
-            # safe to ignore if loader not available
-            pass
+        # (the engine process loads the Magnus opening book when it starts)
+
+    def cancel_engine(self):
+        """Abandon the running search and any move not yet applied (reset, bot change)."""
+        self.engine.cancel()
+        self.engine_side = None
+        self.engine_result = None
+        self.hud.engine_started = None
+        while True:
+            try:
+                self.engine_queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def layout(self):
+        """Compute square size and board origin for the current window and sidebar state
+        and hand them to the game drawing routines."""
+        # reserve sidebar area if visible and compute square size & origin
+        w, h = self.screen.get_size()
+        avail_w = w - (self.sidebar_width if self.show_sidebar else 0)
+        board_size = min(avail_w, h)
+        # square size (float for smoother scaling)
+        sq = board_size / ROWS
+        # center board horizontally within available area and vertically
+        board_origin_x = int((avail_w - board_size) / 2)
+        board_origin_y = int((h - board_size) / 2)
+
+        # provide layout to game drawing routines
+        self.game._sq = sq
+        self.game._board_origin = (board_origin_x, board_origin_y)
+        return sq, board_origin_x, board_origin_y
+
+    def draw_ui(self, screen):
+        """Draw the settings toggle or the sidebar (whichever is visible)."""
+        w, h = screen.get_size()
+        if self.show_sidebar:
+            # the sidebar sits at the right edge of the board
+            sq, board_origin_x, _ = self.layout()
+            sidebar_x = int(board_origin_x + sq * ROWS)
+            # draw sidebar background to the right of the board
+            pygame.draw.rect(screen, (240,240,240), (sidebar_x, 0, self.sidebar_width, h))
+            # position buttons inside sidebar
+            self.white_bot_btn.rect.topleft = (sidebar_x + 15, 60)
+            self.black_bot_btn.rect.topleft = (sidebar_x + 15, 110)
+            self.reset_btn.rect.topleft = (sidebar_x + 15, 160)
+            # draw labels
+            title_lbl = self.font.render('Settings', True, (20,20,20))
+            screen.blit(title_lbl, (sidebar_x + 15, 20))
+            # draw controls
+            self.white_bot_btn.draw(screen)
+            self.black_bot_btn.draw(screen)
+            self.reset_btn.draw(screen)
+            # note: depth slider removed for smoother UI
+        else:
+            # small settings button in top-right
+            self.settings_btn.rect.topleft = (w-40, 10)
+            self.settings_btn.draw(screen)
+
+    def ui_rects(self, screen):
+        """Rects covered by draw_ui (used by the dirty-rectangle renderer)."""
+        w, h = screen.get_size()
+        if self.show_sidebar:
+            sq, board_origin_x, _ = self.layout()
+            return [pygame.Rect(int(board_origin_x + sq * ROWS), 0, self.sidebar_width, h)]
+        return [pygame.Rect(w-40, 10, 30, 30)]
 
     def mainloop(self):
         
@@ -67,59 +135,52 @@ class Main:
         game = self.game
         board = self.game.board
         dragger = self.game.dragger
+        renderer = self.renderer
+        scheduler = self.scheduler
+        hud = self.hud
 
         while True:
-            # compute layout: reserve sidebar area if visible and compute square size & origin
-            w, h = screen.get_size()
-            avail_w = w - (self.sidebar_width if self.show_sidebar else 0)
-            board_size = min(avail_w, h)
-            # square size (float for smoother scaling)
-            sq = board_size / ROWS
-            # center board horizontally within available area and vertically
-            board_origin_x = int((avail_w - board_size) / 2)
-            board_origin_y = int((h - board_size) / 2)
-            # if sidebar is visible, it sits at the right edge of the window
-            sidebar_x = int(board_origin_x + board_size)
-
-            # provide layout to game drawing routines
-            game._sq = sq
-            game._board_origin = (board_origin_x, board_origin_y)
-
-            # show methods (they use game._sq and game._board_origin)
-            game.show_bg(screen)
-            game.show_last_move(screen)
-            game.show_moves(screen)
-            game.show_pieces(screen)
-            game.show_hover(screen)
-            # UI draw: settings toggle or sidebar
-            # w,h already computed above; sidebar_x computed above
-            if self.show_sidebar:
-                # draw sidebar background to the right of the board
-                pygame.draw.rect(screen, (240,240,240), (sidebar_x, 0, self.sidebar_width, h))
-                # position buttons inside sidebar
-                self.white_bot_btn.rect.topleft = (sidebar_x + 15, 60)
-                self.black_bot_btn.rect.topleft = (sidebar_x + 15, 110)
-                self.reset_btn.rect.topleft = (sidebar_x + 15, 160)
-                # draw labels
-                title_lbl = self.font.render('Settings', True, (20,20,20))
-                screen.blit(title_lbl, (sidebar_x + 15, 20))
-                # draw controls
-                self.white_bot_btn.draw(screen)
-                self.black_bot_btn.draw(screen)
-                self.reset_btn.draw(screen)
-                # note: depth slider removed for smoother UI
-            else:
-                # small settings button in top-right
-                self.settings_btn.rect.topleft = (w-40, 10)
-                self.settings_btn.draw(screen)
-            # show move field and status (top overlays)
-            game.show_move_field(screen)
-            game.show_status(screen)
-
-            if dragger.dragging:
-                dragger.update_blit(screen)
-
-            for event in pygame.event.get():
+            sq, board_origin_x, board_origin_y = self.layout()
+
+            # if it's engine's turn, hand the position to the engine process; the result
+            # arrives through engine_queue together with an ENGINE_EVENT
+            engine_name = self.white_engine if game.next_player == 'white' else self.black_engine
+            if engine_name != 'human' and self.engine_side is None and self.engine_result is None \
+                    and not game.over():
+                self.engine_side = game.next_player
+                # think on the opponent's time when a human plays against the engine
+                opponent_engine = self.black_engine if game.next_player == 'white' else self.white_engine
+                self.engine.request(board, game.next_player, engine_name, self.minimax_depth,
+                                    ponder=opponent_engine == 'human')
+                hud.engine_started = time.perf_counter()
+
+            # draw only what changed since the last frame (full redraw after invalidate)
+            hud.frame_begin()
+            renderer.render(screen, self.draw_ui, self.ui_rects(screen), drag_size=int(sq * 1.28),
+                            hud=hud)
+            hud.frame_end()
+
+            # sleep until input arrives; pace frames while dragging; wake up in time
+            # for a held-back engine move
+            timeout = None
+            if self.engine_result is not None:
+                timeout = ENGINE_MOVE_DELAY - (pygame.time.get_ticks() - self.last_move_time)
+            if hud.enabled:
+                # keep the HUD's numbers (engine think time) ticking while idle
+                timeout = HUD_REFRESH_MS if timeout is None else min(timeout, HUD_REFRESH_MS)
+            events = scheduler.wait(active=dragger.dragging, timeout_ms=timeout)
+
+            for event in events:
+
+                # engine result ready: pick it up from the queue
+                if event.type == ENGINE_EVENT:
+                    try:
+                        self.engine_result = self.engine_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                    hud.engine_started = None
+                    hud.engine_stats = self.engine.last_stats
+                    continue
 
                 # window resized (allow maximize/minimize and re-layout)
                 if event.type == pygame.VIDEORESIZE:
@@ -129,6 +190,7 @@ class Main:
                     # reposition settings button
                     w, h = screen.get_size()
                     self.settings_btn.rect.topleft = (w-40, 10)
+                    renderer.invalidate()
                     continue
 
                 # click
@@ -138,16 +200,22 @@ class Main:
                         if self.white_bot_btn.is_clicked(event.pos):
                             self.white_bot_btn.click()
                             self.white_engine = self.white_bot_btn.current()
+                            self.cancel_engine()
+                            renderer.invalidate()
                             continue
                         if self.black_bot_btn.is_clicked(event.pos):
                             self.black_bot_btn.click()
                             self.black_engine = self.black_bot_btn.current()
+                            self.cancel_engine()
+                            renderer.invalidate()
                             continue
                         if self.reset_btn.is_clicked(event.pos):
+                            self.cancel_engine()
                             game.reset()
                             game = self.game
                             board = self.game.board
                             dragger = self.game.dragger
+                            renderer.invalidate()
                             continue
                         # (depth slider removed)
                         pass
@@ -155,6 +223,7 @@ class Main:
                         if self.settings_btn.is_clicked(event.pos):
                             # open sidebar
                             self.show_sidebar = True
+                            renderer.invalidate()
                             continue
 
                     # now board interaction
@@ -177,14 +246,9 @@ class Main:
                         piece = board.squares[clicked_row][clicked_col].piece
                         # valid piece (color) ?
                         if piece.color == game.next_player:
-                            board.calc_moves(piece, clicked_row, clicked_col, bool=True)
+                            board.set_legal_moves(piece, clicked_row, clicked_col)
                             dragger.save_initial_rc(clicked_row, clicked_col)
                             dragger.drag_piece(piece)
-                            # show methods 
-                            game.show_bg(screen)
-                            game.show_last_move(screen)
-                            game.show_moves(screen)
-                            game.show_pieces(screen)
                 
                 # mouse motion
                 elif event.type == pygame.MOUSEMOTION:
@@ -203,13 +267,6 @@ class Main:
 
                     if dragger.dragging:
                         dragger.update_mouse(event.pos)
-                        # show methods
-                        game.show_bg(screen)
-                        game.show_last_move(screen)
-                        game.show_moves(screen)
-                        game.show_pieces(screen)
-                        game.show_hover(screen)
-                        dragger.update_blit(screen)
                 
                 # click release
                 elif event.type == pygame.MOUSEBUTTONUP:
@@ -235,16 +292,13 @@ class Main:
                         if board.valid_move(dragger.piece, move):
                             # normal capture
                             captured = board.squares[released_row][released_col].has_piece()
+                            game.record_move()
                             board.move(dragger.piece, move)
 
                             board.set_true_en_passant(dragger.piece)                            
 
                             # sounds
                             game.play_sound(captured)
-                            # show methods
-                            game.show_bg(screen)
-                            game.show_last_move(screen)
-                            game.show_pieces(screen)
                             # next turn
                             game.next_turn()
                     
@@ -257,6 +311,7 @@ class Main:
                         # if click is inside board area, keep sidebar open; otherwise close
                         if event.pos[0] < avail_w:
                             self.show_sidebar = False
+                            renderer.invalidate()
                 # slider mouse motion while dragging (slider removed)
                 # we still allow hover updates to update visual state
                 if self.show_sidebar and event.type == pygame.MOUSEMOTION:
@@ -265,73 +320,61 @@ class Main:
                 # key press
                 elif event.type == pygame.KEYDOWN:
                     
+                    # performance overlay
+                    if event.key == pygame.K_h:
+                        hud.toggle()
+                        renderer.invalidate()
+
                     # changing themes
                     if event.key == pygame.K_t:
                         game.change_theme()
+                        renderer.invalidate()
+
+                    # take back a move (two if that would hand the move to a bot)
+                    if event.key == pygame.K_u and not dragger.dragging:
+                        self.cancel_engine()
+                        if game.undo():
+                            to_move = self.white_engine if game.next_player == 'white' else self.black_engine
+                            if to_move != 'human':
+                                game.undo()
+                        renderer.invalidate()
 
                     # reset game
                     if event.key == pygame.K_r:
+                        self.cancel_engine()
                         game.reset()
                         game = self.game
                         board = self.game.board
                         dragger = self.game.dragger
+                        renderer.invalidate()
 
                 # quit application
                 elif event.type == pygame.QUIT:
+                    self.engine.close()
                     pygame.quit()
                     sys.exit()
-            # if it's engine's turn, call its move
-            # Engine scheduling: run engine move once in background thread and place result in engine_queue
-            from ai import get_bot_move
-
-            def engine_worker(board_copy, color, engine_name, depth):
-                m = get_bot_move(board_copy, color, engine=engine_name, depth=depth)
-                # Only enqueue the computed move; do not toggle engine flags here.
-                # The main loop will clear the running flag after the move is applied
-                self.engine_queue.put((color, m))
-
-            # start worker if engine turn and not already running
-            if game.next_player == 'white' and self.white_engine != 'human' and not self.engine_thread_running:
-                self.engine_thread_running = True
-                self.engine_side = 'white'
-                # create a deep copy so the engine computes on a stable snapshot
-                bcopy = copy.deepcopy(board)
-                t = threading.Thread(target=engine_worker, args=(bcopy, 'white', self.white_engine, self.minimax_depth), daemon=True)
-                t.start()
-
-            if game.next_player == 'black' and self.black_engine != 'human' and not self.engine_thread_running:
-                self.engine_thread_running = True
-                self.engine_side = 'black'
-                bcopy = copy.deepcopy(board)
-                t = threading.Thread(target=engine_worker, args=(bcopy, 'black', self.black_engine, self.minimax_depth), daemon=True)
-                t.start()
-
-            # apply any completed engine move
-            try:
-                # Only get one move at a time, with a minimum delay between moves
-                if not hasattr(self, 'last_move_time'):
-                    self.last_move_time = 0
-                
+            # apply a completed engine move, with a minimum delay between moves
+            if self.engine_result is not None:
                 current_time = pygame.time.get_ticks()
-                # Enforce a minimum 1 second delay between moves
-                if current_time - self.last_move_time >= 1000:  # 1000ms = 1 second
-                    color, move = self.engine_queue.get_nowait()
-                    if move:
+                if current_time - self.last_move_time >= ENGINE_MOVE_DELAY:
+                    color, move = self.engine_result
+                    self.engine_result = None
+                    # a move the engine could not produce leaves engine_side set: that side
+                    # stays idle until the bot selection changes or the game is reset
+                    if move and color == game.next_player:
                         piece = board.squares[move.initial.row][move.initial.col].piece
                         captured = board.squares[move.final.row][move.final.col].has_piece()
+                        game.record_move()
                         board.move(piece, move)
                         board.set_true_en_passant(piece)
                         game.play_sound(captured)
                         game.next_turn()
-                        # mark engine worker as finished so a new one can be started on the next engine turn
-                        self.engine_thread_running = False
+                        # mark engine as idle so a new search can be requested on the next engine turn
                         self.engine_side = None
                         self.last_move_time = current_time
-            except queue.Empty:
-                pass
-
-            pygame.display.update()
-
 
-main = Main()
-main.mainloop()
\ No newline at end of file
+if __name__ == '__main__':
+    # the engine runs in a spawned process: this module must not start the GUI on import
+    multiprocessing.freeze_support()
+    main = Main()
+    main.mainloop()
\ No newline at end of file
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+
+class LegalMoveCache:
+    '''
+        Bounded LRU of legal-move lists keyed by Board.hash(color).
+
+        The Zobrist key covers placement, side to move, castling rights and the
+        en-passant square, so a position reached again (another frame, another click,
+        a transposition in the search) reuses its move list and nothing has to be
+        invalidated when the board changes. Entries are tuples of
+        (row, col, final_row, final_col) so they can be shared safely.
+    '''
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._moves = OrderedDict()
+
+    def get(self, key):
+        moves = self._moves.get(key)
+        if moves is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._moves.move_to_end(key)
+        return moves
+
+    def put(self, key, moves):
+        self._moves[key] = moves
+        self._moves.move_to_end(key)
+        if len(self._moves) > self.max_entries:
+            self._moves.popitem(last=False)
+
+    def clear(self):
+        self._moves.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._moves)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._moves),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+        }
+
+
+# shared by every board in the process (GUI, status checks, bots)
+legal_move_cache = LegalMoveCache()
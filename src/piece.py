@@ -1,5 +1,6 @@
 import os
 import sys
+from functools import lru_cache
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -11,6 +12,12 @@ def resource_path(relative_path):
     
     return os.path.join(base_path, relative_path)
 
+@lru_cache(maxsize=None)
+def texture_path(size, color, name):
+    # resolving the path (abspath) is slow next to building a piece: boards are
+    # built often (snapshots, search), so resolve each texture once
+    return resource_path(f'assets/images/imgs-{size}px/{color}_{name}.png')
+
 class Piece:
 
     def __init__(self, name, color, value, texture=None, texture_rect=None):
@@ -25,8 +32,7 @@ class Piece:
         self.texture_rect = texture_rect
 
     def set_texture(self, size=80):
-        self.texture = resource_path(
-            f'assets/images/imgs-{size}px/{self.color}_{self.name}.png')
+        self.texture = texture_path(size, self.color, self.name)
 
     def add_move(self, move):
         self.moves.append(move)
@@ -0,0 +1,192 @@
+import pygame
+
+from const import *
+
+class Renderer:
+    '''
+        Dirty-rectangle renderer for the main loop.
+
+        Each frame builds an appearance signature per square (piece, last move,
+        legal-move highlight, hover, drag origin, checked king) and repaints only
+        the squares whose signature changed, plus everything under the dragged
+        sprite and under text overlays whose content changed. Only the repainted
+        rects are passed to pygame.display.update. A full redraw happens on the
+        first frame and after invalidate() (resize, theme change, reset, sidebar).
+        The performance HUD, when visible, is handled as one more text overlay.
+    '''
+
+    BACKGROUND = (0, 0, 0)
+
+    def __init__(self, game):
+        self.game = game
+        self.full = True
+        self._signatures = {}
+        self._overlays = {}
+        self._drag_rect = None
+
+    def invalidate(self):
+        self.full = True
+
+    def render(self, surface, draw_ui, ui_rects=(), drag_size=128, hud=None):
+        """Draw a frame and push it to the display.
+
+        draw_ui(surface) redraws the settings button / sidebar; ui_rects are their rects
+        (used to tell when a partial repaint touched them). hud: optional Hud drawn on top.
+        Returns the list of updated rects, or None after a full redraw.
+        """
+        game = self.game
+        status = game.status()
+        signatures = self._square_signatures(status)
+        overlays = self._overlays_now(surface, status, hud)
+        drag_rect = self._drag_rect_now(drag_size)
+
+        if self.full:
+            self._render_full(surface, draw_ui, status, drag_size, overlays, hud)
+            rects = None
+        else:
+            rects = self._render_dirty(surface, draw_ui, ui_rects, status, drag_size,
+                                       signatures, overlays, drag_rect, hud)
+
+        self.full = False
+        self._signatures = signatures
+        self._overlays = overlays
+        self._drag_rect = drag_rect
+
+        if rects is None:
+            pygame.display.update()
+        elif rects:
+            pygame.display.update(rects)
+        return rects
+
+    # frame paths
+
+    def _render_full(self, surface, draw_ui, status, drag_size, overlays, hud):
+        game = self.game
+        surface.fill(self.BACKGROUND)
+        game.show_bg(surface)
+        game.show_last_move(surface)
+        game.show_moves(surface)
+        game.show_pieces(surface)
+        game.show_hover(surface)
+        draw_ui(surface)
+        game.show_move_field(surface)
+        game.show_status(surface, status=status)
+        if game.dragger.dragging:
+            game.dragger.update_blit(surface, size=drag_size)
+        if 'hud' in overlays:
+            hud.draw(surface, list(overlays['hud'][0]))
+
+    def _render_dirty(self, surface, draw_ui, ui_rects, status, drag_size,
+                      signatures, overlays, drag_rect, hud):
+        game = self.game
+        dirty = {sq for sq, sig in signatures.items() if self._signatures.get(sq) != sig}
+
+        # pixel areas to clear: previous and current drag sprite, changed overlays
+        damaged = [r for r in (self._drag_rect, drag_rect) if r is not None]
+        redraw = set()
+        for name in set(self._overlays) | set(overlays):
+            old, new = self._overlays.get(name), overlays.get(name)
+            if old != new:
+                damaged += [o[1] for o in (old, new) if o is not None]
+                if new is not None:
+                    redraw.add(name)
+        for rect in damaged:
+            dirty |= self._squares_under(surface, rect)
+
+        # overlays lying on repainted squares must be re-blitted over their whole area
+        changed = True
+        while changed:
+            changed = False
+            for name, (_, rect) in overlays.items():
+                if name not in redraw and self._squares_under(surface, rect) & dirty:
+                    redraw.add(name)
+                    damaged.append(rect)
+                    dirty |= self._squares_under(surface, rect)
+                    changed = True
+
+        if not dirty and not damaged:
+            return []
+
+        for rect in damaged:
+            surface.fill(self.BACKGROUND, rect)
+        game.show_bg(surface, dirty)
+        game.show_last_move(surface, dirty)
+        game.show_moves(surface, dirty)
+        game.show_pieces(surface, dirty)
+        game.show_hover(surface, dirty)
+
+        rects = [game.square_rect(surface, row, col) for row, col in dirty] + damaged
+        touched = [r for r in ui_rects if r.collidelist(rects) != -1]
+        if touched:
+            draw_ui(surface)
+            rects += touched
+
+        if 'move_field' in redraw:
+            game.show_move_field(surface)
+        if 'status' in redraw:
+            game.show_status_text(surface, status)
+        game.show_check(surface, dirty, status)
+        if game.dragger.dragging:
+            game.dragger.update_blit(surface, size=drag_size)
+        if 'hud' in redraw:
+            hud.draw(surface, list(overlays['hud'][0]))
+
+        return rects
+
+    # state snapshots
+
+    def _square_signatures(self, status):
+        game = self.game
+        board = game.board
+        dragger = game.dragger
+        last = board.last_move
+        trace = ((last.initial.row, last.initial.col), (last.final.row, last.final.col)) if last else ()
+        targets = {(m.final.row, m.final.col) for m in dragger.piece.moves} if dragger.dragging else ()
+        hover = (game.hovered_sqr.row, game.hovered_sqr.col) if game.hovered_sqr else None
+        _, king_color, highlight = status
+        king_sq = game.king_square(king_color) if highlight else None
+
+        signatures = {}
+        for row, col in ALL_SQUARES:
+            piece = board.squares[row][col].piece
+            sq = (row, col)
+            signatures[sq] = (
+                None if piece is None or piece is dragger.piece else (piece.color, piece.name),
+                sq in trace,
+                sq in targets,
+                sq == hover,
+                highlight if sq == king_sq else None,
+            )
+        return signatures
+
+    def _overlays_now(self, surface, status, hud=None):
+        font = self.game.config.font
+        overlays = {}
+        text = self.game.move_field_text()
+        if text:
+            overlays['move_field'] = (text, pygame.Rect((10, 10), font.size(text)))
+        text = status[0]
+        if text:
+            w, h = font.size(text)
+            x = (surface.get_width() - w) // 2
+            overlays['status'] = (text, pygame.Rect(x, 10, w, h))
+        if hud is not None and hud.enabled:
+            lines = hud.lines()
+            overlays['hud'] = (tuple(lines), hud.rect(surface, lines))
+        return overlays
+
+    def _drag_rect_now(self, drag_size):
+        dragger = self.game.dragger
+        if not dragger.dragging:
+            return None
+        rect = pygame.Rect(0, 0, drag_size, drag_size)
+        rect.center = (dragger.mouseX, dragger.mouseY)
+        return rect
+
+    def _squares_under(self, surface, rect):
+        sq, (ox, oy) = self.game.layout(surface)
+        c0 = max(0, int((rect.left - ox) // sq))
+        c1 = min(COLS - 1, int((rect.right - 1 - ox) // sq))
+        r0 = max(0, int((rect.top - oy) // sq))
+        r1 = min(ROWS - 1, int((rect.bottom - 1 - oy) // sq))
+        return {(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)}
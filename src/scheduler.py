@@ -0,0 +1,70 @@
+import time
+import pygame
+
+# posted by engine workers when a move is ready, so the idle loop wakes up
+ENGINE_EVENT = pygame.USEREVENT + 1
+
+class FrameScheduler:
+    '''
+        Event-driven frame pacing for the GUI loop.
+
+        While nothing animates the loop blocks in pygame.event.wait() until an input
+        event (or an ENGINE_EVENT) arrives, optionally with a timeout for timed
+        wake-ups. While dragging, frames are paced by a Clock capped at drag_fps.
+        Wall time, process CPU time and time spent sleeping are recorded so the idle
+        CPU saved over a busy loop can be reported.
+    '''
+
+    def __init__(self, drag_fps=60):
+        self.drag_fps = drag_fps
+        self.clock = pygame.time.Clock()
+        self.frames = 0
+        self.idle_time = 0.0
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    def wait(self, active=False, timeout_ms=None):
+        """Sleep until there is something to do and return the pending events.
+
+        active: an animation is running (e.g. dragging) -> return at most drag_fps times per second
+        timeout_ms: upper bound on the idle sleep (None = wait for the next event)
+        """
+        self.frames += 1
+        t0 = time.perf_counter()
+        if active:
+            self.clock.tick(self.drag_fps)
+            events = pygame.event.get()
+        else:
+            if timeout_ms is None:
+                event = pygame.event.wait()
+            else:
+                event = pygame.event.wait(max(1, int(timeout_ms)))
+            events = [] if event.type == pygame.NOEVENT else [event]
+            events += pygame.event.get()
+            # keep the clock's frame timing in step without sleeping
+            self.clock.tick()
+        self.idle_time += time.perf_counter() - t0
+        return events
+
+    @staticmethod
+    def notify_engine(**attrs):
+        """Wake the GUI loop from a worker thread (pygame.event.post is thread-safe)."""
+        try:
+            pygame.event.post(pygame.event.Event(ENGINE_EVENT, **attrs))
+        except pygame.error:
+            # display already shut down
+            pass
+
+    def stats(self):
+        """Return wall/CPU/idle figures since the scheduler was created."""
+        wall = max(time.perf_counter() - self._start_wall, 1e-9)
+        cpu = time.process_time() - self._start_cpu
+        return {
+            'frames': self.frames,
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'cpu_pct': 100.0 * cpu / wall,
+            'idle_pct': 100.0 * self.idle_time / wall,
+            # a busy loop keeps one core at 100%: this is the share of it given back
+            'cpu_saved_pct': max(0.0, 100.0 - 100.0 * cpu / wall),
+        }
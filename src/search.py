@@ -0,0 +1,181 @@
+import threading
+import time
+
+
+class SearchStopped(Exception):
+    """Raised inside a search when its context says to stop."""
+
+
+class SearchContext:
+    '''
+        Limits and cancellation for one bot search.
+
+        Carries an optional deadline (time.monotonic() value, or `movetime` seconds from
+        now), an optional node limit and a thread-safe stop flag. Searches call check()
+        once per node; it counts the node and raises SearchStopped when the search has
+        to end. Any thread may call stop().
+    '''
+
+    # nodes between two deadline checks (reading the clock on every node is wasteful)
+    CHECK_EVERY = 32
+
+    def __init__(self, movetime=None, node_limit=None, deadline=None):
+        if deadline is None and movetime is not None:
+            deadline = time.monotonic() + movetime
+        self.deadline = deadline
+        self.node_limit = node_limit
+        self.nodes = 0
+        # SearchStats to fill in, when the caller asked for statistics
+        self.stats = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def stopped(self):
+        """True once stop() was called or a limit has been reached."""
+        if self._stop.is_set():
+            return True
+        if self.expired() or (self.node_limit is not None and self.nodes >= self.node_limit):
+            self._stop.set()
+            return True
+        return False
+
+    def remaining(self):
+        """Seconds left before the deadline (None without one)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """Count a node; raise SearchStopped if the search must end."""
+        self.nodes += 1
+        if self._stop.is_set():
+            raise SearchStopped()
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            self._stop.set()
+            raise SearchStopped()
+        if self.deadline is not None and self.nodes % self.CHECK_EVERY == 0 and self.expired():
+            self._stop.set()
+            raise SearchStopped()
+
+    def wait(self, timeout=None):
+        """Block until stopped (or `timeout` seconds pass). Returns True if stopped."""
+        remaining = self.remaining()
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        if self._stop.wait(timeout):
+            return True
+        return self.stopped()
+
+    def watch(self, callback):
+        """Call callback() from a helper thread once the context stops or expires.
+
+        Used for searches that run elsewhere (external UCI engines). Returns an Event:
+        set it when the search finished on its own to release the watcher.
+        """
+        done = threading.Event()
+
+        def run():
+            while not done.is_set():
+                if self.wait(0.05):
+                    if not done.is_set():
+                        callback()
+                    return
+
+        threading.Thread(target=run, daemon=True).start()
+        return done
+
+
+class SearchStats:
+    '''
+        What one search did, for logs and charts (get_bot_move(..., with_stats=True)).
+
+        Engines fill in what they know: the built-in searches count nodes, beta
+        cutoffs, transposition- and pawn-table traffic and log every iteration; external UCI
+        engines report the nodes and depth they print.
+    '''
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.nodes = 0
+        self.qnodes = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.pawn_probes = 0
+        self.pawn_hits = 0
+        self.depth = 0
+        self.time_s = 0.0
+        # score of the chosen move for the side to move (pawns) and the expected line (UCI)
+        self.score = None
+        self.pv = []
+        # one dict per completed iteration: depth, nodes and time_s spent on it
+        self.iterations = []
+        self._logged_nodes = 0
+        self._logged_time = 0.0
+
+    def iteration(self, depth, total_nodes, total_time_s):
+        """Log a completed iteration, given the search's running node count and time."""
+        self.depth = depth
+        self.iterations.append({'depth': depth,
+                                'nodes': total_nodes - self._logged_nodes,
+                                'time_s': total_time_s - self._logged_time})
+        self._logged_nodes = total_nodes
+        self._logged_time = total_time_s
+
+    @property
+    def first_move_cutoff_rate(self):
+        """Share of beta cutoffs caused by the first move tried (move ordering quality)."""
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else None
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else None
+
+    @property
+    def pawn_hit_rate(self):
+        """Share of pawn-structure evaluations served by the pawn hash table."""
+        return self.pawn_hits / self.pawn_probes if self.pawn_probes else None
+
+    @property
+    def branching_factor(self):
+        """Effective branching factor: node growth between the last two iterations
+        (nodes ** (1 / depth) for single-iteration searches)."""
+        its = self.iterations
+        if len(its) >= 2:
+            prev = its[-2]['nodes']
+            return its[-1]['nodes'] / prev if prev else None
+        if self.nodes and self.depth:
+            return self.nodes ** (1.0 / self.depth)
+        return None
+
+    @property
+    def nps(self):
+        return self.nodes / self.time_s if self.time_s > 0 else None
+
+    def to_dict(self):
+        return {
+            'engine': self.engine,
+            'nodes': self.nodes,
+            'qnodes': self.qnodes,
+            'beta_cutoffs': self.beta_cutoffs,
+            'first_move_cutoff_rate': self.first_move_cutoff_rate,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'tt_hit_rate': self.tt_hit_rate,
+            'pawn_probes': self.pawn_probes,
+            'pawn_hits': self.pawn_hits,
+            'pawn_hit_rate': self.pawn_hit_rate,
+            'branching_factor': self.branching_factor,
+            'depth': self.depth,
+            'score': self.score,
+            'pv': list(self.pv),
+            'time_s': self.time_s,
+            'nps': self.nps,
+            'iterations': list(self.iterations),
+        }
@@ -0,0 +1,55 @@
+import pygame
+from collections import OrderedDict
+
+from piece import resource_path
+
+class TextureCache:
+    '''
+        Piece textures loaded once from disk and smooth-scaled on demand.
+        Scaled surfaces are kept per size in a small LRU so resizing the
+        window does not grow memory without bound.
+    '''
+
+    def __init__(self, max_sizes=4, source_size=128):
+        self.max_sizes = max_sizes
+        self.source_size = source_size
+        self._sources = {}
+        self._scaled = OrderedDict()
+
+    def source(self, color, name):
+        key = (color, name)
+        img = self._sources.get(key)
+        if img is None:
+            img = pygame.image.load(resource_path(
+                f'assets/images/imgs-{self.source_size}px/{color}_{name}.png'))
+            try:
+                img = img.convert_alpha()
+            except pygame.error:
+                # no display mode set yet: keep the raw surface
+                pass
+            self._sources[key] = img
+        return img
+
+    def get(self, piece, size):
+        size = max(1, int(size))
+        textures = self._scaled.get(size)
+        if textures is None:
+            textures = self._scaled[size] = {}
+            if len(self._scaled) > self.max_sizes:
+                self._scaled.popitem(last=False)
+        else:
+            self._scaled.move_to_end(size)
+
+        key = (piece.color, piece.name)
+        img = textures.get(key)
+        if img is None:
+            src = self.source(*key)
+            if src.get_width() == size and src.get_height() == size:
+                img = src
+            else:
+                img = pygame.transform.smoothscale(src, (size, size))
+            textures[key] = img
+        return img
+
+    def clear(self):
+        self._scaled.clear()
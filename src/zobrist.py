@@ -0,0 +1,55 @@
+import random
+
+from const import *
+
+# Zobrist hashing: one random 64-bit key per (piece, square), castling right,
+# en-passant file and side to move. A fixed seed keeps keys identical across
+# processes and runs, so hashes can be exchanged and stored.
+_rng = random.Random(0x5A0B1257)
+
+PIECE_INDEX = {
+    ('white', 'pawn'): 0, ('white', 'knight'): 1, ('white', 'bishop'): 2,
+    ('white', 'rook'): 3, ('white', 'queen'): 4, ('white', 'king'): 5,
+    ('black', 'pawn'): 6, ('black', 'knight'): 7, ('black', 'bishop'): 8,
+    ('black', 'rook'): 9, ('black', 'queen'): 10, ('black', 'king'): 11,
+}
+
+PIECE_KEYS = [[_rng.getrandbits(64) for sq in range(ROWS * COLS)] for piece in range(12)]
+CASTLING_KEYS = {right: _rng.getrandbits(64) for right in 'KQkq'}
+EP_KEYS = [_rng.getrandbits(64) for col in range(COLS)]
+BLACK_TO_MOVE_KEY = _rng.getrandbits(64)
+
+
+def piece_key(piece, row, col):
+    """Key of a piece standing on (row, col); 0 for an empty square."""
+    if piece is None:
+        return 0
+    return PIECE_KEYS[PIECE_INDEX[(piece.color, piece.name)]][row * COLS + col]
+
+
+def placement_key(board):
+    """Full (non-incremental) key of the piece placement."""
+    key = 0
+    for row, col, piece in board.pieces():
+        key ^= piece_key(piece, row, col)
+    return key
+
+
+def pawn_key(board):
+    """Full (non-incremental) key of the pawns only: equal for positions with the same pawn structure."""
+    key = 0
+    for row, col, piece in board.pieces():
+        if piece.name == 'pawn':
+            key ^= piece_key(piece, row, col)
+    return key
+
+
+def state_key(castling, ep_col, color):
+    """Key of the non-placement state: castling rights string, en-passant file and side to move."""
+    key = BLACK_TO_MOVE_KEY if color == 'black' else 0
+    if castling != '-':
+        for right in castling:
+            key ^= CASTLING_KEYS[right]
+    if ep_col is not None:
+        key ^= EP_KEYS[ep_col]
+    return key
@@ -0,0 +1,208 @@
+"""
+Batch position analysis: stream FEN/EPD positions through a bot on a process pool.
+
+Positions are read one line at a time from a file (or stdin with '-'); each line is a
+FEN or an EPD record (an 'id' operation is carried over to the output). They are
+fanned out over worker processes with a bounded number of searches in flight, and
+every result is appended to a JSONL file as soon as it completes:
+
+    {"line": 12, "id": "kiwipete", "fen": "...", "bestmove": "e2a6", "score": 0.35,
+     "pv": ["e2a6", "b4c3"], "stats": {...}}
+
+With --multipv N the record also lists the N best moves found by one search, best first:
+
+    "lines": [{"move": "e2a6", "score": 0.35, "pv": ["e2a6", "b4c3"]}, ...]
+
+Results arrive out of order; "line" is the 1-based input line number. Re-running with
+--resume skips every line already present in the output file, so an interrupted run
+picks up where it stopped.
+
+Usage (from repo root):
+    python tools/analyze_positions.py positions.epd -o analysis.jsonl --engine deepblue --depth 3
+    python tools/analyze_positions.py positions.epd -o analysis.jsonl --movetime 2 --workers 4 --resume
+    python tools/analyze_positions.py positions.epd -o analysis.jsonl --multipv 3
+    cat fens.txt | python tools/analyze_positions.py - -o analysis.jsonl
+"""
+import argparse
+import concurrent.futures as cf
+import json
+import multiprocessing
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+DEFAULT_DEPTH = 3
+# depth cap with --movetime alone: iterative deepening runs until the deadline
+MOVETIME_DEPTH = 64
+
+
+def parse_position(line):
+    """Return (fen, id) for a FEN or EPD line, or None for blank lines and comments."""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    ops = ''
+    if ';' in line:
+        # EPD: four position fields followed by operations ("bm e4; id \"x\";")
+        fields = line.split(None, 4)
+        fen = ' '.join(fields[:4])
+        ops = fields[4] if len(fields) > 4 else ''
+    else:
+        fields = line.split()
+        if len(fields) > 6:
+            fen, ops = ' '.join(fields[:4]), ' '.join(fields[4:])
+        else:
+            fen = ' '.join(fields)
+    name = None
+    for op in ops.split(';'):
+        op = op.strip()
+        if op.startswith('id '):
+            name = op[3:].strip().strip('"')
+    return fen, name
+
+
+def read_done(path):
+    """Line numbers already present in an existing output file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for raw in f:
+            try:
+                done.add(json.loads(raw)['line'])
+            except (ValueError, KeyError, TypeError):
+                # a line cut short by an interrupted run: analyse that position again
+                continue
+    return done
+
+
+# worker side
+
+def _init_worker():
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+    import ai
+    ai.load_magnus_book()
+
+
+def analyze(lineno, fen, name, engine, depth, movetime, multipv=1):
+    import ai
+    from board import Board
+    from search import SearchContext
+
+    result = {'line': lineno, 'id': name, 'fen': fen}
+    try:
+        board = Board.from_fen(fen)
+        ctx = SearchContext(movetime=movetime)
+        if multipv > 1:
+            lines, stats = ai.get_bot_move(board, board.turn, engine=engine, depth=depth,
+                                           ctx=ctx, with_stats=True, multipv=multipv)
+            result['lines'] = [{'move': ai.move_to_uci(m), 'score': score, 'pv': pv}
+                               for m, score, pv in lines]
+            move = lines[0][0] if lines else None
+        else:
+            move, stats = ai.get_bot_move(board, board.turn, engine=engine, depth=depth,
+                                          ctx=ctx, with_stats=True)
+        result.update({
+            'bestmove': ai.move_to_uci(move) if move else None,
+            'score': stats.score,
+            'pv': stats.pv,
+            'stats': stats.to_dict(),
+        })
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    return result
+
+
+# driver
+
+def iter_positions(stream, done):
+    for lineno, line in enumerate(stream, 1):
+        if lineno in done:
+            continue
+        parsed = parse_position(line)
+        if parsed is not None:
+            yield lineno, parsed[0], parsed[1]
+
+
+def run(args):
+    done = read_done(args.output) if args.resume else set()
+    if done:
+        print(f'Resuming: {len(done)} positions already in {args.output}', file=sys.stderr)
+    stream = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    workers = args.workers or os.cpu_count() or 1
+    max_inflight = args.max_inflight or 2 * workers
+    written = failed = 0
+
+    mode = 'a' if args.resume else 'w'
+    if args.resume and os.path.exists(args.output) and os.path.getsize(args.output):
+        with open(args.output, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            cut_short = f.read(1) != b'\n'
+        if cut_short:
+            # terminate the truncated record so new results start on their own line
+            with open(args.output, 'a', encoding='utf-8') as f:
+                f.write('\n')
+    ctx = multiprocessing.get_context('spawn')
+    with open(args.output, mode, encoding='utf-8') as out, \
+            cf.ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                   initializer=_init_worker) as pool:
+        pending = set()
+
+        def drain():
+            # write out whatever has finished (waits for at least one search)
+            nonlocal written, failed
+            finished, _ = cf.wait(pending, return_when=cf.FIRST_COMPLETED)
+            for fut in finished:
+                pending.discard(fut)
+                result = fut.result()
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+                written += 1
+                if 'error' in result:
+                    failed += 1
+                if not args.quiet:
+                    print(f"line {result['line']}: {result.get('bestmove') or result.get('error')}",
+                          file=sys.stderr)
+
+        try:
+            for lineno, fen, name in iter_positions(stream, done):
+                # bounded in-flight work: never read further ahead than max_inflight positions
+                while len(pending) >= max_inflight:
+                    drain()
+                pending.add(pool.submit(analyze, lineno, fen, name, args.engine,
+                                        args.depth, args.movetime, args.multipv))
+            while pending:
+                drain()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    print(f'Analysed {written} positions ({failed} errors) -> {args.output}', file=sys.stderr)
+    return 1 if failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Analyse FEN/EPD positions with a bot, in parallel.')
+    parser.add_argument('input', help="FEN/EPD file, or '-' for stdin")
+    parser.add_argument('-o', '--output', required=True, help='JSONL file to write results to')
+    parser.add_argument('--engine', default='deepblue', help='bot to run (see ai.get_bot_move)')
+    parser.add_argument('--depth', type=int, default=None,
+                        help=f'search depth (plies; default {DEFAULT_DEPTH}, or up to the --movetime deadline)')
+    parser.add_argument('--movetime', type=float, default=None, help='time limit per position (s)')
+    parser.add_argument('--multipv', type=int, default=1, help='report the N best moves of every position')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--max-inflight', type=int, default=None,
+                        help='positions submitted but not finished (default: 2 x workers)')
+    parser.add_argument('--resume', action='store_true', help='skip lines already in the output file')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no per-position progress')
+    args = parser.parse_args(argv)
+    if args.depth is None:
+        args.depth = MOVETIME_DEPTH if args.movetime else DEFAULT_DEPTH
+    return args
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
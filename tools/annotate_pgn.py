@@ -0,0 +1,212 @@
+"""
+Annotate a PGN collection with the built-in engine and flag mistakes and blunders.
+
+Games are streamed from the PGN with the same reader the opening book uses
+(magnus_book.iter_games / iter_positions) and analysed in parallel worker processes.
+Every position of a game's mainline is searched once; a move whose evaluation swing
+(score before the move minus score after it, from the mover's point of view) exceeds
+--threshold pawns gets a '??' and a comment with the engine's preferred move, half that
+swing gets a '?'. Each move also gets a [%eval] comment (white's point of view).
+
+Each game has a time budget (--game-time seconds): when it runs out the rest of the
+game is left unannotated. Positions already searched anywhere in the batch (common
+openings, transpositions) are shared between workers and not searched again.
+
+Usage (from repo root):
+    python tools/annotate_pgn.py games.pgn -o annotated.pgn --depth 2 --threshold 1.5
+    python tools/annotate_pgn.py games.pgn -o annotated.pgn --workers 4 --game-time 120
+
+Requires python-chess (pip install python-chess).
+"""
+import argparse
+import collections
+import io
+import multiprocessing
+import os
+import sys
+import time
+import concurrent.futures as cf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+import magnus_book
+
+# shared by the worker processes: simplified FEN -> (score for side to move, best move uci)
+_evals = None
+_settings = {}
+
+
+def format_eval(score):
+    """Score (pawns, white's point of view) as a PGN [%eval] value."""
+    import ai
+    if abs(score) >= ai.MATE_SCORE - 100:
+        plies = int(round(ai.MATE_SCORE - abs(score)))
+        moves = (plies + 1) // 2
+        return f'#{moves}' if score > 0 else f'#-{moves}'
+    # + 0.0 turns -0.00 into 0.00
+    return f'{round(score, 2) + 0.0:.2f}'
+
+
+# worker side
+
+def _init_worker(evals, settings):
+    global _evals
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+    _evals = evals
+    _settings.update(settings)
+
+
+def evaluate(fen, ctx):
+    """(score for the side to move, best move uci) of a position, from the batch cache
+    or a fresh search. Returns None if the time budget ran out first."""
+    import ai
+    from board import Board
+
+    key = (magnus_book.simplify_fen(fen), _settings['engine'], _settings['depth'])
+    cached = _evals.get(key)
+    if cached is not None:
+        return cached
+    if ctx.stopped():
+        return None
+    board = Board.from_fen(fen)
+    move, stats = ai.get_bot_move(board, board.turn, engine=_settings['engine'],
+                                  depth=_settings['depth'], ctx=ctx, with_stats=True)
+    if stats.score is None or (ctx.stopped() and stats.depth < _settings['depth']):
+        # cut short by the budget: not worth keeping
+        return None
+    result = (stats.score, ai.move_to_uci(move) if move else None)
+    _evals[key] = result
+    return result
+
+
+def engine_move(board, uci):
+    """
+    The engine's best move `uci` as a chess.Move of `board` (a chess.Board). The
+    engine's UCI strings carry no promotion suffix; its pawns always promote to a queen.
+    """
+    import chess
+    move = chess.Move.from_uci(uci)
+    if board.piece_type_at(move.from_square) == chess.PAWN and chess.square_rank(move.to_square) in (0, 7):
+        move.promotion = chess.QUEEN
+    return move
+
+
+def annotate_game(pgn_text):
+    """Annotate one game (PGN text in, PGN text out)."""
+    import chess
+    import chess.pgn
+    import ai
+    from search import SearchContext
+
+    game = chess.pgn.read_game(io.StringIO(pgn_text))
+    threshold = _settings['threshold']
+    ctx = SearchContext(movetime=_settings['game_time'])
+
+    fens = [fen for fen, _ in magnus_book.iter_positions(game)]
+    fens.append(game.end().board().fen(en_passant='fen'))
+    nodes = list(game.mainline())
+
+    flagged = 0
+    before = evaluate(fens[0], ctx)
+    for i, node in enumerate(nodes):
+        after = evaluate(fens[i + 1], ctx)
+        if before is None or after is None:
+            node.comment = (node.comment + ' ' if node.comment else '') + '(analysis stopped: time budget)'
+            break
+        mover_white = node.parent.board().turn == chess.WHITE
+        # scores are for the side to move: after the move that is the opponent
+        loss = before[0] + after[0]
+        white_eval = -after[0] if mover_white else after[0]
+        position = node.board()
+        if position.is_checkmate():
+            # no eval for a finished game (it would read as mate in 0)
+            comment = 'Checkmate.'
+        elif position.is_stalemate():
+            comment = 'Stalemate.'
+        else:
+            comment = f'[%eval {format_eval(white_eval)}]'
+        best = engine_move(node.parent.board(), before[1]) if before[1] else None
+        if loss >= threshold / 2 and best is not None and best != node.move:
+            flagged += 1
+            swing = 'allows mate' if loss >= ai.MATE_SCORE / 2 else f'{loss:+.2f}'
+            if loss >= threshold:
+                node.nags.add(chess.pgn.NAG_BLUNDER)
+                comment += f' Blunder ({swing}). Best was {best.uci()}.'
+            else:
+                node.nags.add(chess.pgn.NAG_MISTAKE)
+                comment += f' Mistake ({swing}). Best was {best.uci()}.'
+        node.comment = (node.comment + ' ' + comment).strip() if node.comment else comment
+        before = after
+
+    game.headers['Annotator'] = f"{_settings['engine']} depth {_settings['depth']}"
+    exporter = chess.pgn.StringExporter(headers=True, variations=True, comments=True)
+    return game.accept(exporter), flagged
+
+
+# driver
+
+def run(args):
+    try:
+        import chess.pgn  # noqa: F401
+    except Exception:
+        print('python-chess is required: pip install python-chess', file=sys.stderr)
+        return 2
+
+    workers = args.workers or os.cpu_count() or 1
+    max_inflight = 2 * workers
+    settings = {'engine': args.engine, 'depth': args.depth, 'threshold': args.threshold,
+                'game_time': args.game_time}
+    mp = multiprocessing.get_context('spawn')
+    games = flagged = 0
+    t0 = time.perf_counter()
+
+    with mp.Manager() as manager, open(args.output, 'w', encoding='utf-8') as out:
+        evals = manager.dict()
+        with cf.ProcessPoolExecutor(max_workers=workers, mp_context=mp, initializer=_init_worker,
+                                    initargs=(evals, settings)) as pool:
+            # futures in input order: games are written in the order they were read
+            pending = collections.deque()
+
+            def write_next():
+                nonlocal games, flagged
+                text, n = pending.popleft().result()
+                out.write(text + '\n\n')
+                out.flush()
+                games += 1
+                flagged += n
+                if not args.quiet:
+                    print(f'game {games}: {n} flagged moves', file=sys.stderr)
+
+            for game in magnus_book.iter_games(args.input):
+                while len(pending) >= max_inflight:
+                    write_next()
+                pending.append(pool.submit(annotate_game, str(game)))
+            while pending:
+                write_next()
+        cached = len(evals)
+
+    print(f'Annotated {games} games ({flagged} flagged moves, {cached} positions searched) '
+          f'in {time.perf_counter() - t0:.1f}s -> {args.output}', file=sys.stderr)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Annotate PGN games with engine evaluations.')
+    parser.add_argument('input', help='PGN file')
+    parser.add_argument('-o', '--output', required=True, help='annotated PGN to write')
+    parser.add_argument('--engine', default='deepblue', help='bot used for evaluation')
+    parser.add_argument('--depth', type=int, default=2, help='search depth per position')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help="evaluation loss (pawns) marking a blunder ('??'); half of it marks a mistake ('?')")
+    parser.add_argument('--game-time', type=float, default=60.0, help='time budget per game (s)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no per-game progress')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
@@ -1,118 +1,272 @@
 """
-Quick benchmarking script for the project's bots.
+Reproducible benchmark suite for the project's bots.
 
-Measures move-selection time (seconds) for each bot on a set of test positions.
-Saves summary CSV to data/bench_results.csv and prints results to stdout.
+Every bot searches the same fixed positions (tools/bench_positions.epd) with a seeded
+RNG and a cold transposition table, and the script records per bot and position:
+wall time, nodes searched, nodes/second, transposition- and pawn-table hit rates and peak Python
+memory (tracemalloc). Results are written as JSON and can be compared against a
+stored baseline; the script exits with status 1 when a bot regressed by more than
+the tolerance.
 
 Usage (from repo root):
-    .env\Scripts\python.exe tools\benchmark_bots.py
+    python tools/benchmark_bots.py                       # run, write data/bench_results.json
+    python tools/benchmark_bots.py --save-baseline       # also store the run as the baseline
+    python tools/benchmark_bots.py --compare             # fail on regressions vs the baseline
+    python tools/benchmark_bots.py --bots deepblue minimax --iterations 5 --tolerance 0.15
 
 Notes:
-- External engines (stockfish/komodo) are invoked with very small depth/time limits to keep the benchmark fast.
-- Adjust ITERATIONS and DEPTHS below to scale the experiment.
+- Node counts are deterministic for a given position/seed, so they also catch search
+  behaviour changes; times and nps depend on the machine, keep the baseline local.
+- External engines (stockfish/komodo) are skipped when no binary is found.
+- Memory is measured on an extra, untimed run because tracemalloc slows Python down.
 """
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
 import sys
 import time
-import csv
-import os
-from statistics import mean, median, stdev
+import tracemalloc
+from statistics import mean, median
 
-sys.path.insert(0, r'd:/Repositories/Chess-Game-AI-Using-Python/src')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
 
 import ai
 from board import Board
+from movecache import legal_move_cache
+from search import SearchContext
 
-# Experiment parameters
-ITERATIONS = 50  # per bot per position (reduce if slow)
-POSITIONS = 5    # number of random positions generated from the initial position
-RANDOM_MOVES = 8 # random plies to make to generate non-opening positions
-OUT_CSV = os.path.join('data', 'bench_results.csv')
+DEFAULT_EPD = os.path.join(ROOT, 'tools', 'bench_positions.epd')
+DEFAULT_OUT = os.path.join(ROOT, 'data', 'bench_results.json')
+DEFAULT_BASELINE = os.path.join(ROOT, 'tools', 'bench_baseline.json')
 
-# Bots to benchmark and per-bot params (depth or randomness)
+# Bots to benchmark and their search depth
 BOTS = [
     ('random', {}),
     ('minimax', {'depth': 2}),
     ('deepblue', {'depth': 3}),
-    ('magnus', {'randomness': 0.0}),
+    ('magnus', {}),
     ('stockfish', {'depth': 1}),
     ('komodo', {'depth': 1}),
 ]
 
-# create test positions: initial and some random plies
-def gen_positions(n_positions, random_plies=8):
+# metric -> +1 if bigger is worse, -1 if smaller is worse (used by the regression check)
+REGRESSION_METRICS = {
+    'time_mean_s': 1,
+    'nodes': 1,
+    'nps': -1,
+    'peak_kb': 1,
+}
+
+# time differences below this many seconds are noise (e.g. the random bot)
+MIN_TIME_DELTA_S = 0.01
+
+
+def load_epd(path):
+    """Read an EPD file into a list of (id, fen). Missing ids become 'pos<N>'."""
     positions = []
-    b = Board()
-    positions.append(b)
-    import random
-    for i in range(1, n_positions):
-        tb = Board()
-        # play random legal moves to create a midgame
-        for j in range(random_plies):
-            # get legal moves
-            moves = ai.all_legal_moves(tb, 'white' if (j % 2 == 0) else 'black')
-            if not moves:
-                break
-            m = random.choice(moves)
-            piece = tb.squares[m.initial.row][m.initial.col].piece
-            tb.move(piece, m)
-            tb.set_true_en_passant(piece)
-        positions.append(tb)
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(None, 4)
+            if len(fields) < 4:
+                raise ValueError(f'invalid EPD line: {line!r}')
+            fen = ' '.join(fields[:4])
+            name = f'pos{len(positions) + 1}'
+            ops = fields[4] if len(fields) > 4 else ''
+            for op in ops.split(';'):
+                op = op.strip()
+                if op.startswith('id '):
+                    name = op[3:].strip().strip('"')
+            positions.append((name, fen))
     return positions
 
 
-def time_bot_on_position(bot_name, board, **kwargs):
+def engine_available(bot_name):
+    if bot_name == 'stockfish':
+        return os.path.exists(os.environ.get('STOCKFISH_PATH', '')) or \
+            ai.find_engine_binary('stockfish') is not None
+    if bot_name == 'komodo':
+        return bool(os.environ.get('KOMODO_PATH')) or \
+            ai.find_engine_binary('komodo') is not None or ai.find_engine_binary('dragon') is not None
+    return True
+
+
+def search_once(bot_name, fen, depth, seed):
+    """One cold search: fresh board, seeded RNG, empty TT and move cache.
+    Returns (move, seconds, ctx)."""
+    board = Board.from_fen(fen)
+    color = board.turn
+    random.seed(seed)
+    ai.tt_clear()
+    ai.pawn_table_clear()
+    legal_move_cache.clear()
+    ctx = SearchContext()
+    t0 = time.perf_counter()
+    move = ai.get_bot_move(board, color, engine=bot_name, depth=depth, ctx=ctx)
+    return move, time.perf_counter() - t0, ctx
+
+
+def bench_position(bot_name, params, name, fen, iterations, seed):
+    depth = params.get('depth', 2)
     times = []
-    for _ in range(ITERATIONS):
-        t0 = time.perf_counter()
-        try:
-            m = ai.get_bot_move(board, 'white', engine=bot_name, depth=kwargs.get('depth', 2))
-        except Exception:
-            m = None
-        t1 = time.perf_counter()
-        times.append(t1 - t0)
-    return times
-
-
-def summarize(times):
+    nodes = 0
+    probes = hits = 0
+    pawn_probes = pawn_hits = 0
+    move = None
+    for _ in range(iterations):
+        move, seconds, ctx = search_once(bot_name, fen, depth, seed)
+        times.append(seconds)
+        nodes = ctx.nodes
+        probes += ai.tt_stats['probes']
+        hits += ai.tt_stats['hits']
+        pawn_probes += ai.pawn_table_stats['probes']
+        pawn_hits += ai.pawn_table_stats['hits']
+
+    tracemalloc.start()
+    try:
+        search_once(bot_name, fen, depth, seed)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    time_mean = mean(times)
     return {
-        'count': len(times),
-        'mean': mean(times),
-        'median': median(times),
-        'stdev': stdev(times) if len(times) > 1 else 0.0,
-        'min': min(times),
-        'max': max(times),
+        'position': name,
+        'bot': bot_name,
+        'depth': depth if 'depth' in params else None,
+        'move': ai.move_to_uci(move) if move else None,
+        'iterations': iterations,
+        'time_mean_s': time_mean,
+        'time_median_s': median(times),
+        'time_min_s': min(times),
+        'time_max_s': max(times),
+        'nodes': nodes,
+        'nps': nodes / time_mean if nodes and time_mean > 0 else None,
+        'tt_hit_rate': hits / probes if probes else None,
+        'pawn_hit_rate': pawn_hits / pawn_probes if pawn_probes else None,
+        'peak_kb': peak / 1024.0,
     }
 
 
-def run():
-    os.makedirs('data', exist_ok=True)
-    positions = gen_positions(POSITIONS, RANDOM_MOVES)
+def summarize(rows):
+    """Per-bot totals over all positions (the numbers the regression check compares)."""
+    totals = {}
+    for bot_name in dict.fromkeys(r['bot'] for r in rows):
+        mine = [r for r in rows if r['bot'] == bot_name]
+        time_total = sum(r['time_mean_s'] for r in mine)
+        nodes = sum(r['nodes'] for r in mine)
+        rates = [r['tt_hit_rate'] for r in mine if r['tt_hit_rate'] is not None]
+        totals[bot_name] = {
+            'positions': len(mine),
+            'time_mean_s': time_total,
+            'nodes': nodes,
+            'nps': nodes / time_total if nodes and time_total > 0 else None,
+            'tt_hit_rate': mean(rates) if rates else None,
+            'peak_kb': max(r['peak_kb'] for r in mine),
+        }
+    return totals
+
+
+def compare(totals, baseline_totals, tolerance):
+    """Return a list of regression messages (empty if none)."""
+    regressions = []
+    for bot_name, current in totals.items():
+        base = baseline_totals.get(bot_name)
+        if base is None:
+            continue
+        for metric, direction in REGRESSION_METRICS.items():
+            old, new = base.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            if metric == 'time_mean_s' and abs(new - old) < MIN_TIME_DELTA_S:
+                continue
+            change = (new - old) / old
+            if change * direction > tolerance:
+                regressions.append(f'{bot_name}: {metric} {old:.4g} -> {new:.4g} ({change:+.1%})')
+    return regressions
+
+
+def run(args):
+    positions = load_epd(args.epd)
+    bots = [(n, p) for n, p in BOTS if not args.bots or n in args.bots]
     rows = []
-    print('Benchmarking bots on', len(positions), 'positions with', ITERATIONS, 'iterations each...')
-    for i, pos in enumerate(positions):
-        print(f'Position {i+1}/{len(positions)}')
-        for bot_name, params in BOTS:
-            print('  ', bot_name, end=' -> ', flush=True)
-            times = time_bot_on_position(bot_name, pos, **params)
-            stats = summarize(times)
-            print(f"mean {stats['mean']:.4f}s median {stats['median']:.4f}s max {stats['max']:.4f}s")
-            rows.append({
-                'position_index': i,
-                'bot': bot_name,
-                'iterations': stats['count'],
-                'mean_s': stats['mean'],
-                'median_s': stats['median'],
-                'stdev_s': stats['stdev'],
-                'min_s': stats['min'],
-                'max_s': stats['max'],
-            })
-    # write CSV
-    with open(OUT_CSV, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
-        writer.writeheader()
-        writer.writerows(rows)
-    print('Saved results to', OUT_CSV)
+    skipped = []
+    print('Benchmarking', len(bots), 'bots on', len(positions), 'positions with',
+          args.iterations, 'iterations each (seed', str(args.seed) + ')')
+    for bot_name, params in bots:
+        if not engine_available(bot_name):
+            print('  ', bot_name, '-> skipped (engine binary not found)')
+            skipped.append(bot_name)
+            continue
+        for name, fen in positions:
+            print('  ', bot_name, name, end=' -> ', flush=True)
+            row = bench_position(bot_name, params, name, fen, args.iterations, args.seed)
+            nps = f"{row['nps']:.0f}" if row['nps'] else '-'
+            print(f"{row['move']} mean {row['time_mean_s']:.4f}s nodes {row['nodes']} nps {nps} "
+                  f"peak {row['peak_kb']:.0f}KB")
+            rows.append(row)
+
+    result = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'epd': os.path.relpath(args.epd, ROOT),
+            'seed': args.seed,
+            'iterations': args.iterations,
+            'skipped': skipped,
+        },
+        'results': rows,
+        'totals': summarize(rows),
+    }
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print('Saved results to', args.out)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print('Saved baseline to', args.baseline)
+        return 0
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print('No baseline at', args.baseline, '(run with --save-baseline first)')
+            return 1
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result['totals'], baseline.get('totals', {}), args.tolerance)
+        if regressions:
+            print(f'Regressions beyond {args.tolerance:.0%}:')
+            for line in regressions:
+                print('  ', line)
+            return 1
+        print(f'No regressions beyond {args.tolerance:.0%} against', args.baseline)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the chess bots on fixed positions.')
+    parser.add_argument('--epd', default=DEFAULT_EPD, help='EPD file with the benchmark positions')
+    parser.add_argument('--bots', nargs='*', help='only benchmark these bots')
+    parser.add_argument('--iterations', type=int, default=3, help='timed searches per bot and position')
+    parser.add_argument('--seed', type=int, default=1234, help='RNG seed used before every search')
+    parser.add_argument('--out', default=DEFAULT_OUT, help='where to write the JSON results')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--compare', action='store_true', help='exit with 1 on regressions vs the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='allowed relative slowdown/growth before a metric counts as a regression')
+    return parser.parse_args(argv)
 
 
 if __name__ == '__main__':
-    run()
+    sys.exit(run(parse_args()))
@@ -0,0 +1,142 @@
+"""
+Perft: count the leaf nodes of the legal move tree to check and time move generation.
+
+Moves are generated with Board.calc_moves for every piece, bypassing the legal-move
+cache, so the numbers measure the move generator itself. Each child position is a
+Board.copy() of its parent.
+
+With --batch the positions one ply above the leaves are collected and their moves
+counted in bulk by batch_movegen.generate_moves (NumPy), checking that generator
+against the same known counts.
+
+The built-in suite uses positions whose trees have no promotions at the listed
+depths: the board always promotes to a queen, so counts that include
+under-promotions would not match the published values.
+
+Usage (from repo root):
+    python tools/perft.py                     # suite up to depth 3, exits 1 on a mismatch
+    python tools/perft.py --depth 4
+    python tools/perft.py --fen "<fen>" --depth 3 --divide
+    python tools/perft.py --batch               # count the leaves with the NumPy generator
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from board import Board
+from move import Move
+from square import Square
+
+# (name, fen, known node counts for depth 1, 2, ...)
+SUITE = [
+    ('startpos', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', (20, 400, 8902, 197281)),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', (48, 2039, 97862)),
+    ('endgame', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', (14, 191, 2812, 43238, 674624)),
+]
+
+
+def legal_moves(board, color):
+    """Legal (row, col, final_row, final_col) moves of `color`, generated afresh."""
+    moves = []
+    for row in range(8):
+        for col in range(8):
+            p = board.squares[row][col].piece
+            if p is not None and p.color == color:
+                p.clear_moves()
+                board.calc_moves(p, row, col, bool=True)
+                for m in p.moves:
+                    moves.append((row, col, m.final.row, m.final.col))
+    return moves
+
+
+def child(board, row, col, final_row, final_col):
+    node = board.copy()
+    piece = node.squares[row][col].piece
+    node.move(piece, Move(Square(row, col), Square(final_row, final_col)), testing=True)
+    return node
+
+
+def perft(board, depth):
+    if depth == 0:
+        return 1
+    moves = legal_moves(board, board.turn)
+    if depth == 1:
+        return len(moves)
+    return sum(perft(child(board, *m), depth - 1) for m in moves)
+
+
+def frontier(board, depth):
+    """Every position `depth` plies below `board` (with repeats), as Board objects."""
+    if depth == 0:
+        return [board]
+    return [node for m in legal_moves(board, board.turn) for node in frontier(child(board, *m), depth - 1)]
+
+
+def perft_batch(board, depth):
+    """perft with the last ply counted by the batched generator."""
+    import batch_movegen
+    if depth == 0:
+        return 1
+    _, offsets = batch_movegen.generate_moves(batch_movegen.encode(frontier(board, depth - 1)))
+    return int(offsets[-1])
+
+
+def divide(board, depth):
+    """Node count below every root move, as {uci: nodes}."""
+    counts = {}
+    for m in legal_moves(board, board.turn):
+        row, col, final_row, final_col = m
+        uci = f'{chr(97 + col)}{8 - row}{chr(97 + final_col)}{8 - final_row}'
+        counts[uci] = perft(child(board, *m), depth - 1)
+    return counts
+
+
+def run(args):
+    if args.batch:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            print('--batch requires numpy (pip install numpy)', file=sys.stderr)
+            return 2
+    count = perft_batch if args.batch else perft
+    if args.fen:
+        positions = [('fen', args.fen, ())]
+    else:
+        positions = SUITE
+    failed = 0
+    for name, fen, expected in positions:
+        board = Board.from_fen(fen)
+        for depth in range(1, args.depth + 1):
+            t0 = time.perf_counter()
+            if args.divide and depth == args.depth:
+                counts = divide(board, depth)
+                for uci, n in sorted(counts.items()):
+                    print(f'  {uci}: {n}')
+                nodes = sum(counts.values())
+            else:
+                nodes = count(board, depth)
+            seconds = time.perf_counter() - t0
+            known = expected[depth - 1] if depth <= len(expected) else None
+            verdict = '' if known is None else ('ok' if nodes == known else f'MISMATCH (expected {known})')
+            if known is not None and nodes != known:
+                failed += 1
+            nps = nodes / seconds if seconds > 0 else 0
+            print(f'{name} depth {depth}: {nodes} nodes in {seconds:.2f}s ({nps:,.0f} nodes/s) {verdict}')
+    return 1 if failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Count legal move tree leaves (perft).')
+    parser.add_argument('--depth', type=int, default=3, help='maximum depth')
+    parser.add_argument('--fen', default=None, help='position to count instead of the built-in suite')
+    parser.add_argument('--batch', action='store_true', help='count the leaves with the NumPy batch generator')
+    parser.add_argument('--divide', action='store_true', help='per-root-move counts at the maximum depth')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
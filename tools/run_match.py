@@ -0,0 +1,105 @@
+"""
+Bot-vs-bot match runner with automatic adjudication.
+
+Plays a series of games between two bots, swapping colours every game, and ends each
+game as soon as Board.outcome() reports a result: checkmate, stalemate, insufficient
+material, threefold repetition or the fifty-move rule (draws are adjudicated without a
+claim). Games that reach --max-plies are scored as draws ('move limit').
+
+Each game is printed as it finishes and, with -o, written as one JSON line:
+
+    {"game": 1, "white": "deepblue", "black": "minimax", "result": "1/2-1/2",
+     "reason": "threefold repetition", "plies": 38, "moves": ["e2e4", ...]}
+
+Usage (from repo root):
+    python tools/run_match.py deepblue minimax --games 4 --depth 2
+    python tools/run_match.py deepblue random --games 10 --movetime 1 -o match.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import ai
+from board import Board
+from search import SearchContext
+
+
+def play_game(white, black, depth, movetime=None, max_plies=300, fen=None):
+    """Play one game. Returns (result, reason, moves in UCI)."""
+    board = Board.from_fen(fen) if fen else Board()
+    engines = {'white': white, 'black': black}
+    moves = []
+    while True:
+        color = board.turn
+        outcome = board.outcome(color)
+        if outcome is not None:
+            return outcome[0], outcome[1], moves
+        if len(moves) >= max_plies:
+            return '1/2-1/2', 'move limit', moves
+        ctx = SearchContext(movetime=movetime)
+        move = ai.get_bot_move(board, color, engine=engines[color], depth=depth, ctx=ctx)
+        if move is None:
+            # the bot gave up on a position that still has legal moves: it forfeits
+            return ('0-1' if color == 'white' else '1-0'), f'{engines[color]} returned no move', moves
+        piece = board.squares[move.initial.row][move.initial.col].piece
+        board.move(piece, move, testing=True)  # headless: no sounds
+        board.set_true_en_passant(piece)
+        moves.append(ai.move_to_uci(move))
+
+
+def run(args):
+    random.seed(args.seed)
+    ai.load_magnus_book()
+    # points of engine1 and engine2 (kept by slot: both may be the same bot)
+    points = [0.0, 0.0]
+    reasons = {}
+    out = open(args.output, 'w', encoding='utf-8') if args.output else None
+    try:
+        for n in range(1, args.games + 1):
+            first_white = n % 2 == 1
+            white, black = (args.engine1, args.engine2) if first_white else (args.engine2, args.engine1)
+            t0 = time.perf_counter()
+            result, reason, moves = play_game(white, black, args.depth, args.movetime,
+                                              args.max_plies, args.fen)
+            score = {'1-0': 1.0, '0-1': 0.0}.get(result, 0.5)
+            points[0] += score if first_white else 1.0 - score
+            points[1] += 1.0 - score if first_white else score
+            reasons[reason] = reasons.get(reason, 0) + 1
+            print(f'game {n}: {white} - {black} {result} ({reason}, {len(moves)} plies, '
+                  f'{time.perf_counter() - t0:.1f}s)')
+            if out:
+                out.write(json.dumps({'game': n, 'white': white, 'black': black, 'result': result,
+                                      'reason': reason, 'plies': len(moves), 'moves': moves}) + '\n')
+                out.flush()
+    finally:
+        if out:
+            out.close()
+
+    print(f'{args.engine1} {points[0]:g} - {points[1]:g} {args.engine2}')
+    for reason, count in sorted(reasons.items(), key=lambda item: -item[1]):
+        print(f'  {reason}: {count}')
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Play bot-vs-bot games with automatic adjudication.')
+    parser.add_argument('engine1', help='first bot (white in odd games)')
+    parser.add_argument('engine2', help='second bot')
+    parser.add_argument('--games', type=int, default=2, help='number of games (colours alternate)')
+    parser.add_argument('--depth', type=int, default=2, help='search depth for both bots')
+    parser.add_argument('--movetime', type=float, default=None, help='time limit per move (s)')
+    parser.add_argument('--max-plies', type=int, default=300, help='adjudicate a draw after this many plies')
+    parser.add_argument('--fen', default=None, help='start position (default: the initial position)')
+    parser.add_argument('--seed', type=int, default=1234, help='RNG seed (random bot, book choices)')
+    parser.add_argument('-o', '--output', default=None, help='JSONL file with one record per game')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
@@ -0,0 +1,184 @@
+"""
+Self-play training data: deep_blue_bot plays itself and every searched position is
+stored with its search score and the game's final result.
+
+Games run in parallel worker processes. Each starts with --random-plies random legal
+moves (seeded per game) so the games spread out, then deep_blue_bot plays both sides
+until Board.outcome() ends the game or --max-plies is reached (scored as a draw).
+Positions are deduplicated by Board.hash() over the whole run and against the shards
+already in the output directory, and written as fixed-width .npy shards of
+--shard-size records (see src/dataset.py for the record layout); a run with the
+same --seed replays the same openings, so extend a dataset with another seed. Shards can be
+memory-mapped and streamed with dataset.iter_batches:
+
+    import dataset
+    for batch in dataset.iter_batches(dataset.shard_paths('data/selfplay')):
+        batch['position'], batch['score'], batch['result']
+
+Usage (from repo root):
+    python tools/selfplay.py --games 200 --depth 2 --workers 4
+    python tools/selfplay.py --games 50 --movetime 0.5 --random-plies 10 -o data/selfplay
+    python tools/selfplay.py --games 200 --seed 2    # add new games to the same shards
+
+Requires numpy (pip install numpy).
+"""
+import argparse
+import concurrent.futures as cf
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+DEFAULT_OUT = os.path.join(ROOT, 'data', 'selfplay')
+
+RESULTS = {'1-0': 1, '0-1': -1}
+
+
+# worker side
+
+def _init_worker():
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+
+
+def play_game(seed, depth, movetime, random_plies, max_plies):
+    """Play one self-play game. Returns (record array, result, reason, plies)."""
+    import numpy as np
+    import ai
+    import dataset
+    from board import Board
+    from search import SearchContext
+
+    rng = random.Random(seed)
+    board = Board()
+    positions = []  # (hash, snapshot, score for white)
+    plies = 0
+    outcome = None
+    while True:
+        color = board.turn
+        outcome = board.outcome(color)
+        if outcome is not None or plies >= max_plies:
+            break
+        if plies < random_plies:
+            move = rng.choice(ai.all_legal_moves(board, color))
+        else:
+            ctx = SearchContext(movetime=movetime)
+            move, stats = ai.get_bot_move(board, color, engine='deepblue', depth=depth,
+                                          ctx=ctx, with_stats=True)
+            if move is None:
+                break
+            if stats.score is not None:
+                score = stats.score if color == 'white' else -stats.score
+                positions.append((board.hash(color), board.snapshot(color), score))
+        piece = board.squares[move.initial.row][move.initial.col].piece
+        board.move(piece, move, testing=True)
+        board.set_true_en_passant(piece)
+        plies += 1
+
+    if outcome is not None:
+        result, reason = outcome
+    else:
+        result, reason = '1/2-1/2', 'move limit' if plies >= max_plies else 'no move'
+    records = np.zeros(len(positions), dtype=dataset.RECORD_DTYPE)
+    if positions:
+        keys, snapshots, scores = zip(*positions)
+        records['hash'] = keys
+        records['position'] = np.frombuffer(b''.join(snapshots), dtype=np.uint8).reshape(len(positions), -1)
+        records['score'] = scores
+    records['result'] = RESULTS.get(result, 0)
+    return records, result, reason, plies
+
+
+# driver
+
+def run(args):
+    try:
+        import numpy as np
+    except ImportError:
+        print('numpy is required: pip install numpy', file=sys.stderr)
+        return 2
+    _init_worker()
+    import dataset
+
+    seen = dataset.read_hashes(dataset.shard_paths(args.output))
+    if seen:
+        print(f'{len(seen)} positions already in {args.output}', file=sys.stderr)
+    workers = args.workers or os.cpu_count() or 1
+    max_inflight = 2 * workers
+    buffered = []
+    counts = {'games': 0, 'positions': 0, 'duplicates': 0, 'shards': 0}
+    t0 = time.perf_counter()
+
+    def flush(force=False):
+        # write full shards (and the remainder at the end)
+        nonlocal buffered
+        records = np.concatenate(buffered) if buffered else np.zeros(0, dataset.RECORD_DTYPE)
+        while len(records) >= args.shard_size or (force and len(records)):
+            path = dataset.next_shard_path(args.output)
+            dataset.write_shard(path, records[:args.shard_size])
+            counts['shards'] += 1
+            if not args.quiet:
+                print(f'wrote {path} ({min(len(records), args.shard_size)} positions)', file=sys.stderr)
+            records = records[args.shard_size:]
+        buffered = [records] if len(records) else []
+
+    def collect(fut):
+        records, result, reason, plies = fut.result()
+        # keep the first occurrence of every position (this run and earlier shards)
+        keep = np.zeros(len(records), dtype=bool)
+        for i, key in enumerate(records['hash'].tolist()):
+            if key not in seen:
+                seen.add(key)
+                keep[i] = True
+        counts['games'] += 1
+        counts['positions'] += int(keep.sum())
+        counts['duplicates'] += len(records) - int(keep.sum())
+        buffered.append(records[keep])
+        if not args.quiet:
+            print(f"game {counts['games']}: {result} ({reason}, {plies} plies, "
+                  f'{int(keep.sum())} new positions)', file=sys.stderr)
+        flush()
+
+    mp = multiprocessing.get_context('spawn')
+    with cf.ProcessPoolExecutor(max_workers=workers, mp_context=mp, initializer=_init_worker) as pool:
+        pending = set()
+        try:
+            for n in range(args.games):
+                while len(pending) >= max_inflight:
+                    done, pending = cf.wait(pending, return_when=cf.FIRST_COMPLETED)
+                    for fut in done:
+                        collect(fut)
+                pending.add(pool.submit(play_game, args.seed * 1000003 + n, args.depth, args.movetime,
+                                        args.random_plies, args.max_plies))
+            for fut in cf.as_completed(pending):
+                collect(fut)
+        finally:
+            # keep whatever finished, even when interrupted
+            flush(force=True)
+
+    print(f"{counts['games']} games, {counts['positions']} positions "
+          f"({counts['duplicates']} duplicates skipped), {counts['shards']} shards "
+          f'in {time.perf_counter() - t0:.1f}s -> {args.output}', file=sys.stderr)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate training data from deep_blue_bot self-play.')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUT, help='directory for the shards')
+    parser.add_argument('--games', type=int, default=100, help='number of games to play')
+    parser.add_argument('--depth', type=int, default=2, help='search depth per move')
+    parser.add_argument('--movetime', type=float, default=None, help='time limit per move (s)')
+    parser.add_argument('--random-plies', type=int, default=8, help='random opening moves per game')
+    parser.add_argument('--max-plies', type=int, default=200, help='adjudicate a draw after this many plies')
+    parser.add_argument('--shard-size', type=int, default=50000, help='positions per shard')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=1234, help='seed of the random openings')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no per-game progress')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
@@ -0,0 +1,290 @@
+"""
+Texel-style tuning of deep_blue_bot's evaluation weights on self-play data.
+
+The evaluation is linear in its weights: material (pawn..queen), the piece-square
+tables (PST, 6 pieces x 8 ranks) and the pawn-structure terms (doubled, isolated,
+passed pawns by rank). The labelled positions of tools/selfplay.py shards are turned
+into one NumPy feature matrix up front (a row per position: white's piece counts,
+PST occupancy and pawn-structure counts minus black's), so every evaluation of the
+whole set is a single matrix product.
+
+The weights are then fitted by full-batch gradient descent (Adam) on the logistic
+loss between sigmoid(K * eval) and the game result, optionally blended with the
+stored search score (--score-weight). K is fitted first with the current weights so
+the scale of the evaluation stays put, and an L2 pull towards the current weights
+(--l2) keeps rarely seen PST entries from drifting. A held-out share of the
+positions (--validation) reports overfitting; the weights with the best validation
+loss are written as JSON (default data/eval_weights.json), which ai.py loads at
+startup (ai.load_eval_weights). Delete the file to go back to the built-in weights.
+
+Usage (from repo root):
+    python tools/tune_eval.py                                  # data/selfplay -> data/eval_weights.json
+    python tools/tune_eval.py data/selfplay --epochs 2000 --lr 0.002 --score-weight 0.5
+    python tools/tune_eval.py --max-positions 200000 -o /tmp/weights.json
+
+Requires numpy (pip install numpy).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+DEFAULT_DATA = os.path.join(ROOT, 'data', 'selfplay')
+
+PIECES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+# tuned material: the king is on the board for both sides, its value cancels out
+MATERIAL = PIECES[:5]
+# feature columns
+MAT_COLS = slice(0, 5)
+PST_COLS = slice(5, 5 + 6 * 8)
+DOUBLED_COL = 53
+ISOLATED_COL = 54
+PASSED_COLS = slice(55, 61)
+N_FEATURES = 61
+# search range of the sigmoid scale K
+K_RANGE = (0.05, 4.0)
+
+
+def features(positions):
+    """
+    (N, N_FEATURES) float32 feature matrix of Board.snapshot() rows (N, SNAPSHOT_SIZE).
+    Every column counts white's occurrences minus black's, so eval = features @ weights
+    (white's point of view, pawns) for the weight layout of weight_vector().
+    """
+    import numpy as np
+    from mailbox import BLACK, PAWN
+
+    cells = np.asarray(positions)[:, :64].reshape(-1, 8, 8)
+    n = len(cells)
+    x = np.zeros((n, N_FEATURES), dtype=np.float32)
+    for k, name in enumerate(PIECES):
+        code = k + 1
+        # per row of the board; white's rank index counts from row 7, black's from row 0
+        white = (cells == code).sum(axis=2)[:, ::-1]
+        black = (cells == (code | BLACK)).sum(axis=2)
+        if k < len(MATERIAL):
+            x[:, k] = white.sum(axis=1) - black.sum(axis=1)
+        x[:, 5 + 8 * k:5 + 8 * (k + 1)] = white - black
+
+    # pawn structure, as ai.pawn_structure counts it
+    rows = np.arange(8)[None, :, None]
+    wp = cells == PAWN
+    bp = cells == (PAWN | BLACK)
+    for own, sign in ((wp, 1), (bp, -1)):
+        files = own.sum(axis=1)
+        x[:, DOUBLED_COL] -= sign * np.maximum(files - 1, 0).sum(axis=1)
+        padded = np.pad(files, ((0, 0), (1, 1)))
+        lonely = (padded[:, :-2] == 0) & (padded[:, 2:] == 0)
+        x[:, ISOLATED_COL] -= sign * (files * lonely).sum(axis=1)
+
+    def adjacent(a, fill, reduce):
+        padded = np.pad(a, ((0, 0), (1, 1)), constant_values=fill)
+        return reduce(reduce(padded[:, :-2], padded[:, 1:-1]), padded[:, 2:])
+
+    # white pawn passed: no black pawn on a lower row on its own or a neighbouring file
+    black_front = adjacent(np.where(bp, rows, 8).min(axis=1), 8, np.minimum)
+    white_passed = wp & (black_front[:, None, :] >= rows)
+    white_back = adjacent(np.where(wp, rows, -1).max(axis=1), -1, np.maximum)
+    black_passed = bp & (white_back[:, None, :] <= rows)
+    for advanced in range(6):
+        x[:, PASSED_COLS.start + advanced] = (white_passed[:, 6 - advanced].sum(axis=1) -
+                                              black_passed[:, advanced + 1].sum(axis=1))
+    return x
+
+
+def weight_vector(ai):
+    """The evaluator's current weights in feature order (all in pawns)."""
+    import numpy as np
+    w = np.zeros(N_FEATURES, dtype=np.float64)
+    w[MAT_COLS] = [ai.PIECE_VALUES[name] for name in MATERIAL]
+    w[PST_COLS] = np.array([ai.PST[name] for name in PIECES], dtype=np.float64).ravel() / 100.0
+    w[DOUBLED_COL] = ai.DOUBLED_PAWN_PENALTY
+    w[ISOLATED_COL] = ai.ISOLATED_PAWN_PENALTY
+    w[PASSED_COLS] = ai.PASSED_PAWN_BONUS
+    return w
+
+
+def export_weights(ai, w):
+    """JSON-ready weights for ai.load_eval_weights (PST back in centipawns)."""
+    pst = (w[PST_COLS] * 100.0).reshape(6, 8)
+    values = dict(ai.PIECE_VALUES)
+    values.update({name: round(float(v), 4) for name, v in zip(MATERIAL, w[MAT_COLS])})
+    return {
+        'piece_values': values,
+        'pst': {name: [round(float(v), 1) for v in pst[k]] for k, name in enumerate(PIECES)},
+        'doubled_pawn_penalty': round(float(w[DOUBLED_COL]), 4),
+        'isolated_pawn_penalty': round(float(w[ISOLATED_COL]), 4),
+        'passed_pawn_bonus': [round(float(v), 4) for v in w[PASSED_COLS]],
+    }
+
+
+def load_data(paths, max_positions=None):
+    """Feature matrix, search scores and results (0, 0.5, 1 for white) of the shards."""
+    import numpy as np
+    import dataset
+
+    xs, scores, results = [], [], []
+    total = 0
+    for batch in dataset.iter_batches(paths, batch_size=65536, fields=('position', 'score', 'result')):
+        if max_positions is not None:
+            batch = batch[:max_positions - total]
+        xs.append(features(batch['position']))
+        scores.append(batch['score'].astype(np.float64))
+        results.append((batch['result'].astype(np.float64) + 1.0) / 2.0)
+        total += len(batch)
+        if max_positions is not None and total >= max_positions:
+            break
+    if not xs:
+        return None
+    return np.concatenate(xs), np.concatenate(scores), np.concatenate(results)
+
+
+def sigmoid(z):
+    import numpy as np
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -50.0, 50.0)))
+
+
+def logistic_loss(x, target, w, k):
+    import numpy as np
+    p = np.clip(sigmoid(k * (x @ w)), 1e-12, 1.0 - 1e-12)
+    return float(-np.mean(target * np.log(p) + (1.0 - target) * np.log(1.0 - p)))
+
+
+def fit_k(x, target, w, lo=K_RANGE[0], hi=K_RANGE[1], steps=60):
+    """Scale K minimising the loss of the current weights (golden-section search)."""
+    ratio = (5 ** 0.5 - 1) / 2
+    a, b = lo, hi
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    fc, fd = logistic_loss(x, target, w, c), logistic_loss(x, target, w, d)
+    for _ in range(steps):
+        if fc < fd:
+            b, d, fd = d, c, fc
+            c = b - ratio * (b - a)
+            fc = logistic_loss(x, target, w, c)
+        else:
+            a, c, fc = c, d, fd
+            d = a + ratio * (b - a)
+            fd = logistic_loss(x, target, w, d)
+    return (a + b) / 2
+
+
+def tune(x, target, w0, k, epochs, lr, l2, x_val=None, t_val=None, report=None):
+    """
+    Adam on the logistic loss plus l2 * |w - w0|^2. Returns (weights with the best
+    validation loss, or the last ones without a validation set, that loss).
+    """
+    import numpy as np
+    x64 = x.astype(np.float64)
+    w = w0.copy()
+    m = np.zeros_like(w)
+    v = np.zeros_like(w)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    best_w, best_loss = w.copy(), None
+    n = len(x64)
+    for epoch in range(1, epochs + 1):
+        p = sigmoid(k * (x64 @ w))
+        grad = k * (x64.T @ (p - target)) / n + 2.0 * l2 * (w - w0)
+        m = beta1 * m + (1 - beta1) * grad
+        v = beta2 * v + (1 - beta2) * grad * grad
+        m_hat = m / (1 - beta1 ** epoch)
+        v_hat = v / (1 - beta2 ** epoch)
+        w -= lr * m_hat / (np.sqrt(v_hat) + eps)
+        if x_val is not None and (epoch % 10 == 0 or epoch == epochs):
+            loss = logistic_loss(x_val, t_val, w, k)
+            if best_loss is None or loss < best_loss:
+                best_w, best_loss = w.copy(), loss
+        if report is not None and (epoch % 100 == 0 or epoch == epochs):
+            report(epoch, logistic_loss(x64, target, w, k))
+    if x_val is None:
+        best_w, best_loss = w, logistic_loss(x64, target, w, k)
+    return best_w, best_loss
+
+
+def run(args):
+    try:
+        import numpy as np
+    except ImportError:
+        print('numpy is required: pip install numpy', file=sys.stderr)
+        return 2
+    import ai
+    import dataset
+
+    paths = dataset.shard_paths(args.data) if os.path.isdir(args.data) else [args.data]
+    t0 = time.perf_counter()
+    data = load_data(paths, args.max_positions)
+    if data is None:
+        print(f'No positions in {args.data} (generate some with tools/selfplay.py)', file=sys.stderr)
+        return 1
+    x, scores, results = data
+    print(f'{len(x)} positions from {len(paths)} shards, features in {time.perf_counter() - t0:.1f}s',
+          file=sys.stderr)
+
+    w0 = weight_vector(ai)
+    k = args.k or fit_k(x, results, w0)
+    if not args.k and min(abs(k - K_RANGE[0]), abs(k - K_RANGE[1])) < 1e-3:
+        print(f'warning: K = {k:.4f} is at the edge of its range: the results carry little signal '
+              '(e.g. almost all draws); consider --score-weight or more decisive games', file=sys.stderr)
+    target = results
+    if args.score_weight > 0:
+        # decided positions (mate scores) teach nothing about the weights
+        keep = np.abs(scores) < ai.MATE_SCORE / 2
+        x, results, scores = x[keep], results[keep], scores[keep]
+        target = (1.0 - args.score_weight) * results + args.score_weight * sigmoid(k * scores)
+
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(x))
+    n_val = int(len(x) * args.validation)
+    val, train = order[:n_val], order[n_val:]
+    x_val, t_val = (x[val], target[val]) if n_val else (None, None)
+    print(f'K = {k:.4f}; loss before: train {logistic_loss(x[train], target[train], w0, k):.5f}'
+          + (f', validation {logistic_loss(x_val, t_val, w0, k):.5f}' if n_val else ''), file=sys.stderr)
+
+    def report(epoch, loss):
+        if not args.quiet:
+            print(f'  epoch {epoch}: train loss {loss:.5f}', file=sys.stderr)
+
+    t1 = time.perf_counter()
+    w, loss = tune(x[train], target[train], w0, k, args.epochs, args.lr, args.l2, x_val, t_val, report)
+    print(f"loss after: {'validation' if n_val else 'train'} {loss:.5f} "
+          f'({args.epochs} epochs in {time.perf_counter() - t1:.1f}s)', file=sys.stderr)
+
+    weights = export_weights(ai, w)
+    weights['tuning'] = {'positions': int(len(x)), 'k': round(float(k), 5), 'loss': round(loss, 6)}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    tmp = f'{args.output}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(weights, f, indent=2)
+    os.replace(tmp, args.output)
+    print(f'Wrote {args.output}', file=sys.stderr)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Tune the evaluation weights on self-play data.')
+    parser.add_argument('data', nargs='?', default=DEFAULT_DATA, help='shard directory (or one shard)')
+    parser.add_argument('-o', '--output', default=None, help='weights file (default: ai.EVAL_WEIGHTS_PATH)')
+    parser.add_argument('--epochs', type=int, default=1000, help='gradient steps over the whole set')
+    parser.add_argument('--lr', type=float, default=0.005, help='Adam step size (pawns)')
+    parser.add_argument('--l2', type=float, default=1e-4, help='pull towards the current weights')
+    parser.add_argument('--k', type=float, default=None, help='sigmoid scale (default: fitted)')
+    parser.add_argument('--score-weight', type=float, default=0.0,
+                        help='blend of search score into the target (0: results only, 1: scores only)')
+    parser.add_argument('--validation', type=float, default=0.1, help='share of positions held out')
+    parser.add_argument('--max-positions', type=int, default=None, help='use at most this many positions')
+    parser.add_argument('--seed', type=int, default=1234, help='seed of the validation split')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no progress per 100 epochs')
+    args = parser.parse_args(argv)
+    if args.output is None:
+        import ai
+        args.output = ai.EVAL_WEIGHTS_PATH
+    return args
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))